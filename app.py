@@ -3,15 +3,69 @@ import sqlite3
 import hashlib
 import json
 import os
+import threading
+import time
+import uuid
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from scenario_data import (
+    ENEMY_UNIT_COLUMNS, safe_int, normalize_drone_entry, serialize_payload_totals,
+    enemy_type_counts, replace_scenario_units, load_scenario_units, load_scenario
+)
+from scenario_listing import ListingError, list_scenarios, parse_filters, parse_page_size, DEFAULT_PAGE_SIZE
+from model_registry import MODEL_ROOT, MODEL_CATEGORIES, ModelRegistry
+from leaderboard import load_leaderboard, SORT_COLUMNS as LEADERBOARD_SORTS, DEFAULT_SORT as LEADERBOARD_DEFAULT_SORT
+from job_runner import JobRunner, JobError, HYPERPARAMETERS, parse_hyperparameters
+import db
+import metrics
+import assets
+import startup
+from profiler import RequestProfiler, ProfileError
+from db import get_db_connection, is_busy_error
+from log_writer import LogWriter, format_log_line, entry_timestamp
+from migrations import migrate
+from scenario_cache import ScenarioCache, current_revision, bump_revision
+from progress_store import ingest_progress, load_progress_series, load_progress_series_many
+# NumPy 及依赖它的仿真、推理、分配、奖励曲线模块在路由内首次使用时导入，
+# 生产部署由 create_app() 预热阶段在 fork 前预加载（PRELOAD_MODULES）
+PRELOAD_MODULES = (
+    'numpy', 'spatial_index', 'event_recorder', 'simulation_engine', 'live_stream',
+    'wta_solver', 'batch_eval', 'policy_inference', 'reward_series'
+)
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here-change-in-production'  # 用于会话管理
+# 页面与接口路由，由 create_app() 注册到新建的 Flask 应用上
+bp = Blueprint('main', __name__)
+
+
+def default_config():
+    """默认配置；部署时通过环境变量或 create_app(config) 覆盖"""
+    return {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'your-secret-key-here-change-in-production'),  # 用于会话管理
+        # 启动时预热的共享缓存：模型注册表、最近场景的 JSON 响应、静态资源压缩结果，并预加载 PRELOAD_MODULES
+        'WARM_CACHES': os.environ.get('WARM_CACHES', '1') != '0',
+        'WARM_SCENARIO_COUNT': int(os.environ.get('WARM_SCENARIO_COUNT', 200)),
+        # create_app() 结束时输出各初始化阶段耗时
+        'STARTUP_REPORT': os.environ.get('STARTUP_REPORT', '0') != '0',
+        # 推流仿真的状态保存在当前进程内，多工作进程部署时由 serve.py 关闭
+        'LIVE_STREAMING': os.environ.get('LIVE_STREAMING', '1') != '0',
+    }
+
+# 按需剖析：管理员带 X-Profile: 1 / ?_profile=1，或按 PROFILE_SAMPLE_EVERY 抽样
+request_profiler = RequestProfiler()
+# 带内容哈希的静态资源：模板中用 asset_url(...) 引用，响应可长期缓存并按 Accept-Encoding 返回预压缩版本
+asset_pipeline = assets.AssetPipeline()
 
 # 应用版本信息
 APP_VERSION = 'V 1.0.0'
 
+@bp.app_errorhandler(sqlite3.OperationalError)
+def handle_db_busy(e):
+    """等待写锁超时时返回 503，其余数据库错误按 500 处理"""
+    if is_busy_error(e):
+        return jsonify({'success': False, 'message': '数据库繁忙，请稍后重试'}), 503
+    current_app.logger.exception('数据库错误: %s', e)
+    return jsonify({'success': False, 'message': '数据库错误'}), 500
+
 # 注册 from_json 过滤器，兼容模板中解析 JSON 字符串
 def _from_json_filter(value):
     if value is None:
@@ -23,27 +77,7 @@ def _from_json_filter(value):
     except Exception:
         return {}
 
-app.jinja_env.filters['from_json'] = _from_json_filter
-
-# 模型目录及分类定义
-MODEL_ROOT = 'models'
-MODEL_CATEGORIES = {
-    'target_allocation': '目标分配',
-    'fire_allocaltion': '火力分配'  # 保持与现有目录一致
-}
-
-def normalize_config_path(path):
-    """规范化模型相关路径，避免因不同运行环境导致的重复记录"""
-    if not path:
-        return ''
-    abs_root = os.path.abspath(MODEL_ROOT)
-    abs_path = os.path.abspath(path)
-    try:
-        rel = os.path.relpath(abs_path, abs_root)
-        normalized = os.path.join(MODEL_ROOT, rel)
-    except ValueError:
-        normalized = abs_path
-    return normalized.replace('\\', '/')
+bp.add_app_template_filter(_from_json_filter, 'from_json')
 
 def get_abs_path(path):
     """构造绝对路径并校验在模型根目录内"""
@@ -53,271 +87,13 @@ def get_abs_path(path):
         raise ValueError('非法路径访问')
     return abs_path
 
-# 确保模型表存在
-def ensure_models_table():
-    conn = get_db_connection()
-    conn.execute(
-        '''CREATE TABLE IF NOT EXISTS models (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            seed INTEGER,
-            version TEXT,
-            algo TEXT,
-            env TEXT,
-            scenario TEXT,
-            config_path TEXT UNIQUE,
-            progress_path TEXT,
-            status TEXT DEFAULT 'available',
-            best_score REAL,
-            last_step INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )'''
-    )
-    deduplicate_models(conn)
-    # 确保唯一索引存在；如果旧表缺少 UNIQUE，此索引会限制重复插入
-    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_models_config_path ON models(config_path)')
-    conn.commit()
-    conn.close()
-
-def deduplicate_models(conn):
-    """删除 config_path 重复的记录，保留最小 id，并规范化路径"""
-    try:
-        rows = conn.execute('SELECT id, config_path FROM models').fetchall()
-        keep_for_path = {}
-        delete_ids = []
-        for row in rows:
-            normalized = normalize_config_path(row['config_path'])
-            if normalized != row['config_path']:
-                conn.execute(
-                    'UPDATE models SET config_path = ? WHERE id = ?',
-                    (normalized, row['id'])
-                )
-            if normalized not in keep_for_path:
-                keep_for_path[normalized] = row['id']
-                continue
-            # 保留较小 id 的记录
-            if row['id'] < keep_for_path[normalized]:
-                delete_ids.append(keep_for_path[normalized])
-                keep_for_path[normalized] = row['id']
-            else:
-                delete_ids.append(row['id'])
-        if delete_ids:
-            placeholders = ','.join('?' for _ in delete_ids)
-            conn.execute(f'DELETE FROM models WHERE id IN ({placeholders})', delete_ids)
-    except Exception:
-        pass
-
-# 解析进度文件，获取最新步数与最佳成绩
-def parse_progress(progress_path):
-    last_step = None
-    best_score = None
-    if not os.path.exists(progress_path):
-        return last_step, best_score
-    try:
-        with open(progress_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                parts = line.strip().split(',')
-                if len(parts) < 2:
-                    continue
-                try:
-                    step = int(float(parts[0]))
-                    score = float(parts[1])
-                except ValueError:
-                    continue
-                last_step = step
-                if best_score is None or score > best_score:
-                    best_score = score
-    except Exception:
-        return None, None
-    return last_step, best_score
-
-# 从目录名中提取种子和时间戳
-def parse_folder_metadata(folder_name):
-    # 期望格式: seed-00014-2024-09-25-21-19-35
-    parts = folder_name.split('-')
-    seed = None
-    timestamp = folder_name
-    if len(parts) >= 2 and parts[0] == 'seed':
-        try:
-            seed = int(parts[1])
-        except ValueError:
-            seed = None
-    if len(parts) >= 8:
-        timestamp = f"{parts[2]}-{parts[3]}-{parts[4]} {parts[5]}:{parts[6]}:{parts[7]}"
-    return seed, timestamp
-
-# 从文件系统收集模型信息
-def collect_models_from_fs():
-    models = []
-    if not os.path.isdir(MODEL_ROOT):
-        return models
-    for category, category_label in MODEL_CATEGORIES.items():
-        category_path = os.path.join(MODEL_ROOT, category)
-        if not os.path.isdir(category_path):
-            continue
-        for entry in os.listdir(category_path):
-            model_path = os.path.join(category_path, entry)
-            if not os.path.isdir(model_path):
-                continue
-            config_path = normalize_config_path(os.path.join(model_path, 'config.json'))
-            progress_path = normalize_config_path(os.path.join(model_path, 'progress.txt'))
-            if not os.path.exists(config_path):
-                continue
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-            except Exception:
-                config_data = {}
-            seed, version = parse_folder_metadata(entry)
-            algo = config_data.get('main_args', {}).get('algo')
-            env = config_data.get('main_args', {}).get('env')
-            scenario = config_data.get('env_args', {}).get('scenario')
-            name = config_data.get('main_args', {}).get('exp_name') or entry
-            last_step, best_score = parse_progress(progress_path)
-            models.append({
-                'name': name,
-                'category': category,
-                'category_label': category_label,
-                'seed': seed,
-                'version': version,
-                'algo': algo,
-                'env': env,
-                'scenario': scenario,
-                'config_path': config_path,
-                'progress_path': progress_path if os.path.exists(progress_path) else '',
-                'status': '可用',
-                'best_score': best_score,
-                'last_step': last_step
-            })
-    return models
-
 # 同步文件系统模型数据到数据库，并返回最新列表
-def sync_models_from_fs():
-    ensure_models_table()
-    fs_models = collect_models_from_fs()
-    if not fs_models:
-        return []
-    conn = get_db_connection()
-    for m in fs_models:
-        conn.execute(
-            '''INSERT INTO models (name, category, seed, version, algo, env, scenario, config_path, progress_path, status, best_score, last_step)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-               ON CONFLICT(config_path) DO UPDATE SET
-                   name=excluded.name,
-                   category=excluded.category,
-                   seed=excluded.seed,
-                   version=excluded.version,
-                   algo=excluded.algo,
-                   env=excluded.env,
-                   scenario=excluded.scenario,
-                   progress_path=excluded.progress_path,
-                   status=excluded.status,
-                   best_score=excluded.best_score,
-                   last_step=excluded.last_step''',
-            (
-                m['name'], m['category'], m['seed'], m['version'], m['algo'], m['env'],
-                m['scenario'], m['config_path'], m['progress_path'], m['status'],
-                m['best_score'], m['last_step']
-            )
-        )
-    conn.commit()
-    conn.close()
-    return fs_models
-
-# 数据清洗与转换工具
-def safe_int(value, default=0):
-    """安全转换为整数，转换失败返回默认值"""
-    try:
-        return int(value)
-    except (TypeError, ValueError):
-        return default
-
-
-def normalize_drone_entry(drone, default_id=None):
-    """标准化单架无人机数据，移除已弃用字段"""
-    normalized = {
-        'id': drone.get('id', default_id),
-        'code': drone.get('code', ''),
-        'lat': drone.get('lat'),
-        'lng': drone.get('lng'),
-        'altitude': safe_int(drone.get('altitude', 100), 100),
-        'ar1': safe_int(drone.get('ar1', drone.get('hq9b', 0)), 0),
-        'pl10': safe_int(drone.get('pl10', 0), 0),
-        'cannon': safe_int(drone.get('cannon', 0), 0)
-    }
-    return normalized
-
-
-def serialize_drone_payloads(drones):
-    """生成载荷汇总JSON，不包含雷达"""
-    return json.dumps({
-        'total_ar1': sum(drone.get('ar1', 0) for drone in drones),
-        'total_pl10': sum(drone.get('pl10', 0) for drone in drones),
-        'total_cannon': sum(drone.get('cannon', 0) for drone in drones),
-        'drones': drones
-    })
-
-
-def sanitize_stored_drone_payload(payload_str):
-    """移除已有场景中的雷达载荷并规范字段"""
-    if not payload_str:
-        cleaned_payload = serialize_drone_payloads([])
-        return [], cleaned_payload, False
-    try:
-        payload_data = json.loads(payload_str)
-    except Exception:
-        cleaned_payload = serialize_drone_payloads([])
-        return [], cleaned_payload, False
-
-    if not isinstance(payload_data, dict):
-        cleaned_payload = serialize_drone_payloads([])
-        return [], cleaned_payload, False
-
-    drones = payload_data.get('drones') or []
-    cleaned_drones = []
-    changed = 'total_radar' in payload_data
-
-    for idx, drone in enumerate(drones):
-        if not isinstance(drone, dict):
-            continue
-        cleaned = normalize_drone_entry(drone, idx + 1)
-        if 'radar' in drone or 'hq9b' in drone:
-            changed = True
-        cleaned_drones.append(cleaned)
-
-    cleaned_payload = serialize_drone_payloads(cleaned_drones)
-    changed = changed or cleaned_payload != (payload_str or '')
-    return cleaned_drones, cleaned_payload, changed
-
-
-def sanitize_all_scenario_payloads():
-    """批量清理场景载荷中的雷达字段，保持兼容数据一致"""
-    conn = None
-    try:
-        conn = get_db_connection()
-        rows = conn.execute(
-            'SELECT id, our_drone_payloads FROM scenarios WHERE status = "active"'
-        ).fetchall()
-        updates = []
-        for row in rows:
-            _, cleaned_payload, changed = sanitize_stored_drone_payload(row['our_drone_payloads'] or '')
-            if changed:
-                updates.append((cleaned_payload, row['id']))
-        if updates:
-            conn.executemany(
-                'UPDATE scenarios SET our_drone_payloads = ? WHERE id = ?',
-                updates
-            )
-            conn.commit()
-    except Exception:
-        pass
-    finally:
-        if conn:
-            conn.close()
+def sync_models_from_fs(force=False):
+    """增量同步：只有发生变化的训练目录才会重新解析并写库"""
+    return model_registry.sync(force=force)
 
 # 添加自定义 Jinja2 过滤器
-@app.template_filter('from_json')
+@bp.app_template_filter('from_json')
 def from_json_filter(value):
     """从 JSON 字符串解析为 Python 对象"""
     if value:
@@ -327,14 +103,11 @@ def from_json_filter(value):
             return {}
     return {}
 
-def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect('webapp.db')
-    conn.row_factory = sqlite3.Row  # 使行可以通过列名访问
-    return conn
+# 模型注册表：内存快照 + 按修改时间增量同步
+model_registry = ModelRegistry(connect=get_db_connection)
 
-# 初始化一次模型表
-ensure_models_table()
+# 训练任务调度：由 start_background_services() 在每个工作进程中启动，并恢复排队中的任务
+job_runner = JobRunner(connect=db.pool.connection)
 
 def login_required(f):
     """登录装饰器"""
@@ -342,11 +115,11 @@ def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'logged_in' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """登录路由"""
     if request.method == 'POST':
@@ -364,20 +137,20 @@ def login():
             session['logged_in'] = True
             session['username'] = username
             flash('登录成功！', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash('用户名或密码错误！', 'error')
     
     return render_template('login.html', version=APP_VERSION)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """登出路由"""
     session.clear()
     flash('已成功登出！', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/')
+@bp.route('/')
 @login_required
 def index():
     """首页路由"""
@@ -413,29 +186,32 @@ def index():
                                scenario_count=0, 
                                model_count=0)
 
-@app.route('/pipeline')
+@bp.route('/pipeline')
 @login_required
-def pipeline():
-    """场景管理路由"""
-    try:
-        sanitize_all_scenario_payloads()
-        conn = get_db_connection()
-        scenarios = conn.execute(
-            '''SELECT id, name, description, created_by, 
-               datetime(created_at, 'localtime') as created_at, status,
-               our_drone_count, enemy_reconnaissance_drones, enemy_attack_helicopters,
-               enemy_tanks, enemy_armored_vehicles, enemy_military_bases
-               FROM scenarios 
-               WHERE status = 'active' 
-               ORDER BY created_at DESC'''
-        ).fetchall()
-        conn.close()
-        return render_template('pipeline.html', scenarios=scenarios)
+def pipeline():
+    """场景管理路由：按创建时间倒序分页，支持创建者、名称前缀与单位数量筛选"""
+    filters = {}
+    try:
+        filters = parse_filters(request.args)
+        conn = get_db_connection()
+        try:
+            scenarios, next_cursor = list_scenarios(
+                conn,
+                '''id, name, description, created_by, created_at,
+                   datetime(created_at, 'localtime') as local_created_at, status,
+                   our_drone_count, enemy_total''',
+                filters, request.args.get('cursor'), parse_page_size(request.args.get('limit'))
+            )
+        finally:
+            conn.close()
+        return render_template('pipeline.html', scenarios=scenarios, filters=filters,
+                               next_cursor=next_cursor, is_first_page=not request.args.get('cursor'))
     except Exception as e:
         flash(f'获取场景列表时发生错误：{str(e)}', 'error')
-        return render_template('pipeline.html', scenarios=[])
+        return render_template('pipeline.html', scenarios=[], filters=filters,
+                               next_cursor=None, is_first_page=True)
 
-@app.route('/model')
+@bp.route('/model')
 @login_required
 def model():
     """模型管理路由"""
@@ -471,43 +247,19 @@ def _load_first_config(category):
 def _build_train_presets():
     """提取火力/目标分配的核心超参数作为预设"""
     presets = {}
-    for category in ['target_allocation', 'fire_allocaltion']:
+    for category in MODEL_CATEGORIES:
         cfg = _load_first_config(category)
-        algo_args = cfg.get('algo_args', {}).get('algo', {}) if isinstance(cfg, dict) else {}
-        model_args = cfg.get('algo_args', {}).get('model', {}) if isinstance(cfg, dict) else {}
+        algo_args = cfg.get('algo_args', {}) if isinstance(cfg, dict) else {}
         presets[category] = {
-            'algo': {
-                'clip_param': algo_args.get('clip_param'),
-                'entropy_coef': algo_args.get('entropy_coef'),
-                'gamma': algo_args.get('gamma'),
-                'gae_lambda': algo_args.get('gae_lambda'),
-                'ppo_epoch': algo_args.get('ppo_epoch'),
-                'actor_num_mini_batch': algo_args.get('actor_num_mini_batch'),
-                'value_loss_coef': algo_args.get('value_loss_coef'),
-                'max_grad_norm': algo_args.get('max_grad_norm'),
-                'use_gae': algo_args.get('use_gae'),
-                'use_clipped_value_loss': algo_args.get('use_clipped_value_loss'),
-                'use_policy_active_masks': algo_args.get('use_policy_active_masks'),
-            },
-            'model': {
-                'lr': model_args.get('lr'),
-                'critic_lr': model_args.get('critic_lr'),
-                'hidden_sizes': model_args.get('hidden_sizes'),
-                'activation_func': model_args.get('activation_func'),
-                'use_recurrent_policy': model_args.get('use_recurrent_policy'),
-                'use_feature_normalization': model_args.get('use_feature_normalization'),
-                'weight_decay': model_args.get('weight_decay'),
-                'initialization_method': model_args.get('initialization_method'),
-                'std_x_coef': model_args.get('std_x_coef'),
-                'std_y_coef': model_args.get('std_y_coef')
-            }
+            section: {name: algo_args.get(section, {}).get(name) for name in fields}
+            for section, fields in HYPERPARAMETERS.items()
         }
     return presets
 
-@app.route('/model/train', methods=['GET', 'POST'])
+@bp.route('/model/train', methods=['GET', 'POST'])
 @login_required
 def train_model():
-    """模型训练演示页"""
+    """模型训练：提交后台训练任务并查看任务进度"""
     conn = get_db_connection()
     scenarios = conn.execute(
         'SELECT id, name FROM scenarios WHERE status = "active" ORDER BY created_at DESC'
@@ -515,21 +267,62 @@ def train_model():
     conn.close()
 
     if request.method == 'POST':
-        scenario_id = (request.form.get('scenario_id') or '').strip()
+        scenario_id = safe_int(request.form.get('scenario_id'), None)
         train_type = (request.form.get('train_type') or '').strip()
         if not scenario_id or not train_type:
             flash('请选择场景和任务类型', 'error')
-            return redirect(url_for('train_model'))
+            return redirect(url_for('main.train_model'))
 
-        scenario_name = next((s['name'] for s in scenarios if str(s['id']) == scenario_id), '未选择')
-        task_label = '目标分配' if train_type == 'target_allocation' else '火力分配'
-        flash(f'训练任务已提交：{task_label} · 场景 {scenario_name}', 'success')
-        return redirect(url_for('train_model'))
+        scenario_data = load_scenario(get_db_connection(), scenario_id)
+        if not scenario_data:
+            flash('场景不存在', 'error')
+            return redirect(url_for('main.train_model'))
+        try:
+            overrides = parse_hyperparameters(request.form)
+            job_id = job_runner.submit(
+                train_type,
+                _load_first_config(train_type),
+                overrides,
+                scenario_data,
+                seed=safe_int(request.form.get('seed'), None),
+                created_by=session.get('username', 'unknown')
+            )
+        except JobError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('main.train_model'))
+        task_label = MODEL_CATEGORIES.get(train_type, train_type)
+        flash(f'训练任务 #{job_id} 已提交：{task_label} · 场景 {scenario_data["name"]}', 'success')
+        return redirect(url_for('main.train_model'))
 
     train_presets = _build_train_presets()
-    return render_template('train_model.html', scenarios=scenarios, train_presets=train_presets)
+    return render_template('train_model.html', scenarios=scenarios, train_presets=train_presets,
+                           runner=job_runner.snapshot())
 
-@app.route('/model/<int:model_id>')
+@bp.route('/api/train_jobs')
+@login_required
+def api_train_jobs():
+    """训练任务列表及进度，供训练页轮询"""
+    limit = min(max(safe_int(request.args.get('limit'), 50), 1), 200)
+    return jsonify({'success': True, 'jobs': job_runner.list(limit), 'runner': job_runner.snapshot()})
+
+@bp.route('/api/train_jobs/<int:job_id>')
+@login_required
+def api_train_job(job_id):
+    """单个训练任务的进度与输出日志末尾"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify(dict(job, success=True))
+
+@bp.route('/api/train_jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def api_train_job_cancel(job_id):
+    """取消排队中或运行中的训练任务"""
+    if not job_runner.cancel(job_id):
+        return jsonify({'success': False, 'message': '任务不存在或已结束'}), 409
+    return jsonify({'success': True, 'message': '已提交取消请求'})
+
+@bp.route('/model/<int:model_id>')
 @login_required
 def model_detail(model_id):
     """模型详情路由，展示关键配置与奖励曲线"""
@@ -541,12 +334,13 @@ def model_detail(model_id):
     conn.close()
     if not model_row:
         flash('模型不存在或已被移除', 'error')
-        return redirect(url_for('model'))
+        return redirect(url_for('main.model'))
 
     config_data = {}
     algo_config = {}
     model_config = {}
     reward_image = None
+    reward_series_url = None
     try:
         config_path = get_abs_path(model_row['config_path'])
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -556,7 +350,9 @@ def model_detail(model_id):
         reward_path = os.path.join(os.path.dirname(config_path), 'reward.png')
         reward_abs = get_abs_path(reward_path)
         if os.path.exists(reward_abs):
-            reward_image = url_for('model_reward_image', model_id=model_id)
+            reward_image = url_for('main.model_reward_image', model_id=model_id)
+        if model_row['progress_path']:
+            reward_series_url = url_for('main.api_reward_series', model_id=model_id)
     except Exception as e:
         flash(f'读取模型配置失败：{str(e)}', 'error')
 
@@ -565,10 +361,11 @@ def model_detail(model_id):
         model=model_row,
         algo_config=algo_config,
         model_config=model_config,
-        reward_image=reward_image
+        reward_image=reward_image,
+        reward_series_url=reward_series_url
     )
 
-@app.route('/model/<int:model_id>/reward')
+@bp.route('/model/<int:model_id>/reward')
 @login_required
 def model_reward_image(model_id):
     """提供奖励曲线图"""
@@ -589,18 +386,239 @@ def model_reward_image(model_id):
     except Exception:
         return 'Forbidden', 403
 
-@app.route('/api/models', methods=['GET'])
+def _new_reward_series_cache():
+    from reward_series import SeriesCache
+    return SeriesCache()
+
+# 奖励曲线降采样结果缓存（首次请求时创建）
+reward_series_cache = startup.lazy(_new_reward_series_cache)
+
+
+@bp.route('/api/model/<int:model_id>/reward_series', methods=['GET'])
+@login_required
+def api_reward_series(model_id):
+    """奖励曲线数据：按点数预算降采样并可选平滑，支持 ETag/Last-Modified 条件请求"""
+    from reward_series import (
+        build_series, make_etag, DEFAULT_POINT_BUDGET, MAX_POINT_BUDGET, DOWNSAMPLE_METHODS, SMOOTHING_METHODS,
+        DEFAULT_EMA_ALPHA, DEFAULT_ROLLING_WINDOW
+    )
+    points = max(3, min(safe_int(request.args.get('points'), DEFAULT_POINT_BUDGET), MAX_POINT_BUDGET))
+    method = request.args.get('method', 'lttb')
+    smooth = request.args.get('smooth', 'none')
+    if method not in DOWNSAMPLE_METHODS or smooth not in SMOOTHING_METHODS:
+        return jsonify({'success': False, 'message': '不支持的降采样或平滑方式'}), 400
+    try:
+        alpha = float(request.args.get('alpha', DEFAULT_EMA_ALPHA))
+    except ValueError:
+        alpha = -1
+    window = safe_int(request.args.get('window'), DEFAULT_ROLLING_WINDOW)
+    if not 0 < alpha <= 1 or window < 1:
+        return jsonify({'success': False, 'message': '平滑参数超出范围'}), 400
+
+    conn = get_db_connection()
+    try:
+        model_row = conn.execute(
+            'SELECT progress_path FROM models WHERE id = ?', (model_id,)
+        ).fetchone()
+        if not model_row:
+            return jsonify({'success': False, 'message': '模型不存在'}), 404
+        progress_path = model_row['progress_path']
+        try:
+            stat = os.stat(get_abs_path(progress_path)) if progress_path else None
+        except (OSError, ValueError):
+            stat = None
+        if stat is None:
+            return jsonify({'success': False, 'message': '未找到训练进度数据'}), 404
+
+        cache_key = (
+            model_id, stat.st_size, stat.st_mtime_ns, points, method, smooth,
+            alpha if smooth == 'ema' else None,
+            window if smooth == 'rolling' else None
+        )
+        payload = reward_series_cache().get(cache_key)
+        if payload is None:
+            # 先补齐文件新追加的行，保证曲线与文件状态一致
+            ingest_progress(conn, model_id, progress_path)
+            conn.commit()
+            steps, rewards = load_progress_series(conn, model_id)
+            payload = build_series(steps, rewards, points=points, method=method,
+                                   smooth=smooth, alpha=alpha, window=window)
+            reward_series_cache().put(cache_key, payload)
+    finally:
+        conn.close()
+
+    response = jsonify({'success': True, 'model_id': model_id, **payload})
+    response.set_etag(make_etag(cache_key))
+    response.last_modified = datetime.fromtimestamp(int(stat.st_mtime))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _parse_model_ids(values):
+    """解析 ids=1,2,3 或重复的 ids 参数，去重并保持顺序"""
+    ids = []
+    for value in values:
+        for part in value.split(','):
+            model_id = safe_int(part.strip(), None)
+            if model_id is not None and model_id not in ids:
+                ids.append(model_id)
+    return ids
+
+
+@bp.route('/api/models/compare', methods=['GET'])
+@login_required
+def api_compare_models():
+    """多模型奖励曲线对比：插值到公共步数网格，返回逐点均值与置信带
+
+    参数：ids（模型编号，逗号分隔）、points（网格点数）、band（ci95/std/minmax）、
+    range（union 覆盖全部曲线 / overlap 只取共同范围）、smooth/alpha/window（逐条曲线先平滑）、
+    runs=1 时附带每条曲线在网格上的插值结果。
+    """
+    import numpy as np
+    from reward_series import (
+        compare_series, make_etag, DEFAULT_POINT_BUDGET, MAX_POINT_BUDGET, SMOOTHING_METHODS, DEFAULT_EMA_ALPHA,
+        DEFAULT_ROLLING_WINDOW, BAND_METHODS, GRID_RANGES, MAX_COMPARE_MODELS
+    )
+    model_ids = _parse_model_ids(request.args.getlist('ids'))
+    if not model_ids:
+        return jsonify({'success': False, 'message': '请指定要对比的模型'}), 400
+    if len(model_ids) > MAX_COMPARE_MODELS:
+        return jsonify({'success': False, 'message': f'一次最多对比 {MAX_COMPARE_MODELS} 个模型'}), 400
+    points = max(2, min(safe_int(request.args.get('points'), DEFAULT_POINT_BUDGET), MAX_POINT_BUDGET))
+    band = request.args.get('band', 'ci95')
+    grid_range = request.args.get('range', 'union')
+    smooth = request.args.get('smooth', 'none')
+    if band not in BAND_METHODS or grid_range not in GRID_RANGES or smooth not in SMOOTHING_METHODS:
+        return jsonify({'success': False, 'message': '不支持的置信带、网格范围或平滑方式'}), 400
+    try:
+        alpha = float(request.args.get('alpha', DEFAULT_EMA_ALPHA))
+    except ValueError:
+        alpha = -1
+    window = safe_int(request.args.get('window'), DEFAULT_ROLLING_WINDOW)
+    if not 0 < alpha <= 1 or window < 1:
+        return jsonify({'success': False, 'message': '平滑参数超出范围'}), 400
+    include_runs = request.args.get('runs') == '1'
+
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            f'''SELECT id, name, category, seed, algo, env, scenario, progress_path
+               FROM models WHERE id IN ({",".join("?" * len(model_ids))})''',
+            model_ids
+        ).fetchall()
+        found = {row['id']: row for row in rows}
+        models = []
+        missing = []
+        for model_id in model_ids:
+            row = found.get(model_id)
+            try:
+                stat = os.stat(get_abs_path(row['progress_path'])) if row and row['progress_path'] else None
+            except (OSError, ValueError):
+                stat = None
+            if stat is None:
+                missing.append(model_id)
+            else:
+                models.append((row, stat))
+        if not models:
+            return jsonify({'success': False, 'message': '所选模型均无训练进度数据', 'missing': missing}), 404
+
+        cache_key = (
+            'compare', tuple((row['id'], stat.st_size, stat.st_mtime_ns) for row, stat in models),
+            points, band, grid_range, smooth,
+            alpha if smooth == 'ema' else None,
+            window if smooth == 'rolling' else None,
+            include_runs
+        )
+        payload = reward_series_cache().get(cache_key)
+        if payload is None:
+            for row, _ in models:
+                ingest_progress(conn, row['id'], row['progress_path'])
+            conn.commit()
+            series = load_progress_series_many(conn, [row['id'] for row, _ in models])
+            empty = (np.empty(0), np.empty(0))
+            curves = [series.get(row['id'], empty) for row, _ in models]
+            payload = compare_series(curves, points=points, band=band, grid_range=grid_range, smooth=smooth,
+                                     alpha=alpha, window=window, include_runs=include_runs)
+            if payload is None:
+                return jsonify({'success': False, 'message': '所选模型的步数范围没有重叠'}), 404
+            payload['models'] = [{
+                'id': row['id'], 'name': row['name'], 'category': row['category'], 'seed': row['seed'],
+                'algo': row['algo'], 'env': row['env'], 'scenario': row['scenario'],
+                'total_points': int(curve[0].size),
+                'first_step': int(curve[0][0]) if curve[0].size else None,
+                'last_step': int(curve[0][-1]) if curve[0].size else None
+            } for (row, _), curve in zip(models, curves)]
+            reward_series_cache().put(cache_key, payload)
+    finally:
+        conn.close()
+
+    response = jsonify({'success': True, **payload, 'missing': missing})
+    response.set_etag(make_etag(cache_key + (tuple(missing),)))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@bp.route('/api/models', methods=['GET'])
 @login_required
 def api_models():
     """获取模型列表"""
-    sync_models_from_fs()
+    sync_models_from_fs(force=request.args.get('refresh') == '1')
     conn = get_db_connection()
     rows = conn.execute('SELECT * FROM models ORDER BY created_at DESC').fetchall()
     conn.close()
     models = [dict(r) for r in rows]
-    return jsonify({'success': True, 'models': models})
+    return jsonify({'success': True, 'models': models, 'registry': model_registry.stats()})
 
-@app.route('/api/model/<int:model_id>/rename', methods=['POST'])
+
+def _leaderboard_query():
+    """解析排行榜的类别、排序与最少种子数参数"""
+    category = request.args.get('category') or None
+    if category not in MODEL_CATEGORIES:
+        category = None
+    sort = request.args.get('sort', LEADERBOARD_DEFAULT_SORT)
+    if sort not in LEADERBOARD_SORTS:
+        sort = LEADERBOARD_DEFAULT_SORT
+    min_seeds = max(safe_int(request.args.get('min_seeds'), 1), 0)
+    return category, sort, min_seeds
+
+
+@bp.route('/api/models/leaderboard', methods=['GET'])
+@login_required
+def api_model_leaderboard():
+    """按 (类别, 算法, 环境, 场景) 汇总各种子最佳成绩的排行榜"""
+    sync_models_from_fs()
+    category, sort, min_seeds = _leaderboard_query()
+    conn = get_db_connection()
+    try:
+        rows = load_leaderboard(conn, category, sort, min_seeds)
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'leaderboard': rows, 'sort': sort})
+
+
+@bp.route('/model/leaderboard')
+@login_required
+def model_leaderboard():
+    """模型排行榜页面"""
+    sync_models_from_fs()
+    category, sort, min_seeds = _leaderboard_query()
+    conn = get_db_connection()
+    try:
+        rows = load_leaderboard(conn, category, sort, min_seeds)
+    finally:
+        conn.close()
+    return render_template(
+        'model_leaderboard.html',
+        rows=rows,
+        category=category,
+        sort=sort,
+        min_seeds=min_seeds,
+        category_labels=MODEL_CATEGORIES
+    )
+
+@bp.route('/api/model/<int:model_id>/rename', methods=['POST'])
 @login_required
 def api_rename_model(model_id):
     """修改模型名称"""
@@ -625,14 +643,98 @@ def api_rename_model(model_id):
     except Exception as e:
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'}), 500
 
-@app.route('/simulation')
+# 策略推理：模型缓存与请求合并器（进程内共享）
+INFERENCE_CACHE_MAX_BYTES = int(os.environ.get('INFERENCE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 5))
+INFERENCE_TIMEOUT_S = 10
+
+
+def _new_policy_cache():
+    from policy_inference import PolicyCache
+    return PolicyCache(max_bytes=INFERENCE_CACHE_MAX_BYTES)
+
+
+def _new_inference_batcher():
+    from policy_inference import InferenceBatcher
+    return InferenceBatcher(window_ms=INFERENCE_BATCH_WINDOW_MS)
+
+# 首次推理请求时创建
+policy_cache = startup.lazy(_new_policy_cache)
+inference_batcher = startup.lazy(_new_inference_batcher)
+
+
+def get_policy_bundle(model_id):
+    """按模型 id 获取已加载的策略，首次访问时从模型目录加载"""
+    conn = get_db_connection()
+    model_row = conn.execute(
+        'SELECT config_path FROM models WHERE id = ?', (model_id,)
+    ).fetchone()
+    conn.close()
+    if not model_row:
+        return None
+    model_dir = os.path.dirname(get_abs_path(model_row['config_path']))
+    return policy_cache().get(model_id, model_dir)
+
+
+@bp.route('/api/model/<int:model_id>/act', methods=['POST'])
+@login_required
+def api_model_act(model_id):
+    """批量策略推理：obs 形如 [n_agents][n_envs][obs_dim]，返回各智能体动作"""
+    import numpy as np
+    from policy_inference import InferenceError, prepare_observations
+    data = request.get_json(silent=True) or {}
+    started = time.perf_counter()
+    try:
+        bundle = get_policy_bundle(model_id)
+        if bundle is None:
+            return jsonify({'success': False, 'message': '模型不存在'}), 404
+        obs = prepare_observations(bundle, data.get('obs'))
+        deterministic = bool(data.get('deterministic', True))
+        future = inference_batcher().submit(bundle, obs, deterministic=deterministic)
+        actions, probs, batch_envs = future.result(timeout=INFERENCE_TIMEOUT_S)
+
+        result = {
+            'success': True,
+            'model_id': model_id,
+            'action_types': [a.action_type for a in bundle.actors],
+            'actions': [a.tolist() for a in actions],
+            'batch_envs': batch_envs
+        }
+        if data.get('include_probs'):
+            result['probs'] = [p.tolist() if p is not None else None for p in probs]
+        share_obs = data.get('share_obs')
+        if share_obs is not None and bundle.critic is not None:
+            share_obs = np.asarray(share_obs, dtype=np.float32)
+            if share_obs.ndim != 2 or share_obs.shape[1] != bundle.critic.input_dim:
+                raise InferenceError(f'全局观测维度应为 (n_envs, {bundle.critic.input_dim})')
+            result['values'] = bundle.critic.values(share_obs)[:, 0].tolist()
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return jsonify(result)
+    except (InferenceError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'推理失败: {str(e)}'}), 500
+
+
+@bp.route('/api/inference/stats', methods=['GET'])
+@login_required
+def api_inference_stats():
+    """推理缓存与请求合并统计"""
+    return jsonify({
+        'success': True,
+        'cache': policy_cache().stats(),
+        'batcher': inference_batcher().stats()
+    })
+
+
+@bp.route('/simulation')
 @login_required
 def simulation():
     """仿真评估路由"""
     return render_template('simulation.html')
 
 # 在 app.py 中添加以下代码
-@app.route('/create_scenario', methods=['GET', 'POST'])
+@bp.route('/create_scenario', methods=['GET', 'POST'])
 @login_required
 def create_scenario():
     """创建场景路由"""
@@ -663,37 +765,9 @@ def create_scenario():
             normalized_drones = [
                 normalize_drone_entry(drone, idx + 1) for idx, drone in enumerate(our_drones)
             ]
-            
-            our_drone_count = len(normalized_drones)
-            our_drone_positions = [
-                f"{drone['lat']},{drone['lng']},{drone['altitude']}" for drone in normalized_drones
-            ]
-            our_drone_positions_str = "\n".join(our_drone_positions)
-            
-            # 保存详细配置，包含每架无人机的具体载荷
-            our_drone_payloads = serialize_drone_payloads(normalized_drones)
-            
-            # 处理敌方单位数据
-            enemy_data = {
-                'reconnaissance_drone': {'count': 0, 'positions': []},
-                'attack_helicopter': {'count': 0, 'positions': []},
-                'tank': {'count': 0, 'positions': []},
-                'armored_vehicle': {'count': 0, 'positions': []},
-                'military_base': {'count': 0, 'positions': []}
-            }
-            
-            for unit in enemy_units:
-                unit_type = unit['type']
-                if unit_type in enemy_data:
-                    enemy_data[unit_type]['count'] += 1
-                    # 在位置信息中包含编号
-                    if unit.get('altitude', 0) > 0:
-                        enemy_data[unit_type]['positions'].append(f"{unit['lat']},{unit['lng']},{unit['altitude']},{unit.get('code', '')}")
-                    else:
-                        enemy_data[unit_type]['positions'].append(f"{unit['lat']},{unit['lng']},{unit.get('code', '')}")
             
-            # 保存敌方单位的详细数据（包含编号）
-            enemy_units_details = json.dumps(enemy_units)
+            # 敌方单位只统计各类数量，单位明细写入 scenario_units 表
+            enemy_counts = enemy_type_counts(enemy_units)
             
             # 连接数据库
             conn = get_db_connection()
@@ -709,28 +783,26 @@ def create_scenario():
                 return render_template('create_scenario.html')
             
             # 插入新场景
-            conn.execute(
+            cursor = conn.execute(
                 '''INSERT INTO scenarios (
-                    name, description, scenario_type, created_by, our_drone_count, our_drone_positions, our_drone_payloads,
-                    enemy_reconnaissance_drones, enemy_reconnaissance_positions,
-                    enemy_attack_helicopters, enemy_helicopter_positions,
-                    enemy_tanks, enemy_tank_positions,
-                    enemy_armored_vehicles, enemy_vehicle_positions,
-                    enemy_military_bases, enemy_base_positions
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                (name, description, 'custom', session['username'], our_drone_count, our_drone_positions_str, our_drone_payloads,
-                 enemy_data['reconnaissance_drone']['count'], "\n".join(enemy_data['reconnaissance_drone']['positions']),
-                 enemy_data['attack_helicopter']['count'], "\n".join(enemy_data['attack_helicopter']['positions']),
-                 enemy_data['tank']['count'], "\n".join(enemy_data['tank']['positions']),
-                 enemy_data['armored_vehicle']['count'], "\n".join(enemy_data['armored_vehicle']['positions']),
-                 enemy_data['military_base']['count'], "\n".join(enemy_data['military_base']['positions']))
+                    name, description, scenario_type, created_by, our_drone_count, our_drone_payloads,
+                    enemy_reconnaissance_drones, enemy_attack_helicopters, enemy_tanks,
+                    enemy_armored_vehicles, enemy_military_bases, enemy_total
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (name, description, 'custom', session['username'], len(normalized_drones),
+                 serialize_payload_totals(normalized_drones),
+                 *[enemy_counts[count_col] for _, count_col, _, _, _ in ENEMY_UNIT_COLUMNS],
+                 sum(enemy_counts.values()))
             )
+            replace_scenario_units(conn, cursor.lastrowid, normalized_drones, enemy_units)
+            bump_revision(conn)
             
             conn.commit()
+            scenario_cache.invalidate()
             conn.close()
             
             flash(f'场景 "{name}" 创建成功！', 'success')
-            return redirect(url_for('pipeline'))
+            return redirect(url_for('main.pipeline'))
             
         except json.JSONDecodeError:
             flash('数据格式错误，请重新配置！', 'error')
@@ -743,7 +815,7 @@ def create_scenario():
     return render_template('create_scenario.html')
 
 
-@app.route('/edit_scenario/<int:scenario_id>', methods=['GET', 'POST'])
+@bp.route('/edit_scenario/<int:scenario_id>', methods=['GET', 'POST'])
 @login_required
 def edit_scenario(scenario_id):
     """编辑场景路由"""
@@ -759,7 +831,7 @@ def edit_scenario(scenario_id):
         # 验证必填字段
         if not name:
             flash('场景名称不能为空！', 'error')
-            return redirect(url_for('edit_scenario', scenario_id=scenario_id))
+            return redirect(url_for('main.edit_scenario', scenario_id=scenario_id))
         
         try:
             # 解析JSON数据
@@ -768,52 +840,28 @@ def edit_scenario(scenario_id):
             
             if len(our_drones) == 0:
                 flash('请至少添加一架我方无人机！', 'error')
-                return redirect(url_for('edit_scenario', scenario_id=scenario_id))
+                return redirect(url_for('main.edit_scenario', scenario_id=scenario_id))
             
             # 处理我方无人机数据
             normalized_drones = [
                 normalize_drone_entry(drone, idx + 1) for idx, drone in enumerate(our_drones)
             ]
-            our_drone_count = len(normalized_drones)
-            our_drone_positions = [
-                f"{drone['lat']},{drone['lng']},{drone['altitude']}" for drone in normalized_drones
-            ]
-            our_drone_positions_str = "\n".join(our_drone_positions)
-            
-            # 保存详细配置，包含每架无人机的具体载荷
-            our_drone_payloads = serialize_drone_payloads(normalized_drones)
-            
-            # 处理敌方单位数据
-            enemy_data = {
-                'reconnaissance_drone': {'count': 0, 'positions': []},
-                'attack_helicopter': {'count': 0, 'positions': []},
-                'tank': {'count': 0, 'positions': []},
-                'armored_vehicle': {'count': 0, 'positions': []},
-                'military_base': {'count': 0, 'positions': []}
-            }
             
-            for unit in enemy_units:
-                unit_type = unit['type']
-                if unit_type in enemy_data:
-                    enemy_data[unit_type]['count'] += 1
-                    # 在位置信息中包含编号
-                    if unit.get('altitude', 0) > 0:
-                        enemy_data[unit_type]['positions'].append(f"{unit['lat']},{unit['lng']},{unit['altitude']},{unit.get('code', '')}")
-                    else:
-                        enemy_data[unit_type]['positions'].append(f"{unit['lat']},{unit['lng']},{unit.get('code', '')}")
+            # 敌方单位只统计各类数量，单位明细写入 scenario_units 表
+            enemy_counts = enemy_type_counts(enemy_units)
             
             # 连接数据库
             conn = get_db_connection()
             
             # 检查场景是否存在
             existing_scenario = conn.execute(
-                'SELECT * FROM scenarios WHERE id = ?', (scenario_id,)
+                'SELECT id FROM scenarios WHERE id = ?', (scenario_id,)
             ).fetchone()
             
             if not existing_scenario:
                 flash('场景不存在！', 'error')
                 conn.close()
-                return redirect(url_for('pipeline'))
+                return redirect(url_for('main.pipeline'))
             
             # 检查场景名称是否与其他场景冲突（排除当前场景）
             name_conflict = conn.execute(
@@ -823,39 +871,35 @@ def edit_scenario(scenario_id):
             if name_conflict:
                 flash('场景名称已存在，请使用其他名称！', 'error')
                 conn.close()
-                return redirect(url_for('edit_scenario', scenario_id=scenario_id))
+                return redirect(url_for('main.edit_scenario', scenario_id=scenario_id))
             
             # 更新场景信息
             conn.execute(
                 '''UPDATE scenarios 
-                   SET name = ?, description = ?, our_drone_count = ?, our_drone_positions = ?, our_drone_payloads = ?,
-                       enemy_reconnaissance_drones = ?, enemy_reconnaissance_positions = ?,
-                       enemy_attack_helicopters = ?, enemy_helicopter_positions = ?,
-                       enemy_tanks = ?, enemy_tank_positions = ?,
-                       enemy_armored_vehicles = ?, enemy_vehicle_positions = ?,
-                       enemy_military_bases = ?, enemy_base_positions = ?
+                   SET name = ?, description = ?, our_drone_count = ?, our_drone_payloads = ?,
+                       enemy_reconnaissance_drones = ?, enemy_attack_helicopters = ?, enemy_tanks = ?,
+                       enemy_armored_vehicles = ?, enemy_military_bases = ?, enemy_total = ?
                    WHERE id = ?''',
-                (name, description, our_drone_count, our_drone_positions_str, our_drone_payloads,
-                 enemy_data['reconnaissance_drone']['count'], "\n".join(enemy_data['reconnaissance_drone']['positions']),
-                 enemy_data['attack_helicopter']['count'], "\n".join(enemy_data['attack_helicopter']['positions']),
-                 enemy_data['tank']['count'], "\n".join(enemy_data['tank']['positions']),
-                 enemy_data['armored_vehicle']['count'], "\n".join(enemy_data['armored_vehicle']['positions']),
-                 enemy_data['military_base']['count'], "\n".join(enemy_data['military_base']['positions']),
-                 scenario_id)
+                (name, description, len(normalized_drones), serialize_payload_totals(normalized_drones),
+                 *[enemy_counts[count_col] for _, count_col, _, _, _ in ENEMY_UNIT_COLUMNS],
+                 sum(enemy_counts.values()), scenario_id)
             )
+            replace_scenario_units(conn, scenario_id, normalized_drones, enemy_units)
+            bump_revision(conn)
             
             conn.commit()
+            scenario_cache.invalidate()
             conn.close()
             
             flash(f'场景 "{name}" 更新成功！', 'success')
-            return redirect(url_for('pipeline'))
+            return redirect(url_for('main.pipeline'))
             
         except json.JSONDecodeError:
             flash('数据格式错误，请重新配置！', 'error')
-            return redirect(url_for('edit_scenario', scenario_id=scenario_id))
+            return redirect(url_for('main.edit_scenario', scenario_id=scenario_id))
         except Exception as e:
             flash(f'更新场景时发生错误：{str(e)}', 'error')
-            return redirect(url_for('edit_scenario', scenario_id=scenario_id))
+            return redirect(url_for('main.edit_scenario', scenario_id=scenario_id))
     
     # GET 请求，显示编辑表单
     try:
@@ -863,19 +907,21 @@ def edit_scenario(scenario_id):
         scenario = conn.execute(
             'SELECT * FROM scenarios WHERE id = ?', (scenario_id,)
         ).fetchone()
+        our_drones, enemy_units = load_scenario_units(conn, scenario_id)
         conn.close()
         
         if not scenario:
             flash('场景不存在！', 'error')
-            return redirect(url_for('pipeline'))
+            return redirect(url_for('main.pipeline'))
         
-        return render_template('edit_scenario.html', scenario=scenario)
+        return render_template('edit_scenario.html', scenario=scenario,
+                               our_drones=our_drones, enemy_units=enemy_units)
     except Exception as e:
         flash(f'获取场景信息时发生错误：{str(e)}', 'error')
-        return redirect(url_for('pipeline'))
+        return redirect(url_for('main.pipeline'))
 
 
-@app.route('/delete_scenario/<int:scenario_id>', methods=['POST'])
+@bp.route('/delete_scenario/<int:scenario_id>', methods=['POST'])
 @login_required
 def delete_scenario(scenario_id):
     """删除场景路由"""
@@ -891,274 +937,723 @@ def delete_scenario(scenario_id):
         if not scenario:
             flash('场景不存在！', 'error')
             conn.close()
-            return redirect(url_for('pipeline'))
+            return redirect(url_for('main.pipeline'))
         
         # 软删除场景（将状态设为 deleted）
         conn.execute(
             'UPDATE scenarios SET status = "deleted" WHERE id = ?', (scenario_id,)
         )
+        bump_revision(conn)
         
         conn.commit()
         conn.close()
+        scenario_cache.invalidate()
         
         flash(f'场景 "{scenario["name"]}" 删除成功！', 'success')
         
     except Exception as e:
         flash(f'删除场景时发生错误：{str(e)}', 'error')
     
-    return redirect(url_for('pipeline'))
+    return redirect(url_for('main.pipeline'))
 
 
-@app.route('/api/save_log', methods=['POST'])
+# 仿真日志：后台线程批量写入，队列积压时返回 503
+LOG_MAX_PENDING = int(os.environ.get('LOG_MAX_PENDING', 20000))
+MAX_LOG_BATCH = 1000
+MAX_LOG_MESSAGE_LENGTH = 2000
+log_writer = LogWriter(max_pending=LOG_MAX_PENDING)
+
+
+def _clip_log_message(message):
+    message = str(message)
+    if len(message) > MAX_LOG_MESSAGE_LENGTH:
+        return message[:MAX_LOG_MESSAGE_LENGTH - 3] + '...'
+    return message
+
+
+def _log_queue_full():
+    response = jsonify({'success': False, 'message': '日志队列繁忙，请稍后重试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+@bp.route('/api/save_log', methods=['POST'])
 @login_required
 def save_log():
-    """保存日志到文件"""
+    """保存单条日志（兼容旧前端），写入由后台线程完成"""
     try:
         data = request.get_json()
-        log_message = data.get('message', '')
-        log_level = data.get('level', 'INFO')
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 确保logs目录存在
-        logs_dir = 'logs'
-        if not os.path.exists(logs_dir):
-            os.makedirs(logs_dir)
-        
-        # 生成日志文件名（按日期分类）
-        log_file = os.path.join(logs_dir, f'simulation_{datetime.now().strftime("%Y%m%d")}.txt')
-        
-        # 格式化日志条目
-        log_entry = f'[{timestamp}] [{log_level}] [{session.get("username", "unknown")}] {log_message}\n'
-        
-        # 写入日志文件
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-        
+        line = format_log_line(
+            _clip_log_message(data.get('message', '')),
+            data.get('level', 'INFO'),
+            session.get('username', 'unknown')
+        )
+        if not log_writer.submit([line]):
+            return _log_queue_full()
         return jsonify({'success': True, 'message': '日志保存成功'})
     
     except Exception as e:
         return jsonify({'success': False, 'message': f'保存日志失败: {str(e)}'}), 500
 
 
-@app.route('/api/scenarios', methods=['GET'])
+@bp.route('/api/save_logs', methods=['POST'])
+@login_required
+def save_logs():
+    """批量保存日志：{"entries": [{"message", "level", "ts"}]}，ts 为前端毫秒时间戳"""
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries')
+    if not isinstance(entries, list):
+        return jsonify({'success': False, 'message': 'entries 必须为数组'}), 400
+    if len(entries) > MAX_LOG_BATCH:
+        return jsonify({'success': False, 'message': f'单次最多提交 {MAX_LOG_BATCH} 条日志'}), 400
+    username = session.get('username', 'unknown')
+    lines = [
+        format_log_line(
+            _clip_log_message(entry.get('message', '')),
+            entry.get('level', 'INFO'),
+            username,
+            entry_timestamp(entry.get('ts'))
+        )
+        for entry in entries if isinstance(entry, dict)
+    ]
+    if not log_writer.submit(lines):
+        return _log_queue_full()
+    return jsonify({'success': True, 'message': '日志保存成功', 'accepted': len(lines)})
+
+
+@bp.route('/api/save_logs/stats', methods=['GET'])
+@login_required
+def save_logs_stats():
+    """日志写入队列统计"""
+    return jsonify({'success': True, 'writer': log_writer.snapshot()})
+
+
+# 场景接口响应缓存（按修订号失效，强 ETag）
+SCENARIO_CACHE_MAX_BYTES = int(os.environ.get('SCENARIO_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+scenario_cache = ScenarioCache(max_bytes=SCENARIO_CACHE_MAX_BYTES)
+
+
+def cached_json_body(conn, key, build):
+    """按 (key, 场景修订号) 读取缓存的 JSON 响应体，未命中时调用 build(conn) 生成并缓存
+
+    build 返回 None 表示资源不存在，此时返回 None 且不缓存。
+    """
+    cache_key = key + (current_revision(conn),)
+    entry = scenario_cache.get(cache_key)
+    if entry is None:
+        payload = build(conn)
+        if payload is None:
+            return None
+        entry = scenario_cache.put(cache_key, current_app.json.dumps(payload).encode('utf-8'))
+    return entry
+
+
+def cached_json_response(key, build):
+    """缓存的 JSON 响应，带强 ETag；资源不存在时返回 None"""
+    conn = get_db_connection()
+    try:
+        entry = cached_json_body(conn, key, build)
+        if entry is None:
+            return None
+    finally:
+        conn.close()
+    response = current_app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@bp.route('/api/scenario_cache/stats', methods=['GET'])
+@login_required
+def api_scenario_cache_stats():
+    """场景响应缓存命中统计"""
+    return jsonify({'success': True, 'cache': scenario_cache.stats()})
+
+
+@bp.route('/api/scenarios', methods=['GET'])
 @login_required
 def get_scenarios():
-    """获取所有场景列表"""
+    """分页获取场景列表
+
+    参数：cursor（上一页返回的 next_cursor）、limit、created_by、name（名称前缀）、
+    min_drones/max_drones、min_enemies/max_enemies。
+    """
     try:
-        conn = get_db_connection()
-        scenarios = conn.execute(
-            '''SELECT id, name, description, 
-               our_drone_count, enemy_reconnaissance_drones, enemy_attack_helicopters,
-               enemy_tanks, enemy_armored_vehicles, enemy_military_bases
-               FROM scenarios 
-               WHERE status = 'active' 
-               ORDER BY created_at DESC'''
-        ).fetchall()
-        conn.close()
-        
-        scenario_list = []
-        for scenario in scenarios:
-            scenario_list.append({
-                'id': scenario['id'],
-                'name': scenario['name'],
-                'description': scenario['description'],
-                'our_drone_count': scenario['our_drone_count'],
-                'enemy_total': (scenario['enemy_reconnaissance_drones'] or 0) + 
-                             (scenario['enemy_attack_helicopters'] or 0) + 
-                             (scenario['enemy_tanks'] or 0) + 
-                             (scenario['enemy_armored_vehicles'] or 0) + 
-                             (scenario['enemy_military_bases'] or 0)
-            })
-        
-        return jsonify({'success': True, 'scenarios': scenario_list})
-    
+        filters = parse_filters(request.args)
+        cursor = request.args.get('cursor') or None
+        limit = parse_page_size(request.args.get('limit'))
+        key = ('list', tuple(sorted(filters.items())), cursor, limit)
+        return cached_json_response(key, lambda conn: _build_scenario_list(conn, filters, cursor, limit))
+    except ListingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取场景列表失败: {str(e)}'}), 500
 
 
-@app.route('/api/scenario/<int:scenario_id>', methods=['GET'])
+def _build_scenario_list(conn, filters, cursor, limit):
+    scenarios, next_cursor = list_scenarios(
+        conn, 'id, name, description, created_at, our_drone_count, enemy_total', filters, cursor, limit
+    )
+    scenario_list = [{
+        'id': scenario['id'],
+        'name': scenario['name'],
+        'description': scenario['description'],
+        'our_drone_count': scenario['our_drone_count'],
+        'enemy_total': scenario['enemy_total'] or 0
+    } for scenario in scenarios]
+    return {'success': True, 'scenarios': scenario_list, 'next_cursor': next_cursor,
+            'has_more': next_cursor is not None}
+
+
+@bp.route('/api/scenario/<int:scenario_id>', methods=['GET'])
 @login_required
 def get_scenario_detail(scenario_id):
     """获取场景详细信息"""
+    try:
+        response = cached_json_response(('scenario', scenario_id), lambda conn: _build_scenario_detail(conn, scenario_id))
+        if response is None:
+            return jsonify({'success': False, 'message': '场景不存在'}), 404
+        return response
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'获取场景详情失败: {str(e)}'}), 500
+
+
+def _build_scenario_detail(conn, scenario_id):
+    scenario_data = load_scenario(conn, scenario_id)
+    return {'success': True, 'scenario': scenario_data} if scenario_data else None
+
+
+# 单次服务端仿真允许的最长仿真时长（秒）
+MAX_SIMULATION_TIME_S = 24 * 3600
+
+
+@bp.route('/api/simulate', methods=['POST'])
+@login_required
+def api_simulate():
+    """在服务端无界面运行一次仿真并返回战果汇总"""
+    from simulation_engine import run_simulation, WEAPON_CODES, DEFAULT_MAX_TIME_S, DEFAULT_TIME_STEP_S
+    from event_recorder import EventRecorder, recording_path, DEFAULT_MOVE_INTERVAL_S
+    data = request.get_json(silent=True) or {}
+    scenario_id = safe_int(data.get('scenario_id'), None)
+    if scenario_id is None:
+        return jsonify({'success': False, 'message': '缺少场景ID'}), 400
+    try:
+        max_time_s = float(data.get('max_time_s', DEFAULT_MAX_TIME_S))
+        time_step_s = float(data.get('time_step_s', DEFAULT_TIME_STEP_S))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '仿真参数格式错误'}), 400
+    if not 0 < time_step_s <= 60 or not 0 < max_time_s <= MAX_SIMULATION_TIME_S:
+        return jsonify({'success': False, 'message': '仿真参数超出允许范围'}), 400
+    seed = safe_int(data.get('seed'), None)
+    record = bool(data.get('record'))
+    try:
+        record_interval_s = float(data.get('record_interval_s', DEFAULT_MOVE_INTERVAL_S))
+    except (TypeError, ValueError):
+        record_interval_s = -1
+    if record and record_interval_s <= 0:
+        return jsonify({'success': False, 'message': '位置记录间隔必须大于0'}), 400
+
     try:
         conn = get_db_connection()
-        scenario = conn.execute(
-            'SELECT * FROM scenarios WHERE id = ? AND status = "active"', (scenario_id,)
-        ).fetchone()
+        scenario_data = load_scenario(conn, scenario_id)
         conn.close()
-        
-        if not scenario:
+        if not scenario_data:
             return jsonify({'success': False, 'message': '场景不存在'}), 404
-        
-        # 解析我方无人机数据，移除已弃用的雷达载荷
-        our_drones = []
-        payload_json = scenario['our_drone_payloads'] or ''
-        cleaned_payload_json = payload_json
-        payload_changed = False
+        run_id = None
+        recorder = None
+        if record:
+            run_id = uuid.uuid4().hex
+            recorder = EventRecorder(recording_path(run_id), metadata={
+                'scenario_id': scenario_id,
+                'scenario_name': scenario_data['name'],
+                'seed': seed,
+                'time_step_s': time_step_s,
+                'move_interval_s': record_interval_s,
+                'weapons': list(WEAPON_CODES),
+                'our_drones': [d.get('code') or '' for d in scenario_data['our_drones']],
+                'enemy_units': [{'type': e['type'], 'code': e['code']} for e in scenario_data['enemy_units']],
+                'created_by': session.get('username', 'unknown'),
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }, move_interval_s=record_interval_s)
+        try:
+            summary = run_simulation(
+                scenario_data,
+                seed=seed,
+                max_time_s=max_time_s,
+                time_step_s=time_step_s,
+                recorder=recorder
+            )
+        finally:
+            if recorder is not None:
+                recorder.close()
+        result = {'success': True, 'scenario_id': scenario_id, 'seed': seed, 'summary': summary}
+        if run_id:
+            result['run_id'] = run_id
+            result['recorded_events'] = recorder.count
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'仿真运行失败: {str(e)}'}), 500
+
+
+@bp.route('/api/replay/<run_id>', methods=['GET'])
+@login_required
+def api_replay_info(run_id):
+    """仿真记录概况：元数据、事件数、时长"""
+    from event_recorder import EventReader, RecordingError, recording_path
+    try:
+        reader = EventReader(recording_path(run_id))
+    except RecordingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    return jsonify({'success': True, 'run_id': run_id, **reader.describe()})
+
+
+@bp.route('/api/replay/<run_id>/events', methods=['GET'])
+@login_required
+def api_replay_events(run_id):
+    """从任意时刻回放仿真事件，按行输出 JSON（NDJSON）
+
+    参数：start/end 为仿真秒，speed 为倍速（0 表示不等待），kinds 为逗号分隔的事件类型。
+    """
+    from event_recorder import EventReader, RecordingError, recording_path, replay, KIND_NAMES
+    try:
+        reader = EventReader(recording_path(run_id))
+        start_s = float(request.args.get('start', 0))
+        end_s = float(request.args['end']) if request.args.get('end') else None
+        speed = float(request.args.get('speed', 0))
+    except RecordingError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ValueError:
+        return jsonify({'success': False, 'message': '回放参数格式错误'}), 400
+    kind_codes = {name: code for code, name in KIND_NAMES.items()}
+    kinds = [kind_codes[k] for k in request.args.get('kinds', '').split(',') if k in kind_codes]
+    if speed < 0:
+        return jsonify({'success': False, 'message': '倍速不能为负数'}), 400
+
+    def generate():
+        for events in replay(reader, start_s=start_s, end_s=end_s, speed=speed, kinds=kinds):
+            yield ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+
+    return current_app.response_class(generate(), mimetype='application/x-ndjson')
+
+
+def _new_live_runs():
+    from live_stream import LiveRunRegistry
+    return LiveRunRegistry()
+
+# 推流仿真注册表（首次使用时创建）
+live_runs = startup.lazy(_new_live_runs)
+
+
+@bp.route('/api/live_runs', methods=['GET', 'POST'])
+@login_required
+def api_live_runs():
+    """GET 列出推流仿真；POST 启动一次由服务端推进的仿真，客户端通过 SSE 订阅"""
+    from live_stream import LiveRun, DEFAULT_SPEED as LIVE_DEFAULT_SPEED, MAX_SPEED as LIVE_MAX_SPEED
+    from simulation_engine import DEFAULT_MAX_TIME_S, DEFAULT_TIME_STEP_S
+    if not current_app.config['LIVE_STREAMING']:
+        if request.method == 'GET':
+            return jsonify({'success': True, 'runs': [], 'enabled': False})
+        return jsonify({'success': False, 'message': '服务端推流仿真未启用：多工作进程部署时各进程不共享推流状态，请以单工作进程启动'}), 503
+    if request.method == 'GET':
+        return jsonify({'success': True, 'runs': live_runs().list()})
+    data = request.get_json(silent=True) or {}
+    scenario_id = safe_int(data.get('scenario_id'), None)
+    if scenario_id is None:
+        return jsonify({'success': False, 'message': '缺少场景ID'}), 400
+    try:
+        speed = float(data.get('speed', LIVE_DEFAULT_SPEED))
+        max_time_s = float(data.get('max_time_s', DEFAULT_MAX_TIME_S))
+        time_step_s = float(data.get('time_step_s', DEFAULT_TIME_STEP_S))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '仿真参数格式错误'}), 400
+    if not 0 < speed <= LIVE_MAX_SPEED:
+        return jsonify({'success': False, 'message': f'倍速需在 0~{LIVE_MAX_SPEED:g} 之间'}), 400
+    if not 0 < time_step_s <= 60 or not 0 < max_time_s <= MAX_SIMULATION_TIME_S:
+        return jsonify({'success': False, 'message': '仿真参数超出允许范围'}), 400
+
+    conn = get_db_connection()
+    scenario_data = load_scenario(conn, scenario_id)
+    conn.close()
+    if not scenario_data:
+        return jsonify({'success': False, 'message': '场景不存在'}), 404
+    run = LiveRun(
+        uuid.uuid4().hex,
+        scenario_data,
+        seed=safe_int(data.get('seed'), None),
+        speed=speed,
+        time_step_s=time_step_s,
+        max_time_s=max_time_s,
+        metadata={
+            'scenario_id': scenario_id,
+            'scenario_name': scenario_data['name'],
+            'created_by': session.get('username', 'unknown'),
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    )
+    if not live_runs().start(run):
+        return jsonify({'success': False, 'message': '同时运行的推流仿真已达上限，请稍后再试'}), 503
+    return jsonify({
+        'success': True,
+        'run_id': run.run_id,
+        'stream_url': url_for('main.api_live_run_stream', run_id=run.run_id)
+    })
+
+
+@bp.route('/api/live_runs/<run_id>', methods=['GET'])
+@login_required
+def api_live_run_info(run_id):
+    run = live_runs().get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': '推流仿真不存在或已过期'}), 404
+    return jsonify({'success': True, **run.describe()})
+
+
+@bp.route('/api/live_runs/<run_id>/control', methods=['POST'])
+@login_required
+def api_live_run_control(run_id):
+    """暂停 / 继续 / 停止推流仿真，对所有观看者生效"""
+    run = live_runs().get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': '推流仿真不存在或已过期'}), 404
+    action = (request.get_json(silent=True) or {}).get('action')
+    if action not in ('pause', 'resume', 'stop'):
+        return jsonify({'success': False, 'message': '操作需为 pause、resume 或 stop'}), 400
+    if not run.control(action):
+        return jsonify({'success': False, 'message': '仿真已结束'}), 409
+    return jsonify({'success': True, 'state': run.state})
+
+
+@bp.route('/api/live_runs/<run_id>/stream', methods=['GET'])
+@login_required
+def api_live_run_stream(run_id):
+    """SSE 推送仿真帧：hello（运行信息）、keyframe、delta、end"""
+    run = live_runs().get(run_id)
+    if run is None:
+        return jsonify({'success': False, 'message': '推流仿真不存在或已过期'}), 404
+    last_event_id = safe_int(request.headers.get('Last-Event-ID'), None)
+    return current_app.response_class(
+        run.subscribe(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@bp.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """最慢的剖析请求及其最耗时函数"""
+    if not request_profiler.is_admin(session.get('username')):
+        flash('只有管理员可以查看性能剖析', 'error')
+        return redirect(url_for('main.index'))
+    order = 'recent' if request.args.get('order') == 'recent' else 'duration'
+    profiles = request_profiler.list(order=order, limit=min(max(safe_int(request.args.get('limit'), 50), 1), 500))
+    return render_template('admin_profiles.html', profiles=profiles, order=order, profiler=request_profiler)
 
-        if payload_json:
-            try:
-                our_drones, cleaned_payload_json, payload_changed = sanitize_stored_drone_payload(payload_json)
-            except Exception:
-                our_drones = []
-                cleaned_payload_json = serialize_drone_payloads([])
-                payload_changed = payload_json != cleaned_payload_json
+@bp.route('/admin/profiles/<profile_id>.prof')
+@login_required
+def admin_profile_download(profile_id):
+    """下载原始 cProfile 结果，可用 pstats 或 snakeviz 查看"""
+    if not request_profiler.is_admin(session.get('username')):
+        return jsonify({'success': False, 'message': '只有管理员可以下载性能剖析'}), 403
+    try:
+        path = request_profiler.path_for(profile_id)
+    except ProfileError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
 
-        # 如果没有详细数据，使用位置数据
-        if not our_drones and scenario['our_drone_positions']:
-            positions = scenario['our_drone_positions'].split('\n')
-            for i, pos in enumerate(positions):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        our_drones.append({
-                            'id': i + 1,
-                            'code': f'无人机-{i + 1}',
-                            'lat': coords[0],
-                            'lng': coords[1],
-                            'altitude': int(coords[2]) if len(coords) > 2 else 100,
-                            'ar1': 0,
-                            'pl10': 0,
-                            'cannon': 0
-                        })
-            cleaned_payload_json = serialize_drone_payloads(our_drones)
-            payload_changed = True
+def _runtime_gauges():
+    """连接池、日志队列、场景缓存与推流仿真的当前状态，供 /metrics 输出"""
+    pool_stats = db.pool.snapshot()
+    writer = log_writer.snapshot()
+    cache = scenario_cache.stats()
+    # 未使用过推流仿真时不为采集指标而导入仿真模块
+    runs = live_runs().list() if live_runs.loaded else []
+    gauges = [('db_pool_connections', (('state', key),), pool_stats[key]) for key in ('idle', 'created', 'reused', 'discarded')]
+    gauges += [('log_writer_lines', (('state', key),), writer[key]) for key in ('pending', 'accepted', 'rejected', 'written')]
+    gauges += [('scenario_cache', (('stat', key),), cache[key]) for key in ('entries', 'bytes', 'hits', 'misses', 'evictions')]
+    gauges += [('model_registry_runs', (), model_registry.last_scan.get('runs_total', 0))]
+    gauges += [('live_runs', (('state', state),), sum(1 for r in runs if r['state'] == state))
+               for state in ('running', 'paused')]
+    return gauges
 
-        if payload_changed:
-            conn = None
-            try:
-                conn = get_db_connection()
-                conn.execute(
-                    'UPDATE scenarios SET our_drone_payloads = ? WHERE id = ?',
-                    (cleaned_payload_json, scenario_id)
-                )
-                conn.commit()
-            except Exception:
-                pass
-            finally:
-                if conn:
-                    conn.close()
-        
-        # 解析敌方单位数据（优先使用详细数据）
-        enemy_units = []
-        
-        # 先尝试使用详细的JSON数据（新格式）
-        try:
-            # 假设我们将来会在scenario表中添加enemy_units_details字段
-            # 暂时使用老方法解析
-            pass
-        except:
-            pass
-        
-        # 侦察无人机
-        if scenario['enemy_reconnaissance_drones'] and scenario['enemy_reconnaissance_positions']:
-            positions = scenario['enemy_reconnaissance_positions'].split('\n')
-            for i, pos in enumerate(positions[:scenario['enemy_reconnaissance_drones']]):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        # 如果有第4个字段，则认为是编号
-                        code = coords[3].strip() if len(coords) > 3 else f'侦察无人机-{i + 1}'
-                        enemy_units.append({
-                            'id': f'recon_{i + 1}',
-                            'type': 'reconnaissance_drone',
-                            'code': code,
-                            'lat': float(coords[0]),
-                            'lng': float(coords[1]),
-                            'altitude': int(coords[2]) if len(coords) > 2 else 100
-                        })
-        
-        # 武装直升机
-        if scenario['enemy_attack_helicopters'] and scenario['enemy_helicopter_positions']:
-            positions = scenario['enemy_helicopter_positions'].split('\n')
-            for i, pos in enumerate(positions[:scenario['enemy_attack_helicopters']]):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        # 如果有第4个或第3个字段，则认为是编号
-                        code = coords[3].strip() if len(coords) > 3 else (coords[2].strip() if len(coords) == 3 and not coords[2].isdigit() else f'武装直升机-{i + 1}')
-                        altitude = int(coords[2]) if len(coords) > 3 or (len(coords) == 3 and coords[2].isdigit()) else 100
-                        enemy_units.append({
-                            'id': f'heli_{i + 1}',
-                            'type': 'attack_helicopter',
-                            'code': code,
-                            'lat': float(coords[0]),
-                            'lng': float(coords[1]),
-                            'altitude': altitude
-                        })
-        
-        # 坦克
-        if scenario['enemy_tanks'] and scenario['enemy_tank_positions']:
-            positions = scenario['enemy_tank_positions'].split('\n')
-            for i, pos in enumerate(positions[:scenario['enemy_tanks']]):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        # 第3个字段是编号（地面单位没有高度）
-                        code = coords[2].strip() if len(coords) > 2 else f'坦克-{i + 1}'
-                        enemy_units.append({
-                            'id': f'tank_{i + 1}',
-                            'type': 'tank',
-                            'code': code,
-                            'lat': float(coords[0]),
-                            'lng': float(coords[1]),
-                            'altitude': 0
-                        })
-        
-        # 装甲车
-        if scenario['enemy_armored_vehicles'] and scenario['enemy_vehicle_positions']:
-            positions = scenario['enemy_vehicle_positions'].split('\n')
-            for i, pos in enumerate(positions[:scenario['enemy_armored_vehicles']]):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        # 第3个字段是编号（地面单位没有高度）
-                        code = coords[2].strip() if len(coords) > 2 else f'装甲车-{i + 1}'
-                        enemy_units.append({
-                            'id': f'vehicle_{i + 1}',
-                            'type': 'armored_vehicle',
-                            'code': code,
-                            'lat': float(coords[0]),
-                            'lng': float(coords[1]),
-                            'altitude': 0
-                        })
-        
-        # 军事基地
-        if scenario['enemy_military_bases'] and scenario['enemy_base_positions']:
-            positions = scenario['enemy_base_positions'].split('\n')
-            for i, pos in enumerate(positions[:scenario['enemy_military_bases']]):
-                if pos.strip():
-                    coords = pos.split(',')
-                    if len(coords) >= 2:
-                        # 第3个字段是编号（地面单位没有高度）
-                        code = coords[2].strip() if len(coords) > 2 else f'军事基地-{i + 1}'
-                        enemy_units.append({
-                            'id': f'base_{i + 1}',
-                            'type': 'military_base',
-                            'code': code,
-                            'lat': float(coords[0]),
-                            'lng': float(coords[1]),
-                            'altitude': 0
-                        })
-        
-        scenario_data = {
-            'id': scenario['id'],
-            'name': scenario['name'],
-            'description': scenario['description'],
-            'our_drones': our_drones,
-            'enemy_units': enemy_units
-        }
-        
-        return jsonify({'success': True, 'scenario': scenario_data})
-    
+metrics.register_collector(_runtime_gauges)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式指标；设置 METRICS_TOKEN 时要求 Bearer 令牌"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return current_app.response_class('unauthorized\n', status=401, mimetype='text/plain')
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 请求线程内同步执行的评估规模上限：同步执行只在当前进程内逐次运行，不创建进程池
+# （gthread 工作进程中 fork 进程池可能死锁）；超过上限或 background 为真时作为后台任务提交
+EVALUATE_SYNC_MAX_REPLICATIONS = int(os.environ.get('EVALUATE_SYNC_MAX_REPLICATIONS', 10))
+
+
+@bp.route('/api/evaluate', methods=['POST'])
+@login_required
+def api_evaluate():
+    """对场景进行蒙特卡洛批量评估，返回击毁率、弹药消耗与清场时间统计
+
+    小规模评估在请求线程内单进程执行；其余返回 202 与任务编号，由训练任务调度在子进程中执行，
+    结果通过 /api/evaluate/<job_id> 获取。
+    """
+    from batch_eval import evaluate_scenario, DEFAULT_REPLICATIONS, DEFAULT_MIN_REPLICATIONS, MAX_REPLICATIONS
+    from simulation_engine import DEFAULT_MAX_TIME_S, DEFAULT_TIME_STEP_S
+    data = request.get_json(silent=True) or {}
+    scenario_id = safe_int(data.get('scenario_id'), None)
+    if scenario_id is None:
+        return jsonify({'success': False, 'message': '缺少场景ID'}), 400
+    replications = safe_int(data.get('replications'), DEFAULT_REPLICATIONS)
+    seeds = data.get('seeds')
+    if seeds is not None:
+        if not isinstance(seeds, list) or not all(isinstance(s, int) for s in seeds):
+            return jsonify({'success': False, 'message': '种子列表格式错误'}), 400
+        replications = len(seeds)
+    if not 0 < replications <= MAX_REPLICATIONS:
+        return jsonify({'success': False, 'message': f'仿真次数需在 1~{MAX_REPLICATIONS} 之间'}), 400
+    try:
+        max_time_s = float(data.get('max_time_s', DEFAULT_MAX_TIME_S))
+        time_step_s = float(data.get('time_step_s', DEFAULT_TIME_STEP_S))
+        ci_half_width = data.get('ci_half_width')
+        ci_half_width = float(ci_half_width) if ci_half_width is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '仿真参数格式错误'}), 400
+    if not 0 < time_step_s <= 60 or not 0 < max_time_s <= MAX_SIMULATION_TIME_S:
+        return jsonify({'success': False, 'message': '仿真参数超出允许范围'}), 400
+
+    try:
+        conn = get_db_connection()
+        scenario_data = load_scenario(conn, scenario_id)
+        conn.close()
+        if not scenario_data:
+            return jsonify({'success': False, 'message': '场景不存在'}), 404
+        min_replications = safe_int(data.get('min_replications'), DEFAULT_MIN_REPLICATIONS)
+        if replications > EVALUATE_SYNC_MAX_REPLICATIONS or data.get('background'):
+            job_id = job_runner.submit_evaluation(
+                scenario_data,
+                replications,
+                base_seed=safe_int(data.get('seed'), 0),
+                seeds=seeds,
+                ci_half_width=ci_half_width,
+                min_replications=min_replications,
+                max_time_s=max_time_s,
+                time_step_s=time_step_s,
+                created_by=session.get('username', 'unknown')
+            )
+            return jsonify({
+                'success': True,
+                'scenario_id': scenario_id,
+                'job_id': job_id,
+                'status_url': url_for('main.api_evaluate_job', job_id=job_id),
+                'message': f'评估规模超过 {EVALUATE_SYNC_MAX_REPLICATIONS} 次或指定了后台执行，已作为后台任务提交'
+            }), 202
+        report = evaluate_scenario(
+            scenario_data,
+            replications=replications,
+            base_seed=safe_int(data.get('seed'), 0),
+            seeds=seeds,
+            workers=1,
+            ci_half_width=ci_half_width,
+            min_replications=min_replications,
+            max_time_s=max_time_s,
+            time_step_s=time_step_s
+        )
+        return jsonify({'success': True, 'scenario_id': scenario_id, 'report': report})
     except Exception as e:
-        return jsonify({'success': False, 'message': f'获取场景详情失败: {str(e)}'}), 500
+        return jsonify({'success': False, 'message': f'批量评估失败: {str(e)}'}), 500
+
+
+@bp.route('/api/evaluate/<int:job_id>', methods=['GET'])
+@login_required
+def api_evaluate_job(job_id):
+    """后台评估任务的状态，完成后附带评估报告；取消沿用 /api/train_jobs/<id>/cancel"""
+    job, report = job_runner.evaluation_report(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '评估任务不存在'}), 404
+    result = {'success': True, 'job_id': job_id, 'scenario_id': job['scenario_id'], 'status': job['status'],
+              'status_label': job['status_label'], 'message': job['message']}
+    if report is not None:
+        result['report'] = report
+    elif job['status'] == 'failed':
+        result['log_tail'] = job['log_tail']
+    return jsonify(result)
+
+
+# 分配接口直接提交单位列表时每方的数量上限
+MAX_ALLOCATION_UNITS = 10000
+MAX_ALLOCATION_SALVO = 10
+
+
+@bp.route('/api/allocate', methods=['POST'])
+@login_required
+def api_allocate():
+    """武器-目标分配基线：对场景（或直接提交的单位列表）求解分配方案，返回目标函数值与耗时"""
+    from wta_solver import AllocationProblem, allocate, ALGORITHMS as WTA_ALGORITHMS
+    data = request.get_json(silent=True) or {}
+    algorithms = data.get('algorithms') or ['greedy', 'optimal']
+    if isinstance(algorithms, str):
+        algorithms = [algorithms]
+    if not isinstance(algorithms, list) or not all(a in WTA_ALGORITHMS for a in algorithms):
+        return jsonify({'success': False, 'message': f'分配算法需为 {", ".join(WTA_ALGORITHMS)} 之一'}), 400
+    max_salvo = data.get('max_salvo')
+    if max_salvo is not None:
+        max_salvo = safe_int(max_salvo, 0)
+        if max_salvo < 1:
+            return jsonify({'success': False, 'message': '齐射数必须为正整数'}), 400
+        if max_salvo > MAX_ALLOCATION_SALVO:
+            return jsonify({'success': False, 'message': f'齐射数不能超过 {MAX_ALLOCATION_SALVO}'}), 400
+    include_assignments = data.get('include_assignments', True) is not False
+
+    scenario_id = safe_int(data.get('scenario_id'), None)
+    if scenario_id is not None:
+        conn = get_db_connection()
+        scenario_data = load_scenario(conn, scenario_id)
+        conn.close()
+        if not scenario_data:
+            return jsonify({'success': False, 'message': '场景不存在'}), 404
+    else:
+        our_drones = data.get('our_drones')
+        enemy_units = data.get('enemy_units')
+        if not isinstance(our_drones, list) or not isinstance(enemy_units, list):
+            return jsonify({'success': False, 'message': '缺少场景ID或单位列表'}), 400
+        if len(our_drones) > MAX_ALLOCATION_UNITS or len(enemy_units) > MAX_ALLOCATION_UNITS:
+            return jsonify({'success': False, 'message': f'单位数量不能超过 {MAX_ALLOCATION_UNITS}'}), 400
+        if not all(isinstance(u, dict) for u in our_drones + enemy_units):
+            return jsonify({'success': False, 'message': '单位数据格式错误'}), 400
+        scenario_data = {'our_drones': our_drones, 'enemy_units': enemy_units}
+
+    try:
+        started = time.perf_counter()
+        problem = AllocationProblem(scenario_data, max_salvo=max_salvo)
+        build_ms = (time.perf_counter() - started) * 1000
+        results = {name: allocate(problem, name, include_assignments) for name in algorithms}
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'分配求解失败: {str(e)}'}), 500
+    n_drones, n_targets = problem.shape
+    return jsonify({
+        'success': True,
+        'scenario_id': scenario_id,
+        'drones': n_drones,
+        'targets': n_targets,
+        'max_objective': round(float(problem.target_value.sum()), 6),
+        'build_time_ms': round(build_ms, 3),
+        'results': results
+    })
+
+
+def warm_caches():
+    """预热共享缓存并预加载重量级模块，各项耗时记入启动阶段
+
+    多进程部署时在 fork 前的主进程中执行一次，工作进程以写时复制方式共享预热结果；
+    由 create_app() 在应用上下文中调用。
+    """
+    with startup.phase('warm:model_registry'):
+        sync_models_from_fs(force=True)
+
+    with startup.phase('warm:scenarios'):
+        conn = db.pool.connection()
+        try:
+            ids = [row['id'] for row in conn.execute(
+                "SELECT id FROM scenarios WHERE status = 'active' ORDER BY created_at DESC, id DESC LIMIT ?",
+                (current_app.config['WARM_SCENARIO_COUNT'],)
+            )]
+            # 与 /api/scenarios 默认首页、/api/scenario/<id> 使用相同的缓存键
+            cached_json_body(conn, ('list', (), None, DEFAULT_PAGE_SIZE),
+                             lambda c: _build_scenario_list(c, {}, None, DEFAULT_PAGE_SIZE))
+            for scenario_id in ids:
+                cached_json_body(conn, ('scenario', scenario_id), lambda c, sid=scenario_id: _build_scenario_detail(c, sid))
+        finally:
+            conn.close()
+
+    with startup.phase('warm:assets'):
+        for logical in asset_pipeline.iter_sources():
+            asset_pipeline.body(asset_pipeline.entry(logical), 'gzip')
+
+    startup.preload(PRELOAD_MODULES)
+
+
+def start_background_services():
+    """启动本进程的后台线程（训练任务调度），fork 出的工作进程需各自调用"""
+    job_runner.start()
+
+
+def shutdown_background_services():
+    """停止调度线程并写完队列中的日志，供进程退出前调用"""
+    job_runner.stop()
+    log_writer.close()
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def ensure_initialized():
+    """执行未应用的数据库迁移，每个进程只执行一次，由 create_app() 调用"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        with startup.phase('migrate'):
+            conn = db.pool.connection()
+            try:
+                migrate(conn)
+            finally:
+                conn.close()
+        _initialized = True
+
+
+_warmed = False
+
+
+def create_app(config=None, start_services=True):
+    """应用工厂：新建 Flask 应用、载入配置并注册路由，执行数据库迁移并预热共享缓存
+
+    每次调用返回新的应用实例；迁移、预热与后台线程属于进程级资源，每个进程只执行一次。
+    start_services=False 用于预加载后再 fork 的部署方式：后台线程不会被 fork 继承，
+    由各工作进程启动后调用 start_background_services()。
+    STARTUP_REPORT 为真时输出各初始化阶段耗时（模块导入耗时见 python startup.py）。
+    """
+    global _warmed
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.update(config)
+    # 请求结束时归还数据库连接
+    db.init_app(app)
+    # 按路由记录请求耗时并输出 Server-Timing 响应头
+    metrics.init_app(app)
+    request_profiler.init_app(app, lambda: session.get('username'),
+                              skip_endpoints=('static', 'asset', 'main.metrics_endpoint'))
+    assets.init_app(app, asset_pipeline)
+    app.register_blueprint(bp)
+
+    ensure_initialized()
+    if app.config['WARM_CACHES'] and not _warmed:
+        with app.app_context():
+            warm_caches()
+        _warmed = True
+    if app.config['STARTUP_REPORT']:
+        print(f'启动阶段耗时: {startup.format_phases()}', flush=True)
+    if start_services:
+        start_background_services()
+    return app
 
 
 if __name__ == '__main__':
-    app.run(
+    # 开发服务器：单进程多线程；生产环境使用 python serve.py 启动多进程服务
+    create_app().run(
         host='0.0.0.0',
         port=8888,
-        debug=False
+        debug=False,
+        threaded=True
     )
 
@@ -0,0 +1,285 @@
+# assets.py
+"""静态资源指纹与预压缩
+
+模板通过 asset_url('js/simulation.js') 引用 static/ 下的脚本、样式与配置文件，
+生成 /assets/simulation.<内容哈希>.js 形式的地址；文件内容变化时地址随之变化，
+因此响应可以带一年有效期的 immutable 缓存头，再次访问时浏览器不再请求。
+
+部署时执行构建，把带哈希的文件与 gzip/brotli 预压缩版本写入 static/dist/：
+    python assets.py            # 构建并写入 manifest.json
+    python assets.py --clean    # 删除旧版本的构建产物
+
+运行时按 Accept-Encoding 选择预压缩文件；未构建或源文件在构建后被修改时，
+按当前内容计算哈希并在首次请求时压缩、缓存在内存中，不会返回过期内容。
+brotli 为可选依赖，未安装时只生成 gzip 版本。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+# 参与指纹与预压缩的目录（相对 static/）
+ASSET_DIRS = ('js', 'css', 'config')
+HASH_LENGTH = 12
+# 小于该长度的文件压缩收益不明显，直接返回原文
+MIN_COMPRESS_BYTES = 512
+LONG_CACHE = 'public, max-age=31536000, immutable'
+ENCODINGS = ('br', 'gzip')
+_HASHED_NAME_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % HASH_LENGTH)
+
+
+class AssetError(Exception):
+    """资源不存在或不在指纹目录内"""
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(logical, digest):
+    stem, ext = os.path.splitext(logical)
+    return f'{stem}.{digest}{ext}'
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _stat_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class AssetPipeline:
+    """逻辑路径 -> 带哈希地址的映射，以及按编码返回文件内容"""
+
+    def __init__(self, static_dir=STATIC_DIR, dist_dir=DIST_DIR, asset_dirs=ASSET_DIRS):
+        self.static_dir = static_dir
+        self.dist_dir = dist_dir
+        self.asset_dirs = asset_dirs
+        self._lock = threading.Lock()
+        # 逻辑路径 -> {signature, hash, name}
+        self._entries = {}
+        # (逻辑路径, 哈希, 编码) -> 压缩后的内容
+        self._compressed = {}
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.dist_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f).get('assets', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _source_path(self, logical):
+        logical = logical.replace('\\', '/').lstrip('/')
+        if logical.split('/', 1)[0] not in self.asset_dirs or '..' in logical.split('/'):
+            raise AssetError('资源不在指纹目录内')
+        path = os.path.join(self.static_dir, *logical.split('/'))
+        if not os.path.isfile(path):
+            raise AssetError('资源不存在')
+        return logical, path
+
+    def entry(self, logical):
+        """按源文件当前内容返回 {hash, name, path}，文件未变化时不重新计算"""
+        logical, path = self._source_path(logical)
+        signature = _stat_signature(path)
+        cached = self._entries.get(logical)
+        if cached is not None and cached['signature'] == signature:
+            return cached
+        with open(path, 'rb') as f:
+            digest = content_hash(f.read())
+        entry = {'signature': signature, 'hash': digest, 'name': hashed_name(logical, digest),
+                 'logical': logical, 'path': path}
+        with self._lock:
+            self._entries[logical] = entry
+        return entry
+
+    def url_path(self, logical):
+        """带哈希的相对地址（不含 /assets/ 前缀）；不在指纹目录内时返回 None"""
+        try:
+            return self.entry(logical)['name']
+        except AssetError:
+            return None
+
+    def resolve(self, name):
+        """把请求的带哈希文件名解析为 (entry, 是否为当前版本)"""
+        match = _HASHED_NAME_RE.match(name)
+        if not match:
+            raise AssetError('资源不存在')
+        entry = self.entry(match.group('stem') + match.group('ext'))
+        return entry, entry['hash'] == match.group('hash')
+
+    def body(self, entry, encoding=None):
+        """返回 (内容, 实际使用的编码)；优先读取构建时预压缩的文件"""
+        if encoding:
+            key = (entry['logical'], entry['hash'], encoding)
+            data = self._compressed.get(key)
+            if data is None:
+                data = self._read_built(entry, encoding)
+            if data is None:
+                with open(entry['path'], 'rb') as f:
+                    raw = f.read()
+                data = compress(raw, encoding) if len(raw) >= MIN_COMPRESS_BYTES else None
+                if data is None or len(data) >= len(raw):
+                    data = b''
+            with self._lock:
+                self._compressed[key] = data
+            if data:
+                return data, encoding
+        with open(entry['path'], 'rb') as f:
+            return f.read(), None
+
+    def _read_built(self, entry, encoding):
+        built = self.manifest.get(entry['logical'])
+        if not built or built.get('hash') != entry['hash'] or encoding not in built.get('encodings', ()):
+            return None
+        suffix = '.br' if encoding == 'br' else '.gz'
+        try:
+            with open(os.path.join(self.dist_dir, *entry['name'].split('/')) + suffix, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def negotiate(self, entry, accept_encodings):
+        """按 werkzeug 的 Accept-Encoding 解析结果选择编码；br 需要已构建的文件或已安装 brotli"""
+        built = self.manifest.get(entry['logical']) or {}
+        for encoding in ENCODINGS:
+            if encoding == 'br' and brotli is None and (
+                    built.get('hash') != entry['hash'] or 'br' not in built.get('encodings', ())):
+                continue
+            if accept_encodings.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def mimetype(self, entry):
+        return mimetypes.guess_type(entry['logical'])[0] or 'application/octet-stream'
+
+    # ---- 构建 ----
+    def iter_sources(self):
+        for directory in self.asset_dirs:
+            root_dir = os.path.join(self.static_dir, directory)
+            for root, _, files in os.walk(root_dir):
+                for filename in sorted(files):
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+
+    def build(self):
+        """写入带哈希的文件及其 gzip/brotli 版本，返回 manifest"""
+        assets = {}
+        for logical in self.iter_sources():
+            entry = self.entry(logical)
+            with open(entry['path'], 'rb') as f:
+                raw = f.read()
+            target = os.path.join(self.dist_dir, *entry['name'].split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(raw)
+            record = {'hash': entry['hash'], 'name': entry['name'], 'bytes': len(raw), 'encodings': {}}
+            if len(raw) >= MIN_COMPRESS_BYTES:
+                for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+                    data = compress(raw, encoding)
+                    if data is None or len(data) >= len(raw):
+                        continue
+                    with open(target + suffix, 'wb') as f:
+                        f.write(data)
+                    record['encodings'][encoding] = len(data)
+            assets[logical] = record
+        os.makedirs(self.dist_dir, exist_ok=True)
+        with open(os.path.join(self.dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump({'assets': assets}, f, ensure_ascii=False, indent=2)
+        self.manifest = assets
+        with self._lock:
+            self._compressed.clear()
+        return assets
+
+    def clean(self):
+        """删除 manifest 中已不再引用的构建产物，返回删除的文件数"""
+        keep = {MANIFEST_NAME}
+        for record in self.manifest.values():
+            keep.add(record['name'])
+            keep.update(record['name'] + ('.br' if e == 'br' else '.gz') for e in record['encodings'])
+        removed = 0
+        for root, _, files in os.walk(self.dist_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if os.path.relpath(path, self.dist_dir).replace(os.sep, '/') not in keep:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+def init_app(app, pipeline):
+    """注册 asset_url 模板函数与 /assets/<文件名> 路由"""
+    from flask import request, url_for
+
+    def asset_url(filename):
+        name = pipeline.url_path(filename)
+        if name is None:
+            return url_for('static', filename=filename)
+        return url_for('asset', filename=name)
+
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        try:
+            entry, current = pipeline.resolve(filename)
+        except AssetError:
+            return app.response_class('not found\n', status=404, mimetype='text/plain')
+        encoding = pipeline.negotiate(entry, request.accept_encodings)
+        data, used = pipeline.body(entry, encoding)
+        response = app.response_class(data, mimetype=pipeline.mimetype(entry))
+        if used:
+            response.headers['Content-Encoding'] = used
+        response.headers['Vary'] = 'Accept-Encoding'
+        # 请求的哈希与当前内容不一致（旧页面引用旧版本）时返回当前内容，但不允许长期缓存
+        response.headers['Cache-Control'] = LONG_CACHE if current else 'no-cache'
+        response.set_etag(f'{entry["hash"]}-{used or "identity"}')
+        return response.make_conditional(request)
+
+    return asset_url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='静态资源指纹与预压缩')
+    parser.add_argument('--clean', action='store_true', help='构建后删除旧版本产物')
+    args = parser.parse_args(argv)
+    pipeline = AssetPipeline()
+    assets = pipeline.build()
+    raw = sum(r['bytes'] for r in assets.values())
+    gz = sum(r['encodings'].get('gzip', r['bytes']) for r in assets.values())
+    br = sum(r['encodings'].get('br', r['encodings'].get('gzip', r['bytes'])) for r in assets.values())
+    for logical, record in assets.items():
+        sizes = ', '.join(f'{e} {n}' for e, n in record['encodings'].items())
+        print(f'{logical} -> {record["name"]} ({record["bytes"]} 字节{"; " + sizes if sizes else ""})')
+    if brotli is None:
+        print(f'共 {len(assets)} 个文件：原始 {raw} 字节，gzip {gz} 字节')
+        print('未安装 brotli，只生成了 gzip 版本（pip install brotli）')
+    else:
+        print(f'共 {len(assets)} 个文件：原始 {raw} 字节，gzip {gz} 字节，brotli {br} 字节')
+    if args.clean:
+        print(f'已删除 {pipeline.clean()} 个旧版本文件')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
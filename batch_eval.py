@@ -0,0 +1,233 @@
+# batch_eval.py
+"""场景蒙特卡洛批量评估
+
+同一场景按显式种子重复运行多次无界面仿真，通过进程池并行执行，
+汇总击毁率、各武器弹药消耗、清场时间分布及置信区间；
+当击毁率置信区间足够窄时提前停止，避免继续消耗 CPU。
+
+命令行用法：
+    python batch_eval.py <scenario_id> -n 500 --seed 0 --ci 0.01
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import multiprocessing
+
+import numpy as np
+
+from db import DB_PATH, open_connection
+from scenario_data import load_scenario
+from simulation_engine import (
+    WEAPON_CODES, DEFAULT_MAX_TIME_S, DEFAULT_TIME_STEP_S,
+    load_weapon_config, load_enemy_config, run_simulation
+)
+
+Z_95 = 1.96
+DEFAULT_REPLICATIONS = 100
+MAX_REPLICATIONS = 10000
+DEFAULT_MIN_REPLICATIONS = 20
+TIME_HISTOGRAM_BINS = 10
+# 进程池用 spawn 启动：fork 会复制调用方的线程与锁状态，在多线程的 Web 进程中可能死锁
+POOL_START_METHOD = 'spawn'
+
+# 进程池工作进程内共享的仿真输入，由初始化函数一次性设置
+_worker_state = {}
+
+
+def _init_worker(scenario_data, weapon_config, enemy_config, max_time_s, time_step_s):
+    _worker_state.update({
+        'scenario_data': scenario_data,
+        'weapon_config': weapon_config,
+        'enemy_config': enemy_config,
+        'max_time_s': max_time_s,
+        'time_step_s': time_step_s
+    })
+
+
+def _run_replication(seed):
+    state = _worker_state
+    summary = run_simulation(
+        state['scenario_data'],
+        seed=seed,
+        max_time_s=state['max_time_s'],
+        time_step_s=state['time_step_s'],
+        weapon_config=state['weapon_config'],
+        enemy_config=state['enemy_config']
+    )
+    summary['seed'] = seed
+    return summary
+
+
+def describe(values):
+    """均值、标准差与 95% 置信区间（正态近似）"""
+    arr = np.asarray(values, dtype=np.float64)
+    n = arr.size
+    if n == 0:
+        return {'n': 0, 'mean': None, 'std': None, 'ci95': None, 'half_width': None}
+    mean = float(arr.mean())
+    std = float(arr.std(ddof=1)) if n > 1 else 0.0
+    half_width = Z_95 * std / math.sqrt(n) if n > 1 else math.inf
+    return {
+        'n': int(n),
+        'mean': round(mean, 6),
+        'std': round(std, 6),
+        'ci95': [round(mean - half_width, 6), round(mean + half_width, 6)] if n > 1 else None,
+        'half_width': round(half_width, 6) if n > 1 else None
+    }
+
+
+def _kill_ratios(results):
+    return [r['kills'] / r['initial_enemy_count'] if r['initial_enemy_count'] else 1.0 for r in results]
+
+
+def _time_distribution(times):
+    stats = describe(times)
+    if not times:
+        return stats
+    arr = np.asarray(times, dtype=np.float64)
+    stats['min'] = float(arr.min())
+    stats['max'] = float(arr.max())
+    stats['percentiles'] = {
+        f'p{q}': round(float(v), 3) for q, v in zip((5, 25, 50, 75, 95), np.percentile(arr, [5, 25, 50, 75, 95]))
+    }
+    counts, edges = np.histogram(arr, bins=TIME_HISTOGRAM_BINS)
+    stats['histogram'] = {'counts': counts.tolist(), 'edges': [round(float(e), 3) for e in edges]}
+    return stats
+
+
+def aggregate_results(results):
+    """将多次仿真的战果汇总为统计结果"""
+    shots = sum(r['shots'] for r in results)
+    hits = sum(r['hits'] for r in results)
+    reasons = {}
+    for r in results:
+        reasons[r['reason']] = reasons.get(r['reason'], 0) + 1
+    clear_times = [r['time_to_clear_s'] for r in results if r['time_to_clear_s'] is not None]
+    munitions = {}
+    for code in WEAPON_CODES:
+        usage = [r['ammo_usage'].get(code, 0) for r in results]
+        munitions[code] = {'total': int(sum(usage)), **describe(usage)}
+    return {
+        'replications': len(results),
+        'kill_ratio': describe(_kill_ratios(results)),
+        'clear_rate': describe([1.0 if r['time_to_clear_s'] is not None else 0.0 for r in results]),
+        'time_to_clear_s': _time_distribution(clear_times),
+        'munition_usage': munitions,
+        'hit_rate': round(hits / shots, 6) if shots else None,
+        'end_reasons': reasons
+    }
+
+
+def _ci_is_tight(results, ci_half_width, min_replications):
+    if not ci_half_width or len(results) < max(min_replications, 2):
+        return False
+    half_width = describe(_kill_ratios(results))['half_width']
+    return half_width is not None and half_width <= ci_half_width
+
+
+def evaluate_scenario(scenario_data, replications=DEFAULT_REPLICATIONS, base_seed=0, seeds=None,
+                      workers=None, ci_half_width=None, min_replications=DEFAULT_MIN_REPLICATIONS,
+                      max_time_s=DEFAULT_MAX_TIME_S, time_step_s=DEFAULT_TIME_STEP_S):
+    """对场景执行蒙特卡洛评估
+
+    seeds 为空时使用 base_seed, base_seed+1, ... 共 replications 个种子；
+    ci_half_width 给定时，击毁率 95% 置信区间半宽不超过该值即提前停止。
+    进程数不超过 CPU 核数与种子数。
+    """
+    if seeds is None:
+        seeds = [base_seed + i for i in range(replications)]
+    seeds = [int(s) for s in seeds][:MAX_REPLICATIONS]
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, cores, len(seeds) or 1))
+    init_args = (scenario_data, load_weapon_config(), load_enemy_config(), max_time_s, time_step_s)
+    # 每完成一轮（约为进程数的整数倍）检查一次置信区间
+    check_every = max(workers * 2, 1)
+
+    started = time.perf_counter()
+    results = []
+    stopped_early = False
+    if workers == 1:
+        _init_worker(*init_args)
+        for seed in seeds:
+            results.append(_run_replication(seed))
+            if len(results) % check_every == 0 and _ci_is_tight(results, ci_half_width, min_replications):
+                stopped_early = len(results) < len(seeds)
+                break
+    else:
+        context = multiprocessing.get_context(POOL_START_METHOD)
+        with context.Pool(processes=workers, initializer=_init_worker, initargs=init_args) as pool:
+            # imap 保证结果按种子顺序返回，提前停止的位置可复现
+            for summary in pool.imap(_run_replication, seeds):
+                results.append(summary)
+                if len(results) % check_every == 0 and _ci_is_tight(results, ci_half_width, min_replications):
+                    stopped_early = len(results) < len(seeds)
+                    pool.terminate()
+                    break
+
+    report = aggregate_results(results)
+    report.update({
+        'seeds': [r['seed'] for r in results],
+        'requested_replications': len(seeds),
+        'stopped_early': stopped_early,
+        'ci_half_width_target': ci_half_width,
+        'workers': workers,
+        'wall_time_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='场景蒙特卡洛批量评估')
+    parser.add_argument('scenario_id', type=int, help='场景ID')
+    parser.add_argument('-n', '--replications', type=int, default=DEFAULT_REPLICATIONS, help='仿真次数')
+    parser.add_argument('--seed', type=int, default=0, help='起始随机种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认等于CPU核数')
+    parser.add_argument('--ci', type=float, default=None, help='击毁率置信区间半宽阈值，达到后提前停止')
+    parser.add_argument('--min-replications', type=int, default=DEFAULT_MIN_REPLICATIONS, help='提前停止前的最少次数')
+    parser.add_argument('--max-time', type=float, default=DEFAULT_MAX_TIME_S, help='单次最长仿真时长（秒）')
+    parser.add_argument('--time-step', type=float, default=DEFAULT_TIME_STEP_S, help='仿真步长（秒）')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    parser.add_argument('--seeds-file', default=None, help='JSON 种子列表，给定时忽略 -n 与 --seed')
+    parser.add_argument('--output', default=None, help='报告写入该文件（默认输出到标准输出）')
+    args = parser.parse_args(argv)
+
+    conn = open_connection(args.db)
+    scenario_data = load_scenario(conn, args.scenario_id)
+    conn.close()
+    if not scenario_data:
+        print(f'场景不存在: {args.scenario_id}', file=sys.stderr)
+        return 1
+
+    seeds = None
+    if args.seeds_file:
+        with open(args.seeds_file, 'r', encoding='utf-8') as f:
+            seeds = json.load(f)
+    report = evaluate_scenario(
+        scenario_data,
+        replications=args.replications,
+        base_seed=args.seed,
+        seeds=seeds,
+        workers=args.workers,
+        ci_half_width=args.ci,
+        min_replications=args.min_replications,
+        max_time_s=args.max_time,
+        time_step_s=args.time_step
+    )
+    report['scenario_id'] = args.scenario_id
+    if args.output:
+        # 先写临时文件再改名，读取方不会看到写了一半的报告
+        tmp_path = args.output + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False)
+        os.replace(tmp_path, args.output)
+        print(f'报告已写入 {args.output}')
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
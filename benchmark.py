@@ -0,0 +1,436 @@
+# benchmark.py
+"""生产规模下的性能基准
+
+在临时目录中复制当前数据库结构，按参数生成合成数据：
+- 场景：指定数量，每个场景的我方无人机数与各类敌方单位数可配置
+- 模型目录：models/<类别>/seed-*/ 下的 config.json 与长 progress.txt
+- 日志：预先写入指定行数的当日日志文件
+
+然后用 Flask 测试客户端对热点路径计时（同步模型目录、/pipeline、/api/scenario/<id>、
+/api/models、日志写入、创建/编辑场景），结果写入 JSON 文件；传入 --compare 时与
+基线文件逐项对比中位数，超过容差的项记为回退并以退出码 1 结束，便于在提交前发现性能回退。
+
+命令行用法：
+    python benchmark.py --scenarios 2000 --models 300 -o benchmark_results.json
+    python benchmark.py --compare benchmark_baseline.json --tolerance 0.25
+    python benchmark.py --enemies tank=200,military_base=5 --only api_scenario_cold,create_scenario
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from scenario_data import ENEMY_UNIT_COLUMNS, ENEMY_UNIT_TYPES
+
+DEFAULT_SCENARIOS = 2000
+DEFAULT_DRONES = 20
+DEFAULT_ENEMIES = {
+    'reconnaissance_drone': 10,
+    'attack_helicopter': 10,
+    'tank': 20,
+    'armored_vehicle': 20,
+    'military_base': 2
+}
+DEFAULT_MODELS = 300
+DEFAULT_PROGRESS_POINTS = 2000
+DEFAULT_LOG_LINES = 200000
+DEFAULT_REPEAT = 30
+DEFAULT_TOLERANCE = 0.2
+# 台湾海峡附近的经纬度范围
+LAT_RANGE = (22.0, 26.0)
+LNG_RANGE = (118.0, 122.0)
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_enemy_counts(text):
+    """解析 "tank=50,military_base=3"，未列出的类型使用默认数量"""
+    counts = dict(DEFAULT_ENEMIES)
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        unit_type, _, value = part.partition('=')
+        unit_type = unit_type.strip()
+        if unit_type not in ENEMY_UNIT_TYPES:
+            raise ValueError(f'未知的敌方单位类型: {unit_type}')
+        counts[unit_type] = int(value)
+    return counts
+
+
+# ---- 合成数据 ----
+def random_position(rng):
+    return round(rng.uniform(*LAT_RANGE), 6), round(rng.uniform(*LNG_RANGE), 6)
+
+
+def synthetic_units(rng, drones, enemy_counts):
+    """生成与场景编辑页提交格式一致的 (our_drones, enemy_units)"""
+    our_drones = []
+    for i in range(drones):
+        lat, lng = random_position(rng)
+        our_drones.append({
+            'id': i + 1, 'code': f'UAV-{i + 1:03d}', 'lat': lat, 'lng': lng, 'altitude': 100,
+            'ar1': rng.randint(0, 4), 'pl10': rng.randint(0, 4), 'cannon': rng.randint(0, 200)
+        })
+    enemy_units = []
+    for unit_type, count in enemy_counts.items():
+        for i in range(count):
+            lat, lng = random_position(rng)
+            enemy_units.append({'type': unit_type, 'code': f'{unit_type[:4].upper()}-{i + 1:03d}',
+                                'lat': lat, 'lng': lng})
+    return our_drones, enemy_units
+
+
+def generate_scenarios(conn, count, drones, enemy_counts, seed=0):
+    """直接写库生成场景及其单位，返回场景 id 列表"""
+    from scenario_cache import bump_revision
+    from scenario_data import enemy_type_counts, normalize_drone_entry, replace_scenario_units, serialize_payload_totals
+
+    rng = random.Random(seed)
+    ids = []
+    for n in range(count):
+        our_drones, enemy_units = synthetic_units(rng, drones, enemy_counts)
+        normalized = [normalize_drone_entry(d, i + 1) for i, d in enumerate(our_drones)]
+        type_counts = enemy_type_counts(enemy_units)
+        cursor = conn.execute(
+            '''INSERT INTO scenarios (
+                name, description, scenario_type, created_by, our_drone_count, our_drone_payloads,
+                enemy_reconnaissance_drones, enemy_attack_helicopters, enemy_tanks,
+                enemy_armored_vehicles, enemy_military_bases, enemy_total
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (f'基准场景-{seed}-{n:05d}', '性能基准合成数据', 'custom', 'benchmark', len(normalized),
+             serialize_payload_totals(normalized),
+             *[type_counts[count_col] for _, count_col, _, _, _ in ENEMY_UNIT_COLUMNS],
+             sum(type_counts.values()))
+        )
+        replace_scenario_units(conn, cursor.lastrowid, normalized, enemy_units)
+        ids.append(cursor.lastrowid)
+    bump_revision(conn)
+    conn.commit()
+    return ids
+
+
+def generate_model_runs(model_root, count, progress_points, seed=0):
+    """生成训练目录：config.json 与 progress_points 行 "step,reward" 的 progress.txt"""
+    from model_registry import MODEL_CATEGORIES
+
+    rng = random.Random(seed)
+    categories = list(MODEL_CATEGORIES)
+    for n in range(count):
+        category = categories[n % len(categories)]
+        run_dir = os.path.join(model_root, category, f'seed-{n:05d}-2025-01-01-00-00-{n % 60:02d}')
+        os.makedirs(run_dir, exist_ok=True)
+        config = {
+            'main_args': {'algo': 'mappo', 'env': 'myenv', 'exp_name': f'bench-{n}', 'load_config': ''},
+            'env_args': {'scenario': 'multi-uav', 'num_agents': 3},
+            'algo_args': {
+                'algo': {'clip_param': 0.2, 'gamma': 0.99, 'ppo_epoch': 5},
+                'model': {'lr': 0.0005, 'hidden_sizes': [128, 128]},
+                'train': {'num_env_steps': progress_points * 1000}
+            }
+        }
+        with open(os.path.join(run_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4)
+        reward = rng.uniform(0, 50)
+        lines = []
+        for i in range(1, progress_points + 1):
+            reward += rng.gauss(0.05, 1.0)
+            lines.append(f'{i * 1000},{reward:.6f}\n')
+        with open(os.path.join(run_dir, 'progress.txt'), 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+
+
+def generate_logs(logs_dir, lines):
+    """预先写入当日日志文件，衡量日志文件较大时的追加写入"""
+    os.makedirs(logs_dir, exist_ok=True)
+    path = os.path.join(logs_dir, f'simulation_{datetime.now().strftime("%Y%m%d")}.txt')
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    chunk = [f'[{stamp}] [INFO] [benchmark] 合成日志第 {i} 行\n' for i in range(10000)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for start in range(0, lines, len(chunk)):
+            f.writelines(chunk[:min(len(chunk), lines - start)])
+
+
+# ---- 计时 ----
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    n = len(ordered)
+
+    def pct(p):
+        return round(ordered[min(n - 1, int(round(p * (n - 1))))], 3)
+
+    return {
+        'n': n,
+        'mean_ms': round(sum(ordered) / n, 3),
+        'p50_ms': pct(0.5),
+        'p95_ms': pct(0.95),
+        'min_ms': round(ordered[0], 3),
+        'max_ms': round(ordered[-1], 3)
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def _check(response, expected=(200,), location=None):
+    if response.status_code not in expected:
+        raise RuntimeError(f'{response.request.path} 返回 {response.status_code}')
+    # 表单接口出错时同样以重定向返回，按跳转地址区分成功与失败
+    if location and not response.headers.get('Location', '').endswith(location):
+        raise RuntimeError(f'{response.request.path} 未成功，跳转到 {response.headers.get("Location")}')
+    return response
+
+
+def run_cases(app_module, application, scenario_ids, args, only=None):
+    """依次执行各计时项，返回 {名称: 统计}"""
+    client = application.test_client()
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['username'] = 'benchmark'
+    rng = random.Random(args.seed + 1)
+    enemy_counts = parse_enemy_counts(args.enemies)
+    repeat = args.repeat
+    results = {}
+
+    def want(name):
+        return not only or name in only
+
+    if want('sync_models_cold'):
+        # 首次全量扫描：解析全部 config.json 并导入全部 progress.txt
+        results['sync_models_cold'] = timed(lambda i: app_module.sync_models_from_fs(force=True), 1)
+    if want('sync_models_warm'):
+        registry = app_module.model_registry
+        saved = registry.check_interval_s
+        registry.check_interval_s = 0
+        results['sync_models_warm'] = timed(lambda i: app_module.sync_models_from_fs(), repeat)
+        registry.check_interval_s = saved
+    if want('sync_models_append'):
+        registry = app_module.model_registry
+        saved = registry.check_interval_s
+        registry.check_interval_s = 0
+        runs = registry.snapshot()
+
+        def append_progress(i):
+            with open(runs[i % len(runs)]['progress_path'], 'a', encoding='utf-8') as f:
+                f.write(f'{10 ** 9 + i},1.0\n')
+            app_module.sync_models_from_fs()
+
+        if runs:
+            results['sync_models_append'] = timed(append_progress, repeat)
+        registry.check_interval_s = saved
+    if want('pipeline'):
+        results['pipeline'] = timed(lambda i: _check(client.get('/pipeline')), repeat)
+    if want('api_scenario_cold'):
+        # 每次请求不同场景，且先清空响应缓存
+        sample = rng.sample(scenario_ids, min(repeat, len(scenario_ids)))
+
+        def cold(i):
+            app_module.scenario_cache.invalidate()
+            _check(client.get(f'/api/scenario/{sample[i % len(sample)]}'))
+
+        results['api_scenario_cold'] = timed(cold, repeat)
+    if want('api_scenario_cached'):
+        scenario_id = scenario_ids[0]
+        _check(client.get(f'/api/scenario/{scenario_id}'))
+        results['api_scenario_cached'] = timed(lambda i: _check(client.get(f'/api/scenario/{scenario_id}')), repeat)
+    if want('api_scenarios'):
+        results['api_scenarios'] = timed(lambda i: _check(client.get('/api/scenarios')), repeat)
+    if want('api_scenarios_filtered'):
+        # 筛选条件 + 沿游标翻页，每次请求前清空响应缓存
+        state = {'cursor': ''}
+
+        def filtered(i):
+            app_module.scenario_cache.invalidate()
+            response = client.get('/api/scenarios', query_string={
+                'created_by': 'benchmark', 'min_enemies': 1, 'limit': 20, 'cursor': state['cursor']})
+            _check(response)
+            state['cursor'] = response.get_json().get('next_cursor') or ''
+
+        results['api_scenarios_filtered'] = timed(filtered, repeat)
+    if want('api_models'):
+        results['api_models'] = timed(lambda i: _check(client.get('/api/models')), repeat)
+    if want('save_log'):
+        results['save_log'] = timed(lambda i: _check(client.post(
+            '/api/save_log', json={'message': f'基准日志 {i}', 'level': 'INFO'})), repeat)
+    if want('save_logs_batch'):
+        entries = [{'message': f'基准批量日志 {j}', 'level': 'INFO'} for j in range(100)]
+        results['save_logs_batch'] = timed(lambda i: _check(client.post(
+            '/api/save_logs', json={'entries': entries})), repeat)
+    if want('create_scenario'):
+        def create(i):
+            our_drones, enemy_units = synthetic_units(rng, args.drones, enemy_counts)
+            _check(client.post('/create_scenario', data={
+                'name': f'基准新建-{args.seed}-{i}-{time.time_ns()}',
+                'description': '性能基准',
+                'our_drones_data': json.dumps(our_drones),
+                'enemy_units_data': json.dumps(enemy_units)
+            }), (302,), '/pipeline')
+
+        results['create_scenario'] = timed(create, repeat)
+    if want('edit_scenario'):
+        sample = rng.sample(scenario_ids, min(repeat, len(scenario_ids)))
+
+        def edit(i):
+            scenario_id = sample[i % len(sample)]
+            our_drones, enemy_units = synthetic_units(rng, args.drones, enemy_counts)
+            _check(client.post(f'/edit_scenario/{scenario_id}', data={
+                'name': f'基准编辑-{args.seed}-{scenario_id}',
+                'description': '性能基准',
+                'our_drones_data': json.dumps(our_drones),
+                'enemy_units_data': json.dumps(enemy_units)
+            }), (302,), '/pipeline')
+
+        results['edit_scenario'] = timed(edit, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """按中位数对比，返回 [(名称, 基线 p50, 当前 p50, 比值, 是否回退)]"""
+    rows = []
+    for name, stats in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] > 0 else float('inf')
+        rows.append((name, base['p50_ms'], stats['p50_ms'], round(ratio, 3), ratio > 1 + tolerance))
+    return rows
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SOURCE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _prepare_workdir(workdir, source_db):
+    """复制数据库结构（不含业务数据）与登录用户到临时目录，缺少的表由应用启动时的迁移创建"""
+    source = sqlite3.connect(source_db)
+    target = sqlite3.connect(os.path.join(workdir, 'webapp.db'))
+    for (sql,) in source.execute(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY type = 'index'"):
+        target.execute(sql)
+    tables = {name for (name,) in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ('users', 'schema_version'):
+        if table not in tables:
+            continue
+        rows = source.execute(f'SELECT * FROM {table}').fetchall()
+        if rows:
+            target.executemany(f'INSERT INTO {table} VALUES ({",".join("?" * len(rows[0]))})', rows)
+    target.commit()
+    target.close()
+    source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生产规模性能基准')
+    parser.add_argument('--scenarios', type=int, default=DEFAULT_SCENARIOS, help='合成场景数量')
+    parser.add_argument('--drones', type=int, default=DEFAULT_DRONES, help='每个场景的我方无人机数量')
+    parser.add_argument('--enemies', default='', help='每个场景各类敌方单位数量，如 tank=50,military_base=3')
+    parser.add_argument('--models', type=int, default=DEFAULT_MODELS, help='合成训练目录数量')
+    parser.add_argument('--progress-points', type=int, default=DEFAULT_PROGRESS_POINTS, help='每个 progress.txt 的行数')
+    parser.add_argument('--log-lines', type=int, default=DEFAULT_LOG_LINES, help='预先写入的当日日志行数')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每项计时的请求次数')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据随机种子')
+    parser.add_argument('--only', default='', help='只运行指定计时项，逗号分隔')
+    parser.add_argument('--db', default=os.path.join(SOURCE_DIR, 'webapp.db'), help='复制表结构的数据库')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='结果 JSON 文件')
+    parser.add_argument('--compare', default=None, help='基线 JSON 文件，按中位数对比')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='允许的中位数变慢比例')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录以便排查')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    only = {name.strip() for name in args.only.split(',') if name.strip()}
+    workdir = tempfile.mkdtemp(prefix='webapp-bench-')
+    origin = os.getcwd()
+    try:
+        _prepare_workdir(workdir, args.db)
+        # 应用使用相对路径访问数据库、models/ 与 logs/，切换目录后再导入
+        os.chdir(workdir)
+        sys.path.insert(0, SOURCE_DIR)
+        started = time.perf_counter()
+        import app as app_module
+        # 合成数据在之后生成，这里不预热缓存，冷启动同步单独计时
+        application = app_module.create_app({'WARM_CACHES': False})
+        import_ms = (time.perf_counter() - started) * 1000
+
+        conn = app_module.db.pool.connection()
+        started = time.perf_counter()
+        scenario_ids = generate_scenarios(conn, args.scenarios, args.drones, parse_enemy_counts(args.enemies), args.seed)
+        conn.close()
+        generate_model_runs('models', args.models, args.progress_points, args.seed)
+        generate_logs('logs', args.log_lines)
+        generate_s = time.perf_counter() - started
+        print(f'合成数据生成完成: {args.scenarios} 个场景, {args.models} 个模型目录, '
+              f'{args.log_lines} 行日志, 用时 {generate_s:.1f}s')
+
+        results = {'app_import': summarize([import_ms])}
+        results.update(run_cases(app_module, application, scenario_ids, args, only))
+        app_module.shutdown_background_services()
+    finally:
+        os.chdir(origin)
+        if args.keep:
+            print(f'临时目录: {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'params': {
+                'scenarios': args.scenarios,
+                'drones': args.drones,
+                'enemies': parse_enemy_counts(args.enemies),
+                'models': args.models,
+                'progress_points': args.progress_points,
+                'log_lines': args.log_lines,
+                'repeat': args.repeat,
+                'seed': args.seed
+            }
+        },
+        'results': results
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f'{"项目":<22}{"中位数ms":>12}{"P95ms":>12}{"次数":>8}')
+    for name, stats in results.items():
+        print(f'{name:<24}{stats["p50_ms"]:>12}{stats["p95_ms"]:>12}{stats["n"]:>8}')
+    print(f'结果已写入 {output}')
+
+    if not baseline_path:
+        return 0
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('params') != report['meta']['params']:
+        print('注意: 基线使用的数据规模参数与本次不同，对比结果仅供参考')
+    regressions = 0
+    print(f'\n与基线 {baseline.get("meta", {}).get("git_revision")} 对比（容差 {args.tolerance:.0%}）:')
+    for name, base_p50, p50, ratio, regressed in compare(results, baseline, args.tolerance):
+        regressions += regressed
+        print(f'{name:<24}{base_p50:>12}{p50:>12}{ratio:>8}x{"  回退" if regressed else ""}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
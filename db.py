@@ -0,0 +1,193 @@
+# db.py
+"""SQLite 访问层：连接池、WAL 模式与请求级连接复用
+
+- 连接在池中长期保留，sqlite3 自带的预编译语句缓存（cached_statements）得以跨请求复用
+- 新连接统一设置 WAL 日志模式与 synchronous/cache_size/mmap_size 等参数，写操作不再阻塞读
+- Flask 请求内多次获取连接返回同一个连接，请求结束时由 teardown 归还连接池
+- 通过连接代理执行的语句按类型计入 metrics 的次数与耗时
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import g, has_app_context
+
+import metrics
+
+DB_PATH = 'webapp.db'
+# 等待写锁的最长时间（秒）
+BUSY_TIMEOUT_S = 5.0
+# 每个连接缓存的预编译语句数量
+CACHED_STATEMENTS = 256
+# 池中保留的空闲连接上限，超出部分直接关闭
+MAX_IDLE_CONNECTIONS = 8
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),       # 约 16MB 页缓存
+    ('mmap_size', 268435456),     # 256MB 内存映射读
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', int(BUSY_TIMEOUT_S * 1000)),
+)
+
+
+def open_connection(path=DB_PATH):
+    """创建一个已设置 row_factory 与 PRAGMA 的新连接"""
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_S,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row  # 使行可以通过列名访问
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def is_busy_error(exc):
+    """判断异常是否为数据库被锁/繁忙"""
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class PooledConnection:
+    """连接代理：close() 把连接归还连接池而不是真正关闭；execute/executemany/commit 计入 SQL 指标"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return self._conn.execute(sql, parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        cursor = None
+        try:
+            cursor = self._conn.executemany(sql, seq_of_parameters)
+            return cursor
+        finally:
+            # 按实际影响的行数计数，批量写入与逐条写入可直接比较
+            rows = cursor.rowcount if cursor is not None and cursor.rowcount > 0 else 1
+            metrics.observe_sql(sql, time.perf_counter() - started, rows)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            metrics.observe_sql('COMMIT', time.perf_counter() - started)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+
+class RequestConnection(PooledConnection):
+    """请求内共享的连接：close() 为空操作，由 teardown 统一归还"""
+
+    def close(self):
+        pass
+
+    def release(self):
+        PooledConnection.close(self)
+
+
+class ConnectionPool:
+    """线程安全的连接池，空池时直接新建连接，不阻塞请求"""
+
+    def __init__(self, path=DB_PATH, max_idle=MAX_IDLE_CONNECTIONS):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+
+    def _check_fork(self):
+        # fork 出的子进程不能复用父进程的连接
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = queue.LifoQueue()
+                    self._pid = os.getpid()
+
+    def acquire(self):
+        self._check_fork()
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.stats['reused'] += 1
+            return conn
+        except queue.Empty:
+            pass
+        conn = open_connection(self.path)
+        with self._lock:
+            self.stats['created'] += 1
+        return conn
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        try:
+            # 未提交的事务不能带回池中，与直接关闭连接时的行为保持一致
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        if self._idle.qsize() >= self.max_idle:
+            conn.close()
+            with self._lock:
+                self.stats['discarded'] += 1
+            return
+        self._idle.put(conn)
+
+    def connection(self):
+        """从池中取出连接，调用 close() 即归还"""
+        return PooledConnection(self, self.acquire())
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, idle=self._idle.qsize())
+
+
+pool = ConnectionPool()
+
+
+def get_db_connection():
+    """获取数据库连接：请求内复用同一连接，请求外使用独立的池连接"""
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = g._db_conn = RequestConnection(pool, pool.acquire())
+        return conn
+    return pool.connection()
+
+
+def close_request_connection(exc=None):
+    """应用上下文结束时归还请求连接"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+
+def init_app(app):
+    app.teardown_appcontext(close_request_connection)
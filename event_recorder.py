@@ -0,0 +1,322 @@
+# event_recorder.py
+"""仿真事件的定长二进制记录与按时间回放
+
+每个事件是 24 字节的定长记录（numpy 结构化数组），按仿真时间顺序追加到每次运行
+单独的文件中；每 INDEX_EVERY 条记录保存一个 (时间, 记录序号) 稀疏索引点，
+回放时二分查找索引即可定位到任意时刻，无需从头扫描。
+每次写完一个记录文件后，目录中的记录超过 RECORDINGS_MAX_KEEP 个或总大小超过
+RECORDINGS_MAX_BYTES 时按修改时间删除最旧的记录。
+
+文件结构：
+    头部    MAGIC | 版本 | 记录长度 | 元数据长度 | 元数据 JSON（单位编号、类型、种子等）
+    记录区  连续的定长记录
+    尾部    稀疏索引（float64 时间 + int64 序号）| 索引点数 | 记录总数 | 记录区起始偏移 | MAGIC
+"""
+import json
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'EVR1'
+FORMAT_VERSION = 1
+RECORDINGS_DIR = 'recordings'
+FILE_SUFFIX = '.evr'
+INDEX_EVERY = 4096
+BUFFER_RECORDS = 65536
+# 默认每隔多少仿真秒记录一次全部单位的位置
+DEFAULT_MOVE_INTERVAL_S = 10.0
+DEFAULT_MAX_KEEP = 200
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f4'),        # 仿真时间（秒）
+    ('kind', 'u1'),      # 事件类型
+    ('side', 'u1'),      # 0 我方，1 敌方
+    ('weapon', 'i1'),    # 武器下标，-1 表示无
+    ('flags', 'u1'),     # 射击结果标志位
+    ('unit', '<i4'),     # 单位下标
+    ('target', '<i4'),   # 目标下标，-1 表示无
+    ('lat', '<f4'),
+    ('lng', '<f4'),
+])
+
+KIND_MOVE = 1
+KIND_ASSIGN = 2
+KIND_SHOT = 3
+KIND_KILL = 4
+KIND_NAMES = {KIND_MOVE: 'move', KIND_ASSIGN: 'assign', KIND_SHOT: 'shot', KIND_KILL: 'kill'}
+SIDE_OUR = 0
+SIDE_ENEMY = 1
+FLAG_HIT = 1
+FLAG_DESTROYED = 2
+
+_HEADER = struct.Struct('<4sHHI')
+_TRAILER = struct.Struct('<QQQ4s')
+_INDEX_DTYPE = np.dtype([('t', '<f8'), ('record', '<i8')])
+_RUN_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class RecordingError(Exception):
+    """记录文件不存在或格式错误"""
+
+
+def recording_path(run_id, directory=RECORDINGS_DIR):
+    if not _RUN_ID_RE.match(run_id or ''):
+        raise RecordingError('无效的记录编号')
+    return os.path.join(directory, run_id + FILE_SUFFIX)
+
+
+def prune_recordings(directory=RECORDINGS_DIR, max_keep=None, max_bytes=None):
+    """保留最新的记录文件，超过个数或总大小上限的旧记录被删除，返回删除的文件数"""
+    max_keep = int(max_keep or os.environ.get('RECORDINGS_MAX_KEEP', DEFAULT_MAX_KEEP))
+    max_bytes = int(max_bytes or os.environ.get('RECORDINGS_MAX_BYTES', DEFAULT_MAX_BYTES))
+    files = []
+    try:
+        for entry in os.scandir(directory):
+            if entry.name.endswith(FILE_SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return 0
+    files.sort(reverse=True)
+    removed = 0
+    total = 0
+    for rank, (_, size, path) in enumerate(files):
+        total += size
+        # 最新的一个总是保留
+        if rank == 0 or (rank < max_keep and total <= max_bytes):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class EventRecorder:
+    """顺序写入事件记录，内存中只保留一个定长缓冲区"""
+
+    def __init__(self, path, metadata=None, move_interval_s=DEFAULT_MOVE_INTERVAL_S,
+                 index_every=INDEX_EVERY, buffer_records=BUFFER_RECORDS):
+        self.path = path
+        self.move_interval_s = move_interval_s
+        self.index_every = index_every
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path + '.tmp', 'wb')
+        meta = json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8')
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, len(meta)))
+        self._file.write(meta)
+        self._data_offset = self._file.tell()
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self._used = 0
+        self._count = 0
+        self._index = []
+        self._last_t = -np.inf
+
+    @property
+    def count(self):
+        return self._count + self._used
+
+    def record_many(self, t, kind, side, unit, target=-1, weapon=-1, flags=0, lat=0.0, lng=0.0):
+        """追加一组同一时刻的事件，除 t/kind/side 外的参数可以是标量或等长数组"""
+        unit = np.atleast_1d(np.asarray(unit))
+        n = unit.size
+        if n == 0:
+            return
+        if t < self._last_t:
+            raise ValueError('事件必须按时间顺序记录')
+        self._last_t = t
+        start = 0
+        while start < n:
+            take = min(n - start, len(self._buffer) - self._used)
+            block = self._buffer[self._used:self._used + take]
+            part = slice(start, start + take)
+            block['t'] = t
+            block['kind'] = kind
+            block['side'] = side
+            block['unit'] = unit[part]
+            block['target'] = _part(target, part)
+            block['weapon'] = _part(weapon, part)
+            block['flags'] = _part(flags, part)
+            block['lat'] = _part(lat, part)
+            block['lng'] = _part(lng, part)
+            self._used += take
+            start += take
+            if self._used == len(self._buffer):
+                self._flush()
+
+    def record(self, t, kind, side, unit, target=-1, weapon=-1, flags=0, lat=0.0, lng=0.0):
+        self.record_many(t, kind, side, [unit], target, weapon, flags, lat, lng)
+
+    def _flush(self):
+        if not self._used:
+            return
+        block = self._buffer[:self._used]
+        # 稀疏索引：记录序号为 index_every 整数倍的位置
+        first = -(-self._count // self.index_every) * self.index_every
+        for record in range(first, self._count + self._used, self.index_every):
+            self._index.append((float(block['t'][record - self._count]), record))
+        self._file.write(block.tobytes())
+        self._count += self._used
+        self._used = 0
+
+    def close(self):
+        """写入索引与尾部后原子替换为正式文件"""
+        if self._file is None:
+            return
+        self._flush()
+        index = np.array(self._index, dtype=_INDEX_DTYPE)
+        self._file.write(index.tobytes())
+        self._file.write(_TRAILER.pack(len(index), self._count, self._data_offset, MAGIC))
+        self._file.close()
+        self._file = None
+        os.replace(self.path + '.tmp', self.path)
+        prune_recordings(os.path.dirname(self.path) or '.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def make_records(t, kind, side, unit, target=-1, weapon=-1, flags=0, lat=0.0, lng=0.0):
+    """按 record_many 的参数约定构造一组记录数组，不写文件"""
+    unit = np.atleast_1d(np.asarray(unit))
+    block = np.zeros(unit.size, dtype=RECORD_DTYPE)
+    block['t'] = t
+    block['kind'] = kind
+    block['side'] = side
+    block['unit'] = unit
+    block['target'] = target
+    block['weapon'] = weapon
+    block['flags'] = flags
+    block['lat'] = lat
+    block['lng'] = lng
+    return block
+
+
+def _part(value, part):
+    if np.ndim(value) == 0:
+        return value
+    return np.asarray(value)[part]
+
+
+class EventReader:
+    """按时间定位与分块读取记录文件"""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise RecordingError('记录不存在')
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, record_size, meta_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+                raise RecordingError('记录文件格式不支持')
+            self.metadata = json.loads(f.read(meta_len).decode('utf-8') or '{}')
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            index_count, self.record_count, self.data_offset, tail = _TRAILER.unpack(f.read(_TRAILER.size))
+            if tail != MAGIC:
+                raise RecordingError('记录文件不完整')
+            f.seek(self.data_offset + self.record_count * RECORD_DTYPE.itemsize)
+            self.index = np.frombuffer(f.read(index_count * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)
+            self.duration_s = 0.0
+            if self.record_count:
+                f.seek(self.data_offset + (self.record_count - 1) * RECORD_DTYPE.itemsize)
+                self.duration_s = float(np.frombuffer(f.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)['t'][0])
+
+    def _read(self, f, first, count):
+        f.seek(self.data_offset + first * RECORD_DTYPE.itemsize)
+        return np.frombuffer(f.read(count * RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)
+
+    def seek(self, t, f=None):
+        """返回第一条时间 >= t 的记录序号"""
+        if self.record_count == 0:
+            return 0
+        pos = int(np.searchsorted(self.index['t'], t, side='left')) - 1
+        first = int(self.index['record'][pos]) if pos >= 0 else 0
+        own = f is None
+        f = f or open(self.path, 'rb')
+        try:
+            # 索引点之间最多 index_every 条记录，读一段即可定位
+            while first < self.record_count:
+                block = self._read(f, first, min(INDEX_EVERY, self.record_count - first))
+                offset = int(np.searchsorted(block['t'], np.float32(t), side='left'))
+                if offset < len(block):
+                    return first + offset
+                first += len(block)
+            return self.record_count
+        finally:
+            if own:
+                f.close()
+
+    def iter_chunks(self, start_s=0.0, end_s=None, chunk=INDEX_EVERY):
+        """按块产出 [start_s, end_s] 范围内的记录数组"""
+        with open(self.path, 'rb') as f:
+            first = self.seek(start_s, f)
+            while first < self.record_count:
+                block = self._read(f, first, min(chunk, self.record_count - first))
+                if end_s is not None and block['t'][-1] > end_s:
+                    block = block[:int(np.searchsorted(block['t'], np.float32(end_s), side='right'))]
+                    if len(block):
+                        yield block
+                    return
+                yield block
+                first += len(block)
+
+    def describe(self):
+        return {
+            'metadata': self.metadata,
+            'record_count': int(self.record_count),
+            'record_bytes': RECORD_DTYPE.itemsize,
+            'duration_s': round(self.duration_s, 3),
+            'index_points': int(len(self.index)),
+            'file_bytes': os.path.getsize(self.path)
+        }
+
+
+def decode_records(block):
+    """把记录数组转换为 JSON 友好的字典列表"""
+    events = []
+    for rec in block.tolist():
+        t, kind, side, weapon, flags, unit, target, lat, lng = rec
+        event = {'t': round(t, 3), 'kind': KIND_NAMES.get(kind, kind), 'side': 'our' if side == SIDE_OUR else 'enemy',
+                 'unit': unit}
+        if kind == KIND_MOVE:
+            event['lat'] = round(lat, 6)
+            event['lng'] = round(lng, 6)
+        elif kind == KIND_ASSIGN:
+            event['target'] = target
+        elif kind == KIND_SHOT:
+            event.update(target=target, weapon=weapon, hit=bool(flags & FLAG_HIT),
+                         destroyed=bool(flags & FLAG_DESTROYED))
+        elif kind == KIND_KILL:
+            event['by'] = target
+        events.append(event)
+    return events
+
+
+def replay(reader, start_s=0.0, end_s=None, speed=0.0, kinds=None, sleep=time.sleep):
+    """按仿真时间回放事件，speed 为倍速（0 表示不等待，尽快输出），产出事件字典列表"""
+    wall_start = time.monotonic()
+    for block in reader.iter_chunks(start_s, end_s):
+        if kinds:
+            block = block[np.isin(block['kind'], kinds)]
+        if not len(block):
+            continue
+        if speed <= 0:
+            yield decode_records(block)
+            continue
+        # 按相同时间戳分组，组与组之间按倍速等待
+        times = block['t']
+        bounds = np.flatnonzero(np.diff(times)) + 1
+        for group in np.split(block, bounds):
+            due = (float(group['t'][0]) - start_s) / speed
+            delay = due - (time.monotonic() - wall_start)
+            if delay > 0:
+                sleep(delay)
+            yield decode_records(group)
@@ -0,0 +1,590 @@
+# job_runner.py
+"""后台训练任务
+
+/model/train 提交的任务写入 train_jobs 表后立即返回，由调度线程按并发上限启动训练子进程：
+
+- 每个任务生成 models/<类别>/seed-XXXXX-<时间>/ 目录，写入合并了表单超参数的 config.json
+  与场景数据 scenario.json；训练程序向该目录的 progress.txt 追加 "step,reward" 行，
+  标准输出与错误输出写入 train.log
+- 训练命令由环境变量 TRAIN_COMMAND 提供（如 "python train.py --load_config {config}"），
+  可用占位符 {config} {run_dir} {progress} {seed} {category}；未配置时拒绝提交
+- 并发上限默认为 CPU 核数 / 每个任务的线程数（TRAIN_THREADS_PER_JOB，同时写入
+  torch_threads 与 OMP_NUM_THREADS），也可用 TRAIN_MAX_JOBS 指定
+- 任务的认领在 IMMEDIATE 事务中完成，多个 Web 进程各自的调度线程不会重复启动同一任务；
+  取消请求写入数据库，由持有子进程的调度线程终止整个进程组
+- 训练期间目录中存在 .training 标记，模型注册表据此显示“训练中”，结束后标记删除，
+  模型管理页在下一次同步时即可看到新模型
+- 大规模蒙特卡洛评估（/api/evaluate）也作为任务提交（类别 evaluation）：在 evaluations/ 下
+  建立任务目录，由同一调度按并发上限启动 batch_eval.py 子进程，结果写入 report.json
+"""
+import json
+import os
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from model_registry import MODEL_ROOT, MODEL_CATEGORIES, TRAINING_MARKER, normalize_config_path
+from progress_store import parse_progress_lines
+
+POLL_INTERVAL_S = 1.0
+# 取消后等待子进程自行退出的时间，超时强制结束
+CANCEL_GRACE_S = 10.0
+DEFAULT_THREADS_PER_JOB = 4
+LOG_FILE = 'train.log'
+PROGRESS_FILE = 'progress.txt'
+EVALUATION_CATEGORY = 'evaluation'
+EVALUATION_ROOT = 'evaluations'
+EVALUATION_REPORT_FILE = 'report.json'
+EVALUATION_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch_eval.py')
+ACTIVE_STATUSES = ('queued', 'running')
+JOB_STATUS_LABELS = {
+    'queued': '排队中',
+    'running': '训练中',
+    'succeeded': '已完成',
+    'failed': '失败',
+    'cancelled': '已取消'
+}
+
+# 表单可覆盖的超参数：(config.algo_args 下的分组, 参数名) -> 类型
+HYPERPARAMETERS = {
+    'algo': {
+        'clip_param': float,
+        'entropy_coef': float,
+        'gamma': float,
+        'gae_lambda': float,
+        'ppo_epoch': int,
+        'actor_num_mini_batch': int,
+        'value_loss_coef': float,
+        'max_grad_norm': float,
+        'use_gae': bool,
+        'use_clipped_value_loss': bool,
+        'use_policy_active_masks': bool,
+    },
+    'model': {
+        'lr': float,
+        'critic_lr': float,
+        'hidden_sizes': list,
+        'activation_func': str,
+        'use_recurrent_policy': bool,
+        'use_feature_normalization': bool,
+        'weight_decay': float,
+        'initialization_method': str,
+        'std_x_coef': float,
+        'std_y_coef': float,
+    }
+}
+
+
+class JobError(Exception):
+    """任务参数无效或训练命令未配置"""
+
+
+def ensure_job_table(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS train_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            scenario_id INTEGER,
+            scenario_name TEXT,
+            seed INTEGER NOT NULL,
+            run_dir TEXT NOT NULL,
+            command TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            last_step INTEGER,
+            total_steps INTEGER,
+            exit_code INTEGER,
+            message TEXT,
+            runner_host TEXT,
+            runner_pid INTEGER,
+            process_pid INTEGER,
+            created_by TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )'''
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_train_jobs_status ON train_jobs(status, id)')
+
+
+def parse_hyperparameters(form):
+    """把表单字符串转换为 {分组: {参数: 值}}，留空的参数不覆盖预设"""
+    overrides = {}
+    for section, fields in HYPERPARAMETERS.items():
+        for name, kind in fields.items():
+            raw = (form.get(name) or '').strip()
+            if not raw:
+                continue
+            try:
+                if kind is bool:
+                    if raw.lower() not in ('true', 'false'):
+                        raise ValueError(raw)
+                    value = raw.lower() == 'true'
+                elif kind is list:
+                    value = [int(part) for part in raw.replace('，', ',').split(',') if part.strip()]
+                    if not value or min(value) <= 0:
+                        raise ValueError(raw)
+                else:
+                    value = kind(raw)
+            except ValueError:
+                raise JobError(f'参数 {name} 的取值无效：{raw}')
+            overrides.setdefault(section, {})[name] = value
+    return overrides
+
+
+def read_last_step(progress_path):
+    """读取 progress.txt 最后一个完整行的步数，只读取文件末尾"""
+    try:
+        with open(progress_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 4096))
+            tail = f.read().decode('utf-8', errors='ignore')
+    except OSError:
+        return None
+    complete = tail[:tail.rfind('\n') + 1] if '\n' in tail else ''
+    points = parse_progress_lines(complete)
+    return points[-1][0] if points else None
+
+
+def read_log_tail(path, max_bytes=8192):
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+    except OSError:
+        return ''
+    text = data.decode('utf-8', errors='replace')
+    # 从文件中间开始读取时丢弃不完整的首行
+    return text.split('\n', 1)[-1] if size > max_bytes else text
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class JobRunner:
+    """训练任务调度：提交、认领、子进程监控与取消"""
+
+    def __init__(self, connect, command=None, max_jobs=None, threads_per_job=None,
+                 model_root=MODEL_ROOT, poll_interval_s=POLL_INTERVAL_S):
+        self._connect = connect
+        self.command = os.environ.get('TRAIN_COMMAND', '') if command is None else command
+        self.workdir = os.environ.get('TRAIN_WORKDIR') or None
+        self.threads_per_job = max(1, int(threads_per_job or os.environ.get('TRAIN_THREADS_PER_JOB')
+                                          or DEFAULT_THREADS_PER_JOB))
+        cores = os.cpu_count() or 1
+        self.max_jobs = max(1, int(max_jobs or os.environ.get('TRAIN_MAX_JOBS')
+                                   or cores // self.threads_per_job))
+        self.model_root = model_root
+        self.poll_interval_s = poll_interval_s
+        self.host = socket.gethostname()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        # 本进程启动的子进程：job_id -> (Popen, 日志文件, 取消时间)
+        self._procs = {}
+
+    @property
+    def configured(self):
+        return bool(self.command.strip())
+
+    def start(self):
+        """启动调度线程；fork 出的子进程需要重新启动自己的线程"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._procs = {}
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='train-jobs', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止调度线程；已启动的训练子进程不受影响，重启后由孤儿恢复逻辑接管"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wake.set()
+        thread.join(self.poll_interval_s * 2 if timeout is None else timeout)
+
+    # ---- 提交 ----
+    def submit(self, category, base_config, overrides, scenario, seed=None, created_by=None):
+        """创建训练目录与配置文件并登记任务，返回任务 id"""
+        if not self.configured:
+            raise JobError('服务器未配置训练命令（环境变量 TRAIN_COMMAND），无法提交训练任务')
+        if category not in MODEL_CATEGORIES:
+            raise JobError('未知的任务类型')
+        if seed is None:
+            seed = int.from_bytes(os.urandom(2), 'big')
+        config = json.loads(json.dumps(base_config or {}))
+        algo_args = config.setdefault('algo_args', {})
+        for section, values in overrides.items():
+            algo_args.setdefault(section, {}).update(values)
+        algo_args.setdefault('seed', {})['seed'] = seed
+        algo_args.setdefault('device', {})['torch_threads'] = self.threads_per_job
+
+        stamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        run_dir = os.path.join(self.model_root, category, f'seed-{seed:05d}-{stamp}')
+        suffix = 1
+        while os.path.exists(run_dir):
+            suffix += 1
+            run_dir = os.path.join(self.model_root, category, f'seed-{seed:05d}-{stamp}-{suffix}')
+        run_dir = normalize_config_path(run_dir)
+        scenario_path = os.path.join(run_dir, 'scenario.json')
+        algo_args.setdefault('logger', {})['log_dir'] = run_dir
+        config.setdefault('main_args', {})['exp_name'] = f'{category}-{scenario["name"]}'
+        config.setdefault('env_args', {}).update({'scenario_id': scenario['id'], 'scenario_file': scenario_path})
+        total_steps = algo_args.get('train', {}).get('num_env_steps')
+
+        os.makedirs(run_dir)
+        # 先放标记再写配置，注册表第一次看到该目录时就是“训练中”
+        open(os.path.join(run_dir, TRAINING_MARKER), 'w').close()
+        with open(scenario_path, 'w', encoding='utf-8') as f:
+            json.dump(scenario, f, ensure_ascii=False)
+        with open(os.path.join(run_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=4)
+        command = self._format_command(run_dir, seed, category)
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                '''INSERT INTO train_jobs (category, scenario_id, scenario_name, seed, run_dir, command,
+                   total_steps, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (category, scenario['id'], scenario['name'], seed, run_dir, command,
+                 int(total_steps) if total_steps else None, created_by)
+            )
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def submit_evaluation(self, scenario, replications, base_seed=0, seeds=None, ci_half_width=None,
+                          min_replications=None, max_time_s=None, time_step_s=None, created_by=None):
+        """登记一次后台批量评估，进程数为每个任务的线程数，返回任务 id"""
+        stamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        run_dir = os.path.join(EVALUATION_ROOT, f'eval-{scenario["id"]}-{stamp}-{os.urandom(3).hex()}')
+        os.makedirs(run_dir)
+        args = [sys.executable, EVALUATION_SCRIPT, str(scenario['id']), '-n', str(replications),
+                '--seed', str(base_seed), '--workers', str(self.threads_per_job),
+                '--output', os.path.join(run_dir, EVALUATION_REPORT_FILE)]
+        if seeds is not None:
+            seeds_path = os.path.join(run_dir, 'seeds.json')
+            with open(seeds_path, 'w', encoding='utf-8') as f:
+                json.dump([int(s) for s in seeds], f)
+            args += ['--seeds-file', seeds_path]
+        for flag, value in (('--ci', ci_half_width), ('--min-replications', min_replications),
+                            ('--max-time', max_time_s), ('--time-step', time_step_s)):
+            if value is not None:
+                args += [flag, str(value)]
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                '''INSERT INTO train_jobs (category, scenario_id, scenario_name, seed, run_dir, command,
+                   total_steps, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (EVALUATION_CATEGORY, scenario['id'], scenario['name'], base_seed, run_dir,
+                 shlex.join(args), None, created_by)
+            )
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def evaluation_report(self, job_id):
+        """返回 (任务, 评估报告)；任务不存在或不是评估任务时返回 (None, None)，未完成时报告为 None"""
+        job = self.get(job_id)
+        if job is None or job['category'] != EVALUATION_CATEGORY:
+            return None, None
+        if job['status'] != 'succeeded':
+            return job, None
+        try:
+            with open(os.path.join(job['run_dir'], EVALUATION_REPORT_FILE), 'r', encoding='utf-8') as f:
+                return job, json.load(f)
+        except (OSError, ValueError):
+            return job, None
+
+    def _format_command(self, run_dir, seed, category):
+        values = {
+            'config': os.path.join(run_dir, 'config.json'),
+            'run_dir': run_dir,
+            'progress': os.path.join(run_dir, PROGRESS_FILE),
+            'seed': seed,
+            'category': category
+        }
+        try:
+            return self.command.format(**{k: shlex.quote(str(v)) for k, v in values.items()})
+        except (KeyError, IndexError, ValueError) as e:
+            raise JobError(f'TRAIN_COMMAND 格式错误：{e}')
+
+    def cancel(self, job_id):
+        """排队中的任务直接取消；运行中的任务由持有子进程的调度线程终止。返回是否受理"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT status, run_dir FROM train_jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row['status'] not in ACTIVE_STATUSES:
+                return False
+            conn.execute(
+                '''UPDATE train_jobs SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                   finished_at = CASE WHEN status = 'queued' THEN CURRENT_TIMESTAMP ELSE finished_at END,
+                   message = CASE WHEN status = 'queued' THEN '已取消' ELSE message END,
+                   cancel_requested = 1 WHERE id = ?''',
+                (job_id,)
+            )
+            conn.commit()
+            if row['status'] == 'queued':
+                # 尚未开始训练的目录只有生成的配置，直接删除，不进入模型列表
+                shutil.rmtree(row['run_dir'], ignore_errors=True)
+        finally:
+            conn.close()
+        self._wake.set()
+        return True
+
+    # ---- 查询 ----
+    def describe(self, row):
+        job = dict(row)
+        if job['status'] == 'running':
+            # 运行中的任务直接读取进度文件末尾，不等待调度线程回写
+            step = read_last_step(os.path.join(job['run_dir'], PROGRESS_FILE))
+            if step is not None:
+                job['last_step'] = step
+        total = job.get('total_steps')
+        job['progress'] = (round(min(job['last_step'] / total, 1.0), 4)
+                           if total and job.get('last_step') is not None else None)
+        if job['status'] == 'succeeded':
+            job['progress'] = 1.0
+        job['status_label'] = JOB_STATUS_LABELS.get(job['status'], job['status'])
+        job['category_label'] = ('批量评估' if job['category'] == EVALUATION_CATEGORY
+                                 else MODEL_CATEGORIES.get(job['category'], job['category']))
+        job.pop('command', None)
+        return job
+
+    def list(self, limit=50):
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT * FROM train_jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [self.describe(row) for row in rows]
+
+    def get(self, job_id, log_bytes=8192):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM train_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = self.describe(row)
+        job['log_tail'] = read_log_tail(os.path.join(row['run_dir'], LOG_FILE), log_bytes)
+        return job
+
+    def snapshot(self):
+        return {
+            'configured': self.configured,
+            'max_jobs': self.max_jobs,
+            'threads_per_job': self.threads_per_job,
+            'local_processes': len(self._procs)
+        }
+
+    # ---- 调度 ----
+    def _run(self):
+        self._recover_orphans()
+        while not self._stopping.is_set():
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self._poll_children()
+                while self._claim_and_launch():
+                    pass
+            except Exception:
+                # 数据库繁忙等临时错误留到下一轮处理
+                time.sleep(self.poll_interval_s)
+
+    def _recover_orphans(self):
+        """把本机上调度进程已经退出的运行中任务标记为失败"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, runner_pid, process_pid, run_dir FROM train_jobs WHERE status = 'running' AND runner_host = ?",
+                (self.host,)
+            ).fetchall()
+            orphans = [row for row in rows if not _pid_alive(row['runner_pid'])]
+            for row in orphans:
+                if _pid_alive(row['process_pid']):
+                    _terminate_group(row['process_pid'], signal.SIGTERM)
+                _remove_marker(row['run_dir'])
+            conn.executemany(
+                '''UPDATE train_jobs SET status = 'failed', message = '服务重启，训练进程已中断',
+                   finished_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'running' ''',
+                [(row['id'],) for row in orphans]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _claim_and_launch(self):
+        """在写锁内检查全局并发数并认领最早的排队任务，成功启动返回 True"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            running = conn.execute("SELECT COUNT(*) FROM train_jobs WHERE status = 'running'").fetchone()[0]
+            row = None
+            if running < self.max_jobs:
+                row = conn.execute(
+                    "SELECT * FROM train_jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+            if row is None:
+                conn.rollback()
+                return False
+            conn.execute(
+                '''UPDATE train_jobs SET status = 'running', runner_host = ?, runner_pid = ?,
+                   started_at = CURRENT_TIMESTAMP WHERE id = ?''',
+                (self.host, os.getpid(), row['id'])
+            )
+            conn.commit()
+            try:
+                proc, log_file = self._spawn(row)
+            except OSError as e:
+                self._finish(conn, row['id'], row['run_dir'], 'failed', None, f'无法启动训练命令：{e}')
+                return True
+            conn.execute('UPDATE train_jobs SET process_pid = ? WHERE id = ?', (proc.pid, row['id']))
+            conn.commit()
+            self._procs[row['id']] = (proc, log_file, None)
+            return True
+        finally:
+            conn.close()
+
+    def _spawn(self, row):
+        env = dict(os.environ)
+        threads = str(self.threads_per_job)
+        env.update({
+            'TRAIN_RUN_DIR': row['run_dir'],
+            'TRAIN_CONFIG': os.path.join(row['run_dir'], 'config.json'),
+            'TRAIN_PROGRESS': os.path.join(row['run_dir'], PROGRESS_FILE),
+            'OMP_NUM_THREADS': threads,
+            'MKL_NUM_THREADS': threads,
+            'PYTHONUNBUFFERED': '1'
+        })
+        log_file = open(os.path.join(row['run_dir'], LOG_FILE), 'ab')
+        # 评估脚本按应用的相对路径读取数据库与武器配置，在应用工作目录下运行
+        kwargs = {'cwd': os.getcwd() if row['category'] == EVALUATION_CATEGORY else self.workdir}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            # 独立进程组，取消时连同训练程序派生的采样进程一起结束
+            kwargs['start_new_session'] = True
+        try:
+            proc = subprocess.Popen(
+                shlex.split(row['command'], posix=os.name != 'nt'),
+                env=env, stdin=subprocess.DEVNULL,
+                stdout=log_file, stderr=subprocess.STDOUT, **kwargs
+            )
+        except OSError:
+            log_file.close()
+            raise
+        return proc, log_file
+
+    def _poll_children(self):
+        if not self._procs:
+            return
+        conn = self._connect()
+        try:
+            ids = list(self._procs)
+            placeholders = ','.join('?' * len(ids))
+            rows = {row['id']: row for row in conn.execute(
+                f'SELECT id, category, run_dir, cancel_requested FROM train_jobs WHERE id IN ({placeholders})', ids
+            ).fetchall()}
+            progress = []
+            for job_id in ids:
+                proc, log_file, cancelled_at = self._procs[job_id]
+                row = rows.get(job_id)
+                run_dir = row['run_dir'] if row else ''
+                code = proc.poll()
+                if code is None:
+                    if row is not None and row['cancel_requested'] and cancelled_at is None:
+                        _terminate_group(proc.pid, signal.SIGTERM, proc)
+                        self._procs[job_id] = (proc, log_file, time.monotonic())
+                    elif cancelled_at is not None and time.monotonic() - cancelled_at > CANCEL_GRACE_S:
+                        _terminate_group(proc.pid, getattr(signal, 'SIGKILL', signal.SIGTERM), proc)
+                    step = read_last_step(os.path.join(run_dir, PROGRESS_FILE))
+                    if step is not None:
+                        progress.append((step, job_id))
+                    continue
+                log_file.close()
+                del self._procs[job_id]
+                if cancelled_at is not None or (row is not None and row['cancel_requested']):
+                    status, message = 'cancelled', '已取消'
+                elif code == 0:
+                    status, message = 'succeeded', '训练完成'
+                else:
+                    status, message = 'failed', f'训练进程退出码 {code}'
+                if row is not None and row['category'] == EVALUATION_CATEGORY and status != 'cancelled':
+                    message = '评估完成' if code == 0 else f'评估进程退出码 {code}'
+                self._finish(conn, job_id, run_dir, status, code, message)
+            if progress:
+                conn.executemany('UPDATE train_jobs SET last_step = ? WHERE id = ?', progress)
+                conn.commit()
+        finally:
+            conn.close()
+
+    def _finish(self, conn, job_id, run_dir, status, exit_code, message):
+        step = read_last_step(os.path.join(run_dir, PROGRESS_FILE)) if run_dir else None
+        conn.execute(
+            '''UPDATE train_jobs SET status = ?, exit_code = ?, message = ?, last_step = COALESCE(?, last_step),
+               finished_at = CURRENT_TIMESTAMP WHERE id = ?''',
+            (status, exit_code, message, step, job_id)
+        )
+        conn.commit()
+        _remove_marker(run_dir)
+
+
+def _remove_marker(run_dir):
+    if not run_dir:
+        return
+    try:
+        os.remove(os.path.join(run_dir, TRAINING_MARKER))
+    except OSError:
+        pass
+
+
+def _terminate_group(pid, sig, proc=None):
+    if os.name == 'nt':
+        if proc is not None:
+            if sig == signal.SIGTERM:
+                proc.terminate()
+            else:
+                proc.kill()
+        return
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,143 @@
+# leaderboard.py
+"""跨种子的模型排行榜
+
+按 (类别, 算法, 环境, 场景) 汇总 models 表中各种子的最佳成绩：训练次数、不同种子数、
+有成绩训练的均值与标准差、最大值、最优与最新一次训练。汇总结果保存在 model_leaderboard 表中，由模型注册表同步时
+只对发生变化的配置组重新计算，查看排行榜时直接按索引读取，不再扫描全部模型。
+缺失的算法/环境/场景按空字符串归为一组。
+"""
+import math
+
+# 每次 IN 查询的参数个数上限（低于 SQLite 默认的 999）
+_IN_CHUNK = 500
+SORT_COLUMNS = {
+    'mean': 'lb.mean_score DESC',
+    'max': 'lb.max_score DESC',
+    'seeds': 'lb.seeds DESC, lb.mean_score DESC',
+    'latest': 'lb.latest_version DESC',
+}
+DEFAULT_SORT = 'mean'
+MAX_ROWS = 500
+
+# 与 models 表上的表达式索引保持一致，分组查询才能使用该索引
+_GROUP_EXPR = "category, COALESCE(algo, ''), COALESCE(env, ''), COALESCE(scenario, '')"
+_GROUP_WHERE = "category = ? AND COALESCE(algo, '') = ? AND COALESCE(env, '') = ? AND COALESCE(scenario, '') = ?"
+
+
+def ensure_leaderboard_table(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS model_leaderboard (
+            category TEXT NOT NULL,
+            algo TEXT NOT NULL,
+            env TEXT NOT NULL,
+            scenario TEXT NOT NULL,
+            runs INTEGER NOT NULL,
+            seeds INTEGER NOT NULL,
+            mean_score REAL,
+            std_score REAL,
+            max_score REAL,
+            best_model_id INTEGER,
+            latest_model_id INTEGER,
+            latest_version TEXT,
+            latest_best_score REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (category, algo, env, scenario)
+        )'''
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_mean ON model_leaderboard(category, mean_score DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_max ON model_leaderboard(category, max_score DESC)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_models_group ON models({_GROUP_EXPR})')
+
+
+def group_key(model):
+    """模型记录（dict 或 sqlite3.Row）所属的汇总组"""
+    return (model['category'], model['algo'] or '', model['env'] or '', model['scenario'] or '')
+
+
+def group_keys_for_paths(conn, config_paths):
+    """按 config_path 查询当前记录所属的组，用于在写库前记下旧分组"""
+    keys = set()
+    paths = list(config_paths)
+    for start in range(0, len(paths), _IN_CHUNK):
+        chunk = paths[start:start + _IN_CHUNK]
+        rows = conn.execute(
+            f'SELECT category, algo, env, scenario FROM models WHERE config_path IN ({",".join("?" * len(chunk))})',
+            chunk
+        ).fetchall()
+        keys.update(group_key(row) for row in rows)
+    return keys
+
+
+def _aggregate(rows):
+    scores = [row['best_score'] for row in rows if row['best_score'] is not None]
+    # 均值、标准差按有成绩的训练次数计算；种子数为不同种子的个数，同一种子重复训练只计一次
+    count = len(scores)
+    mean = sum(scores) / count if count else None
+    std = math.sqrt(sum((s - mean) ** 2 for s in scores) / (count - 1)) if count > 1 else None
+    best = max((row for row in rows if row['best_score'] is not None),
+               key=lambda row: row['best_score'], default=None)
+    latest = max(rows, key=lambda row: (row['version'] or '', row['id']))
+    return {
+        'runs': len(rows),
+        'seeds': len({row['seed'] for row in rows}),
+        'mean_score': mean,
+        'std_score': std,
+        'max_score': best['best_score'] if best else None,
+        'best_model_id': best['id'] if best else None,
+        'latest_model_id': latest['id'],
+        'latest_version': latest['version'],
+        'latest_best_score': latest['best_score'],
+    }
+
+
+def refresh_groups(conn, keys):
+    """重新计算指定组的汇总，组内已无模型时删除该行；由调用方提交事务"""
+    for key in keys:
+        rows = conn.execute(
+            f'SELECT id, seed, version, best_score FROM models WHERE {_GROUP_WHERE}',
+            key
+        ).fetchall()
+        if not rows:
+            conn.execute(
+                'DELETE FROM model_leaderboard WHERE category = ? AND algo = ? AND env = ? AND scenario = ?', key
+            )
+            continue
+        agg = _aggregate(rows)
+        conn.execute(
+            '''INSERT OR REPLACE INTO model_leaderboard
+               (category, algo, env, scenario, runs, seeds, mean_score, std_score, max_score,
+                best_model_id, latest_model_id, latest_version, latest_best_score, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)''',
+            key + (agg['runs'], agg['seeds'], agg['mean_score'], agg['std_score'], agg['max_score'],
+                   agg['best_model_id'], agg['latest_model_id'], agg['latest_version'], agg['latest_best_score'])
+        )
+
+
+def rebuild_leaderboard(conn):
+    """全量重建，用于迁移时回填"""
+    conn.execute('DELETE FROM model_leaderboard')
+    keys = [tuple(row) for row in conn.execute(f'SELECT DISTINCT {_GROUP_EXPR} FROM models')]
+    refresh_groups(conn, keys)
+    return len(keys)
+
+
+def load_leaderboard(conn, category=None, sort=DEFAULT_SORT, min_seeds=1, limit=MAX_ROWS):
+    """读取排行榜，附带最优与最新模型的名称"""
+    clauses = ['lb.seeds >= ?']
+    params = [min_seeds]
+    if category:
+        clauses.append('lb.category = ?')
+        params.append(category)
+    order = SORT_COLUMNS.get(sort, SORT_COLUMNS[DEFAULT_SORT])
+    rows = conn.execute(
+        f'''SELECT lb.*, best.name AS best_model_name, best.seed AS best_seed,
+                  latest.name AS latest_model_name, latest.status AS latest_status
+           FROM model_leaderboard lb
+           LEFT JOIN models best ON best.id = lb.best_model_id
+           LEFT JOIN models latest ON latest.id = lb.latest_model_id
+           WHERE {' AND '.join(clauses)}
+           ORDER BY lb.category, {order}
+           LIMIT ?''',
+        params + [limit]
+    ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,317 @@
+# live_stream.py
+"""服务端仿真推流
+
+仿真循环由服务端后台线程按设定倍速推进，状态以帧的形式推送给所有订阅者（SSE）：
+- keyframe：全部存活单位的位置与当前目标，每 KEYFRAME_EVERY 帧一次
+- delta：与上一帧相比位置变化超过量化精度的单位，以及这一帧内的分配/射击/击毁事件
+- end：仿真结束原因与战果汇总
+
+每帧只序列化一次，所有订阅者共享同一份字节串；新订阅者从最近的关键帧开始接收，
+断线重连时按 Last-Event-ID 续传，落后太多时跳到最新关键帧。
+"""
+import collections
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+from event_recorder import KIND_MOVE, decode_records, make_records
+from simulation_engine import BattleSimulator, WEAPON_CODES
+
+KEYFRAME_EVERY = 50
+# 位置量化精度（度），约 1 米；变化小于该值的单位不进入增量帧
+POSITION_QUANTUM_DEG = 1e-5
+# 最高推送帧率，倍速较高时多个仿真步合并为一帧
+MIN_FRAME_INTERVAL_S = 0.1
+DEFAULT_SPEED = 10.0
+MAX_SPEED = 1000.0
+MAX_LIVE_RUNS = 4
+FINISHED_RETENTION_S = 300
+HEARTBEAT_S = 15.0
+
+
+class FrameEventCollector:
+    """按 EventRecorder 接口收集一帧内的事件，移动事件由帧本身表达"""
+
+    move_interval_s = math.inf
+
+    def __init__(self):
+        self._blocks = []
+
+    def record_many(self, t, kind, side, unit, target=-1, weapon=-1, flags=0, lat=0.0, lng=0.0):
+        if kind == KIND_MOVE or np.size(unit) == 0:
+            return
+        self._blocks.append(make_records(t, kind, side, unit, target, weapon, flags, lat, lng))
+
+    def record(self, t, kind, side, unit, target=-1, weapon=-1, flags=0, lat=0.0, lng=0.0):
+        self.record_many(t, kind, side, [unit], target, weapon, flags, lat, lng)
+
+    def drain(self):
+        if not self._blocks:
+            return []
+        events = decode_records(np.concatenate(self._blocks))
+        self._blocks = []
+        return events
+
+
+def _sse(seq, event, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {seq}\nevent: {event}\ndata: {data}\n\n'.encode('utf-8')
+
+
+class LiveRun:
+    """一次服务端仿真及其帧缓冲"""
+
+    def __init__(self, run_id, scenario_data, seed=None, speed=DEFAULT_SPEED,
+                 time_step_s=1.0, max_time_s=6 * 3600.0, metadata=None):
+        self.run_id = run_id
+        self.speed = speed
+        self.max_time_s = max_time_s
+        self.metadata = dict(metadata or {})
+        self.metadata.update({
+            'weapons': list(WEAPON_CODES),
+            'our_drones': [d.get('code') or '' for d in scenario_data.get('our_drones') or []],
+            'enemy_units': [{'type': e.get('type'), 'code': e.get('code') or ''}
+                            for e in scenario_data.get('enemy_units') or []],
+            'seed': seed,
+            'speed': speed,
+            'time_step_s': time_step_s
+        })
+        self._collector = FrameEventCollector()
+        self.sim = BattleSimulator(scenario_data, seed=seed, time_step_s=time_step_s, recorder=self._collector)
+        self.ticks_per_frame = max(1, int(round(speed * MIN_FRAME_INTERVAL_S / time_step_s)))
+        self.state = 'running'
+        self.summary = None
+        self.finished_at = None
+        self.subscribers = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self._cond = threading.Condition()
+        self._frames = collections.deque()
+        self._seq = 0
+        self._last_keyframe = 0
+        self._stop = False
+        self._paused = False
+        self._sent_drone = None
+        self._sent_enemy = None
+        self._thread = threading.Thread(target=self._run, name=f'live-run-{run_id[:8]}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    # ---- 帧构造 ----
+    def _quantize(self, pos):
+        return np.rint(pos / POSITION_QUANTUM_DEG).astype(np.int64)
+
+    def _units(self, pos, ids):
+        return [[i, round(lat, 6), round(lng, 6)] for i, lat, lng in
+                zip(ids.tolist(), pos[ids, 0].tolist(), pos[ids, 1].tolist())]
+
+    def _stats(self):
+        sim = self.sim
+        return {
+            'shots': int(sim.shots.sum()),
+            'hits': sim.hits,
+            'kills': sim.kills,
+            'enemy_remaining': int(sim.enemy_alive.sum())
+        }
+
+    def _keyframe(self, events):
+        sim = self.sim
+        alive = np.flatnonzero(sim.enemy_alive)
+        self._sent_drone = self._quantize(sim.drone_pos)
+        self._sent_enemy = self._quantize(sim.enemy_pos)
+        return {
+            't': round(sim.time_s, 3),
+            'drones': self._units(sim.drone_pos, np.arange(len(sim.drone_pos))),
+            'targets': sim.drone_target.tolist(),
+            'enemies': self._units(sim.enemy_pos, alive),
+            'events': events,
+            'stats': self._stats()
+        }
+
+    def _delta(self, events):
+        sim = self.sim
+        drone_q = self._quantize(sim.drone_pos)
+        enemy_q = self._quantize(sim.enemy_pos)
+        moved_drones = np.flatnonzero((drone_q != self._sent_drone).any(axis=1))
+        moved_enemies = np.flatnonzero((enemy_q != self._sent_enemy).any(axis=1) & sim.enemy_alive)
+        self._sent_drone[moved_drones] = drone_q[moved_drones]
+        self._sent_enemy[moved_enemies] = enemy_q[moved_enemies]
+        return {
+            't': round(sim.time_s, 3),
+            'drones': self._units(sim.drone_pos, moved_drones),
+            'enemies': self._units(sim.enemy_pos, moved_enemies),
+            'events': events,
+            'stats': self._stats()
+        }
+
+    def _publish(self, event, payload):
+        with self._cond:
+            self._seq += 1
+            frame = (self._seq, event, _sse(self._seq, event, payload))
+            if event == 'keyframe':
+                # 只保留上一个关键帧以来的帧，供新订阅者与断线重连使用
+                while self._frames and self._frames[0][0] < self._last_keyframe:
+                    self._frames.popleft()
+                self._last_keyframe = self._seq
+            self._frames.append(frame)
+            self._cond.notify_all()
+
+    # ---- 仿真循环 ----
+    def _run(self):
+        sim = self.sim
+        frame_wall_s = self.ticks_per_frame * sim.time_step_s / self.speed
+        frames = 0
+        try:
+            self._publish('keyframe', self._keyframe(self._collector.drain()))
+            next_due = time.monotonic() + frame_wall_s
+            while not sim.finished and sim.time_s < self.max_time_s:
+                with self._cond:
+                    while self._paused and not self._stop:
+                        self._cond.wait()
+                    if self._stop:
+                        break
+                for _ in range(self.ticks_per_frame):
+                    sim.step()
+                    if sim.finished or sim.time_s >= self.max_time_s:
+                        break
+                frames += 1
+                events = self._collector.drain()
+                if frames % KEYFRAME_EVERY == 0:
+                    self._publish('keyframe', self._keyframe(events))
+                else:
+                    self._publish('delta', self._delta(events))
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._stop or self._paused, timeout=delay)
+                next_due = max(next_due + frame_wall_s, time.monotonic())
+            if self._stop:
+                sim.finished = True
+                sim.reason = '已手动停止'
+            elif not sim.finished:
+                sim.finished = True
+                sim.reason = '达到最大仿真时长'
+            self.summary = sim.summary()
+            self.state = 'stopped' if self._stop else 'finished'
+            self._publish('end', {'t': round(sim.time_s, 3), 'reason': sim.reason, 'summary': self.summary})
+        except Exception as e:
+            self.state = 'failed'
+            self._publish('end', {'t': round(sim.time_s, 3), 'reason': f'仿真运行失败: {e}', 'summary': None})
+        finally:
+            self.finished_at = time.monotonic()
+
+    # ---- 控制 ----
+    def control(self, action):
+        with self._cond:
+            if self.state not in ('running', 'paused'):
+                return False
+            if action == 'pause':
+                self._paused = True
+                self.state = 'paused'
+            elif action == 'resume':
+                self._paused = False
+                self.state = 'running'
+            elif action == 'stop':
+                self._stop = True
+            else:
+                raise ValueError(f'未知操作: {action}')
+            self._cond.notify_all()
+            return True
+
+    # ---- 订阅 ----
+    def subscribe(self, last_event_id=None):
+        """生成 SSE 字节流：先发送运行信息，再从关键帧（或断点）开始推送帧"""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            yield _sse(0, 'hello', self.describe())
+            cursor = None
+            if last_event_id is not None:
+                cursor = last_event_id + 1
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq >= (cursor or self._last_keyframe or 1),
+                                        timeout=HEARTBEAT_S)
+                    first = self._frames[0][0] if self._frames else self._seq + 1
+                    if cursor is None or cursor < first:
+                        # 首次订阅或落后过多：从最近的关键帧开始
+                        cursor = self._last_keyframe or 1
+                    pending = [frame for frame in self._frames if frame[0] >= cursor]
+                if not pending:
+                    yield b': ping\n\n'
+                    continue
+                with self._cond:
+                    self.frames_sent += len(pending)
+                    self.bytes_sent += sum(len(body) for _, _, body in pending)
+                for seq, event, body in pending:
+                    yield body
+                    cursor = seq + 1
+                    if event == 'end':
+                        return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def describe(self):
+        return {
+            'run_id': self.run_id,
+            'state': self.state,
+            'sim_time_s': round(self.sim.time_s, 3),
+            'subscribers': self.subscribers,
+            'frames': self._seq,
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+            'ticks_per_frame': self.ticks_per_frame,
+            'keyframe_every': KEYFRAME_EVERY,
+            'metadata': self.metadata,
+            'summary': self.summary
+        }
+
+
+class LiveRunRegistry:
+    """进程内的推流仿真表，限制同时运行数量并清理已结束的记录"""
+
+    def __init__(self, max_runs=MAX_LIVE_RUNS, retention_s=FINISHED_RETENTION_S):
+        self.max_runs = max_runs
+        self.retention_s = retention_s
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.monotonic()
+        for run_id in [run_id for run_id, run in self._runs.items()
+                       if run.finished_at is not None and now - run.finished_at > self.retention_s]:
+            del self._runs[run_id]
+
+    def start(self, run):
+        """启动并登记；同时运行数已满时返回 False"""
+        with self._lock:
+            self._purge()
+            active = sum(1 for r in self._runs.values() if r.finished_at is None)
+            if active >= self.max_runs:
+                return False
+            self._runs[run.run_id] = run
+        run.start()
+        return True
+
+    def get(self, run_id):
+        with self._lock:
+            self._purge()
+            return self._runs.get(run_id)
+
+    def list(self):
+        with self._lock:
+            self._purge()
+            runs = list(self._runs.values())
+        result = []
+        for run in runs:
+            info = run.describe()
+            metadata = info.pop('metadata')
+            info['scenario_id'] = metadata.get('scenario_id')
+            info['scenario_name'] = metadata.get('scenario_name')
+            result.append(info)
+        return result
@@ -0,0 +1,151 @@
+# log_writer.py
+"""仿真日志后台写入
+
+请求线程只把格式化后的日志行放入有界队列，由单独的写线程保持当日日志文件打开、
+批量写入并定期 flush；队列积压超过上限时 submit 返回 False，由接口返回 503 让前端稍后重试。
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+LOGS_DIR = 'logs'
+DEFAULT_MAX_PENDING = 20000
+DEFAULT_FLUSH_INTERVAL_S = 0.5
+
+
+def format_log_line(message, level, username, timestamp=None):
+    """与原 /api/save_log 相同的单行格式"""
+    moment = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+    return moment, f'[{moment.strftime("%Y-%m-%d %H:%M:%S")}] [{level}] [{username}] {message}\n'
+
+
+class LogWriter:
+    """有界队列 + 单写线程的日志写入器"""
+
+    def __init__(self, logs_dir=LOGS_DIR, max_pending=DEFAULT_MAX_PENDING,
+                 flush_interval_s=DEFAULT_FLUSH_INTERVAL_S):
+        self.logs_dir = logs_dir
+        self.max_pending = max_pending
+        self.flush_interval_s = flush_interval_s
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._file_day = None
+        self.stats = {'accepted': 0, 'rejected': 0, 'written': 0, 'writes': 0, 'flushes': 0, 'errors': 0}
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        # fork 后的子进程需要重新启动自己的写线程
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._file = None
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, lines):
+        """lines 为 [(datetime, 文本行)]；队列已满时整批拒绝并返回 False"""
+        if not lines:
+            return True
+        self._ensure_thread()
+        with self._lock:
+            if self._pending + len(lines) > self.max_pending:
+                self.stats['rejected'] += len(lines)
+                return False
+            self._pending += len(lines)
+            self.stats['accepted'] += len(lines)
+        self._queue.put(lines)
+        return True
+
+    def _open_for(self, moment):
+        day = moment.strftime('%Y%m%d')
+        if self._file is None or self._file_day != day:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(self.logs_dir, exist_ok=True)
+            # 日志内容来自客户端，无法编码的字符（如孤立的代理项）替换后写入，不中断写线程
+            self._file = open(os.path.join(self.logs_dir, f'simulation_{day}.txt'), 'a', encoding='utf-8',
+                              errors='replace')
+            self._file_day = day
+        return self._file
+
+    def _write_batch(self, batches):
+        count = 0
+        current = None
+        chunk = []
+        for lines in batches:
+            for moment, line in lines:
+                target = self._open_for(moment)
+                if current is not None and target is not current:
+                    current.write(''.join(chunk))
+                    chunk = []
+                current = target
+                chunk.append(line)
+                count += 1
+        if current is not None and chunk:
+            current.write(''.join(chunk))
+        return count
+
+    def _run(self):
+        while True:
+            try:
+                batches = [self._queue.get(timeout=self.flush_interval_s)]
+            except queue.Empty:
+                continue
+            # 把队列里已有的批次一次取完，合并成一次写入
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 停止标记之后取到的批次也在本轮写完
+            stop = any(b is None for b in batches)
+            batches = [b for b in batches if b is not None]
+            count = sum(len(b) for b in batches)
+            try:
+                written = self._write_batch(batches)
+                if self._file is not None:
+                    self._file.flush()
+                self.stats['written'] += written
+                self.stats['writes'] += 1
+                self.stats['flushes'] += 1
+            except Exception:
+                # 任何写入错误都只丢弃本轮日志，写线程继续运行
+                self.stats['errors'] += 1
+            finally:
+                with self._lock:
+                    self._pending -= count
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def close(self, timeout=5.0):
+        """写完队列中剩余的日志后停止写线程"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, pending=self._pending, max_pending=self.max_pending)
+
+
+def entry_timestamp(value):
+    """前端上报的毫秒时间戳，无效或偏差过大时使用服务器时间"""
+    try:
+        ts = float(value) / 1000.0
+    except (TypeError, ValueError):
+        return None
+    return ts if abs(ts - time.time()) < 86400 else None
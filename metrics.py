@@ -0,0 +1,234 @@
+# metrics.py
+"""请求耗时、SQL 语句与模型同步阶段的指标采集
+
+- 每个线程写自己的分片（计数器与直方图桶），记录时不加锁；/metrics 导出时汇总全部分片，
+  线程退出后其分片并入“已退出线程”汇总，分片数量不会随线程创建无限增长
+- 请求内的 SQL 次数/耗时与各阶段耗时累积在线程本地的请求上下文中，
+  请求结束时写入 Server-Timing 响应头，浏览器开发者工具可直接查看
+- 指标按进程统计，多进程部署时由采集端按实例汇总
+"""
+import bisect
+import threading
+import time
+import weakref
+
+# 直方图桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# 指标名 -> (类型, 说明, 桶)
+METRICS = {
+    'http_requests_total': ('counter', '按路由、方法与状态码统计的请求数', None),
+    'http_request_duration_seconds': ('histogram', '按路由统计的请求耗时', DEFAULT_BUCKETS),
+    'sql_statements_total': ('counter', '经 get_db_connection 执行的 SQL 语句数', None),
+    'sql_statement_duration_seconds': ('histogram', 'SQL 语句执行耗时（按语句类型）', SQL_BUCKETS),
+    'app_phase_duration_seconds': ('histogram', '模型目录扫描、配置解析等阶段耗时', DEFAULT_BUCKETS),
+}
+
+
+class _Shard:
+    """单个线程独占写入的指标分片"""
+
+    __slots__ = ('counters', 'histograms', '__weakref__')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, (buckets, total, count) in list(other.histograms.items()):
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = [list(buckets), total, count]
+            else:
+                for i, value in enumerate(buckets):
+                    mine[0][i] += value
+                mine[1] += total
+                mine[2] += count
+
+
+class _ShardHolder:
+    """只被线程本地变量引用，线程退出时被回收并触发分片合并"""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+_local = threading.local()
+_shards_lock = threading.Lock()
+_live_shards = set()
+_retired = _Shard()
+_started_at = time.time()
+_collectors = []
+
+
+def _retire(shard):
+    with _shards_lock:
+        _live_shards.discard(shard)
+        _retired.merge(shard)
+
+
+def _shard():
+    holder = getattr(_local, 'holder', None)
+    if holder is None:
+        shard = _Shard()
+        holder = _local.holder = _ShardHolder(shard)
+        with _shards_lock:
+            _live_shards.add(shard)
+        weakref.finalize(holder, _retire, shard)
+    return holder.shard
+
+
+def inc(name, labels=(), value=1):
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, seconds):
+    buckets = METRICS[name][2]
+    histograms = _shard().histograms
+    key = (name, labels)
+    entry = histograms.get(key)
+    if entry is None:
+        entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+    entry[0][bisect.bisect_left(buckets, seconds)] += 1
+    entry[1] += seconds
+    entry[2] += 1
+
+
+# ---- 请求上下文 ----
+def begin_request():
+    _local.request = {'started': time.perf_counter(), 'sql_count': 0, 'sql_s': 0.0, 'phases': {}}
+
+
+def end_request(route, method, status):
+    """记录请求指标并返回 Server-Timing 头的值；请求上下文不存在时返回 None"""
+    ctx = getattr(_local, 'request', None)
+    if ctx is None:
+        return None
+    _local.request = None
+    elapsed = time.perf_counter() - ctx['started']
+    labels = (('route', route), ('method', method))
+    inc('http_requests_total', labels + (('status', str(status)),))
+    observe('http_request_duration_seconds', labels, elapsed)
+    parts = [f'app;dur={elapsed * 1000:.2f}']
+    if ctx['sql_count']:
+        parts.append(f'sql;dur={ctx["sql_s"] * 1000:.2f};desc="{ctx["sql_count"]} queries"')
+    for phase, seconds in ctx['phases'].items():
+        parts.append(f'{phase};dur={seconds * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def _statement_kind(sql):
+    head = sql.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else 'OTHER'
+
+
+def observe_sql(sql, seconds, statements=1):
+    kind = (('kind', _statement_kind(sql)),)
+    inc('sql_statements_total', kind, statements)
+    observe('sql_statement_duration_seconds', kind, seconds)
+    ctx = getattr(_local, 'request', None)
+    if ctx is not None:
+        ctx['sql_count'] += statements
+        ctx['sql_s'] += seconds
+
+
+def observe_phase(phase, seconds):
+    """记录一个处理阶段的耗时，并计入当前请求的 Server-Timing"""
+    observe('app_phase_duration_seconds', (('phase', phase),), seconds)
+    ctx = getattr(_local, 'request', None)
+    if ctx is not None:
+        ctx['phases'][phase] = ctx['phases'].get(phase, 0.0) + seconds
+
+
+def register_collector(fn):
+    """注册导出时调用的函数，返回 [(指标名, 标签元组, 数值)] 作为 gauge 输出"""
+    _collectors.append(fn)
+
+
+# ---- 导出 ----
+def _merged():
+    total = _Shard()
+    with _shards_lock:
+        shards = list(_live_shards)
+        total.merge(_retired)
+    for shard in shards:
+        total.merge(shard)
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels, extra=()):
+    items = tuple(labels) + tuple(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 9))
+    return str(value)
+
+
+def render():
+    """Prometheus 文本格式"""
+    total = _merged()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(total.counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+            continue
+        for (metric, labels), (counts, sum_s, count) in sorted(total.histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, value in zip(buckets + (float('inf'),), counts):
+                cumulative += value
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_label_text(labels, (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_label_text(labels)} {_number(sum_s)}')
+            lines.append(f'{name}_count{_label_text(labels)} {count}')
+    gauges = {}
+    for collector in _collectors:
+        try:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((labels, value))
+        except Exception:
+            continue
+    gauges.setdefault('process_start_time_seconds', []).append(((), _started_at))
+    for name, samples in gauges.items():
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in samples:
+            lines.append(f'{name}{_label_text(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """注册请求钩子：记录路由耗时并写入 Server-Timing 响应头"""
+    from flask import request
+
+    @app.before_request
+    def _metrics_begin():
+        begin_request()
+
+    @app.after_request
+    def _metrics_end(response):
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        timing = end_request(route, request.method, response.status_code)
+        if timing:
+            response.headers.add('Server-Timing', timing)
+        return response
@@ -0,0 +1,217 @@
+# migrations.py
+"""数据库版本化迁移
+
+schema_version 表记录已执行的迁移版本，每个迁移只在部署时执行一次，
+请求路径不再承担建表、去重和旧数据清洗的开销。
+
+命令行用法：
+    python migrations.py            # 执行未应用的迁移
+    python migrations.py --status   # 查看当前版本
+"""
+import argparse
+import sys
+
+from db import DB_PATH, open_connection
+from job_runner import ensure_job_table
+from leaderboard import ensure_leaderboard_table, rebuild_leaderboard
+from model_registry import normalize_config_path
+from progress_store import ensure_progress_tables
+from scenario_cache import ensure_revision_table
+from scenario_data import (
+    ENEMY_UNIT_COLUMNS, build_scenario_data, replace_scenario_units, serialize_payload_totals
+)
+from scenario_listing import create_listing_indexes, enemy_total_sql
+
+
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _create_model_tables(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            seed INTEGER,
+            version TEXT,
+            algo TEXT,
+            env TEXT,
+            scenario TEXT,
+            config_path TEXT UNIQUE,
+            progress_path TEXT,
+            status TEXT DEFAULT 'available',
+            best_score REAL,
+            last_step INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )'''
+    )
+    ensure_progress_tables(conn)
+
+
+def _deduplicate_models(conn):
+    """删除 config_path 重复的记录，保留最小 id，并规范化路径"""
+    rows = conn.execute('SELECT id, config_path FROM models ORDER BY id').fetchall()
+    keep_for_path = {}
+    delete_ids = []
+    renames = []
+    for row in rows:
+        normalized = normalize_config_path(row['config_path'])
+        if normalized in keep_for_path:
+            delete_ids.append((row['id'],))
+            continue
+        keep_for_path[normalized] = row['id']
+        if normalized != row['config_path']:
+            renames.append((normalized, row['id']))
+    # 先删除重复记录再改写路径，避免与唯一约束冲突
+    conn.executemany('DELETE FROM models WHERE id = ?', delete_ids)
+    conn.executemany('UPDATE models SET config_path = ? WHERE id = ?', renames)
+    # 确保唯一索引存在；如果旧表缺少 UNIQUE，此索引会限制重复插入
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_models_config_path ON models(config_path)')
+
+
+def _sanitize_scenario_payloads(conn):
+    """移除场景载荷中已弃用的雷达字段，并为只有位置数据的旧场景生成载荷"""
+    if not _table_exists(conn, 'scenarios'):
+        return
+    rows = conn.execute('SELECT * FROM scenarios').fetchall()
+    updates = []
+    for row in rows:
+        _, cleaned_payload, changed = build_scenario_data(row)
+        if changed:
+            updates.append((cleaned_payload, row['id']))
+    if updates:
+        conn.executemany('UPDATE scenarios SET our_drone_payloads = ? WHERE id = ?', updates)
+
+
+def _create_scenario_units(conn):
+    """单位拆分为 scenario_units 行，迁移旧的换行分隔位置文本后清空旧字段"""
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS scenario_units (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scenario_id INTEGER NOT NULL,
+            side TEXT NOT NULL,
+            type TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            code TEXT,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            altitude INTEGER DEFAULT 0,
+            ar1 INTEGER DEFAULT 0,
+            pl10 INTEGER DEFAULT 0,
+            cannon INTEGER DEFAULT 0
+        )'''
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scenario_units_scenario ON scenario_units(scenario_id, side, seq)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scenario_units_type ON scenario_units(type, scenario_id)')
+    if not _table_exists(conn, 'scenarios'):
+        return
+    legacy_columns = ['our_drone_positions'] + [positions_col for _, _, positions_col, _, _ in ENEMY_UNIT_COLUMNS]
+    for row in conn.execute('SELECT * FROM scenarios').fetchall():
+        scenario_data, _, _ = build_scenario_data(row)
+        replace_scenario_units(conn, row['id'], scenario_data['our_drones'], scenario_data['enemy_units'])
+        conn.execute(
+            'UPDATE scenarios SET our_drone_payloads = ?, ' + ', '.join(f'{col} = NULL' for col in legacy_columns)
+            + ' WHERE id = ?',
+            (serialize_payload_totals(scenario_data['our_drones']), row['id'])
+        )
+
+
+def _add_scenario_listing_columns(conn):
+    """场景表增加敌方单位总数列并回填，建立列表分页与筛选使用的复合索引"""
+    if not _table_exists(conn, 'scenarios'):
+        return
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(scenarios)')}
+    if 'enemy_total' not in columns:
+        conn.execute('ALTER TABLE scenarios ADD COLUMN enemy_total INTEGER DEFAULT 0')
+    conn.execute(f'UPDATE scenarios SET enemy_total = {enemy_total_sql()}')
+    create_listing_indexes(conn)
+
+
+def _create_leaderboard(conn):
+    """创建模型排行榜汇总表，并按现有模型记录回填"""
+    ensure_leaderboard_table(conn)
+    rebuild_leaderboard(conn)
+
+
+# (版本号, 说明, 迁移函数)，版本号只增不改
+MIGRATIONS = [
+    (1, '创建模型与训练进度表', _create_model_tables),
+    (2, '合并重复模型记录并建立 config_path 唯一索引', _deduplicate_models),
+    (3, '清理场景载荷中的雷达字段', _sanitize_scenario_payloads),
+    (4, '场景单位拆分为 scenario_units 表', _create_scenario_units),
+    (5, '创建缓存修订号表', ensure_revision_table),
+    (6, '创建训练任务表', ensure_job_table),
+    (7, '场景表增加敌方单位总数列与列表索引', _add_scenario_listing_columns),
+    (8, '创建模型排行榜汇总表', _create_leaderboard),
+    (9, '排行榜种子数改为不同种子个数并重算', rebuild_leaderboard),
+]
+
+
+def ensure_version_table(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )'''
+    )
+    conn.commit()
+
+
+def current_version(conn):
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    """依次执行未应用的迁移，每个迁移在独立事务中完成，返回本次执行的版本号列表"""
+    ensure_version_table(conn)
+    if current_version(conn) >= MIGRATIONS[-1][0]:
+        return []
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        # IMMEDIATE 事务先拿写锁，多个进程同时启动时只有一个会执行迁移
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='数据库迁移')
+    parser.add_argument('--db', default=DB_PATH, help='数据库文件路径')
+    parser.add_argument('--status', action='store_true', help='只显示当前版本')
+    args = parser.parse_args(argv)
+
+    conn = open_connection(args.db)
+    try:
+        if args.status:
+            ensure_version_table(conn)
+            print(f'当前版本: {current_version(conn)} / 最新版本: {MIGRATIONS[-1][0]}')
+            return 0
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        print('已执行迁移: ' + ', '.join(str(v) for v in applied))
+    else:
+        print('数据库已是最新版本')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# model_registry.py
+"""模型注册表：按目录与文件修改时间增量同步 models/ 下的训练产物
+
+每次同步只对 stat 信息发生变化的训练目录重新解析 config.json 并写库，
+progress.txt 交由 progress_store 按字节偏移增量入库，并在同一事务内刷新受影响配置组的
+排行榜汇总；其余目录直接复用内存快照，
+同步结果与耗时统计保存在内存中供页面读取。
+"""
+import json
+import os
+import threading
+import time
+
+import metrics
+from leaderboard import group_key, group_keys_for_paths, refresh_groups
+from progress_store import ingest_progress, progress_summary
+
+# 模型目录及分类定义
+MODEL_ROOT = 'models'
+MODEL_CATEGORIES = {
+    'target_allocation': '目标分配',
+    'fire_allocaltion': '火力分配'  # 保持与现有目录一致
+}
+
+# 训练任务运行期间存在于训练目录中的标记文件
+TRAINING_MARKER = '.training'
+
+# 两次文件系统检查之间的最短间隔（秒），同一时间段内的请求直接读取快照
+DEFAULT_CHECK_INTERVAL_S = 2.0
+
+UPSERT_MODEL_SQL = '''INSERT INTO models (name, category, seed, version, algo, env, scenario, config_path, progress_path, status)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+   ON CONFLICT(config_path) DO UPDATE SET
+       name=excluded.name,
+       category=excluded.category,
+       seed=excluded.seed,
+       version=excluded.version,
+       algo=excluded.algo,
+       env=excluded.env,
+       scenario=excluded.scenario,
+       progress_path=excluded.progress_path,
+       status=excluded.status'''
+
+
+def normalize_config_path(path):
+    """规范化模型相关路径，避免因不同运行环境导致的重复记录"""
+    if not path:
+        return ''
+    abs_root = os.path.abspath(MODEL_ROOT)
+    abs_path = os.path.abspath(path)
+    try:
+        rel = os.path.relpath(abs_path, abs_root)
+        normalized = os.path.join(MODEL_ROOT, rel)
+    except ValueError:
+        normalized = abs_path
+    return normalized.replace('\\', '/')
+
+
+# 从目录名中提取种子和时间戳
+def parse_folder_metadata(folder_name):
+    # 期望格式: seed-00014-2024-09-25-21-19-35
+    parts = folder_name.split('-')
+    seed = None
+    timestamp = folder_name
+    if len(parts) >= 2 and parts[0] == 'seed':
+        try:
+            seed = int(parts[1])
+        except ValueError:
+            seed = None
+    if len(parts) >= 8:
+        timestamp = f"{parts[2]}-{parts[3]}-{parts[4]} {parts[5]}:{parts[6]}:{parts[7]}"
+    return seed, timestamp
+
+
+def read_model_run(category, entry):
+    """解析单个训练目录，缺少 config.json 时返回 None"""
+    model_path = os.path.join(MODEL_ROOT, category, entry)
+    config_path = normalize_config_path(os.path.join(model_path, 'config.json'))
+    progress_path = normalize_config_path(os.path.join(model_path, 'progress.txt'))
+    if not os.path.exists(config_path):
+        return None
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config_data = json.load(f)
+    except Exception:
+        config_data = {}
+    seed, version = parse_folder_metadata(entry)
+    algo = config_data.get('main_args', {}).get('algo')
+    env = config_data.get('main_args', {}).get('env')
+    scenario = config_data.get('env_args', {}).get('scenario')
+    name = config_data.get('main_args', {}).get('exp_name') or entry
+    return {
+        'name': name,
+        'category': category,
+        'category_label': MODEL_CATEGORIES.get(category, category),
+        'seed': seed,
+        'version': version,
+        'algo': algo,
+        'env': env,
+        'scenario': scenario,
+        'config_path': config_path,
+        'progress_path': progress_path if os.path.exists(progress_path) else '',
+        'status': '训练中' if os.path.exists(os.path.join(model_path, TRAINING_MARKER)) else '可用',
+        'best_score': None,
+        'last_step': None
+    }
+
+
+# 从文件系统收集模型信息
+def collect_models_from_fs():
+    models = []
+    if not os.path.isdir(MODEL_ROOT):
+        return models
+    for category in MODEL_CATEGORIES:
+        category_path = os.path.join(MODEL_ROOT, category)
+        if not os.path.isdir(category_path):
+            continue
+        for entry in os.listdir(category_path):
+            if not os.path.isdir(os.path.join(category_path, entry)):
+                continue
+            model = read_model_run(category, entry)
+            if model:
+                models.append(model)
+    return models
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ModelRegistry:
+    """维护模型目录的内存快照，仅对变化的训练目录重新解析与写库"""
+
+    def __init__(self, connect, ensure_schema=None, check_interval_s=DEFAULT_CHECK_INTERVAL_S):
+        self._connect = connect
+        self._ensure_schema = ensure_schema
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._category_mtimes = {}
+        self._category_entries = {}
+        self._signatures = {}
+        self._runs = {}
+        self._last_check = 0.0
+        self.last_scan = {}
+        self.totals = {'scans': 0, 'skipped': 0, 'runs_parsed': 0, 'scan_ms': 0.0}
+
+    def _list_entries(self, category):
+        """目录 mtime 未变化时复用上次的子目录列表"""
+        category_path = os.path.join(MODEL_ROOT, category)
+        mtime = _stat_signature(category_path)
+        if mtime is None:
+            self._category_mtimes.pop(category, None)
+            self._category_entries[category] = []
+            return []
+        if self._category_mtimes.get(category) != mtime:
+            self._category_mtimes[category] = mtime
+            self._category_entries[category] = sorted(
+                entry for entry in os.listdir(category_path)
+                if os.path.isdir(os.path.join(category_path, entry))
+            )
+        return self._category_entries[category]
+
+    def sync(self, force=False):
+        """检查文件系统变化并增量写库，返回当前模型列表快照"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._schema_ready and now - self._last_check < self.check_interval_s:
+                self.totals['skipped'] += 1
+                return self.snapshot()
+            self._last_check = now
+            started = time.perf_counter()
+            if not self._schema_ready and self._ensure_schema:
+                self._ensure_schema()
+            self._schema_ready = True
+
+            seen = set()
+            changed = []
+            for category in MODEL_CATEGORIES:
+                for entry in self._list_entries(category):
+                    key = (category, entry)
+                    seen.add(key)
+                    run_dir = os.path.join(MODEL_ROOT, category, entry)
+                    signature = (
+                        _stat_signature(os.path.join(run_dir, 'config.json')),
+                        _stat_signature(os.path.join(run_dir, 'progress.txt')),
+                        _stat_signature(os.path.join(run_dir, TRAINING_MARKER))
+                    )
+                    if not force and self._signatures.get(key) == signature:
+                        continue
+                    self._signatures[key] = signature
+                    changed.append(key)
+            scanned = time.perf_counter()
+
+            removed = [key for key in self._runs if key not in seen]
+            for key in removed:
+                self._runs.pop(key, None)
+                self._signatures.pop(key, None)
+
+            updates = []
+            for category, entry in changed:
+                model = read_model_run(category, entry)
+                if model is None:
+                    self._runs.pop((category, entry), None)
+                    continue
+                self._runs[(category, entry)] = model
+                updates.append(model)
+            parsed = time.perf_counter()
+
+            new_points = 0
+            groups = set()
+            if updates:
+                conn = self._connect()
+                # 配置变化可能使模型换组，旧组与新组都需要重新汇总
+                groups = group_keys_for_paths(conn, [m['config_path'] for m in updates])
+                conn.executemany(UPSERT_MODEL_SQL, [
+                    (m['name'], m['category'], m['seed'], m['version'], m['algo'], m['env'],
+                     m['scenario'], m['config_path'], m['progress_path'], m['status'])
+                    for m in updates
+                ])
+                for m in updates:
+                    new_points += self._ingest_progress(conn, m)
+                groups.update(group_key(m) for m in updates)
+                refresh_groups(conn, groups)
+                conn.commit()
+                conn.close()
+            finished = time.perf_counter()
+            metrics.observe_phase('model_scan', scanned - started)
+            metrics.observe_phase('model_parse', parsed - scanned)
+            metrics.observe_phase('model_db', finished - parsed)
+
+            self.last_scan = {
+                'runs_total': len(self._runs),
+                'runs_changed': len(updates),
+                'runs_removed': len(removed),
+                'progress_points_added': new_points,
+                'leaderboard_groups_refreshed': len(groups),
+                'stat_ms': round((scanned - started) * 1000, 3),
+                'parse_ms': round((parsed - scanned) * 1000, 3),
+                'db_ms': round((finished - parsed) * 1000, 3),
+                'total_ms': round((finished - started) * 1000, 3),
+                'forced': force
+            }
+            self.totals['scans'] += 1
+            self.totals['runs_parsed'] += len(updates)
+            self.totals['scan_ms'] = round(self.totals['scan_ms'] + self.last_scan['total_ms'], 3)
+            return self.snapshot()
+
+    def _ingest_progress(self, conn, model):
+        """追加读取进度文件，并以聚合结果回写最新步数与最佳成绩"""
+        row = conn.execute('SELECT id FROM models WHERE config_path = ?', (model['config_path'],)).fetchone()
+        if not row:
+            return 0
+        model_id = row['id']
+        added = ingest_progress(conn, model_id, model['progress_path'])
+        last_step, best_score = progress_summary(conn, model_id)
+        conn.execute(
+            'UPDATE models SET last_step = ?, best_score = ? WHERE id = ?',
+            (last_step, best_score, model_id)
+        )
+        model['id'] = model_id
+        model['last_step'] = last_step
+        model['best_score'] = best_score
+        return added
+
+    def snapshot(self):
+        """按类别与目录名排序的模型列表副本"""
+        return [dict(self._runs[key]) for key in sorted(self._runs)]
+
+    def stats(self):
+        return {'last_scan': dict(self.last_scan), 'totals': dict(self.totals)}
@@ -0,0 +1,446 @@
+# policy_inference.py
+"""策略模型推理子系统
+
+按模型 id 惰性加载 models/*/seed-*/models/ 下的 actor_agent*.pt、critic_agent.pt
+与 value_normalizer.pt，权重转换为 NumPy 数组后在 CPU 上批量前向推理：
+- PolicyCache：按内存占用淘汰的 LRU 缓存，每个模型只加载一次
+- InferenceBatcher：在很短的时间窗口内合并同一模型的多个请求，一次前向完成
+"""
+import collections
+import glob
+import json
+import os
+import pickle
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_BATCH_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH_ENVS = 4096
+LAYER_NORM_EPS = 1e-5
+
+_ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'leaky_relu': lambda x: np.where(x > 0, x, 0.01 * x),
+    'selu': lambda x: 1.0507009873554805 * np.where(x > 0, x, 1.6732632423543772 * (np.exp(x) - 1)),
+}
+
+# torch 旧式 Storage 类型到 NumPy dtype 的映射，用于未安装 torch 时直接解析检查点
+_STORAGE_DTYPES = {
+    'FloatStorage': np.float32,
+    'DoubleStorage': np.float64,
+    'HalfStorage': np.float16,
+    'LongStorage': np.int64,
+    'IntStorage': np.int32,
+    'ShortStorage': np.int16,
+    'CharStorage': np.int8,
+    'ByteStorage': np.uint8,
+    'BoolStorage': np.bool_,
+}
+
+
+class InferenceError(Exception):
+    """模型无法加载或输入不合法"""
+
+
+# ---- 检查点读取 ----
+def _rebuild_tensor(storage, storage_offset, size, stride, *args):
+    itemsize = storage.dtype.itemsize
+    if not size:
+        return storage[storage_offset:storage_offset + 1].reshape(()).copy()
+    view = np.lib.stride_tricks.as_strided(
+        storage[storage_offset:],
+        shape=tuple(size),
+        strides=tuple(s * itemsize for s in stride)
+    )
+    return np.array(view)
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    """只允许 state_dict 所需类型的受限反序列化器"""
+
+    def __init__(self, file, archive, prefix):
+        super().__init__(file)
+        self.archive = archive
+        self.prefix = prefix
+
+    def find_class(self, module, name):
+        if module == 'collections' and name == 'OrderedDict':
+            return collections.OrderedDict
+        if module == 'torch._utils' and name == '_rebuild_tensor_v2':
+            return _rebuild_tensor
+        if module == 'torch' and name in _STORAGE_DTYPES:
+            return _STORAGE_DTYPES[name]
+        raise pickle.UnpicklingError(f'检查点包含不支持的类型: {module}.{name}')
+
+    def persistent_load(self, pid):
+        # ('storage', storage_type, key, location, numel)
+        _, dtype, key, _, numel = pid
+        raw = self.archive.read(f'{self.prefix}/data/{key}')
+        return np.frombuffer(raw, dtype=dtype, count=numel)
+
+
+def _load_state_dict_without_torch(path):
+    with zipfile.ZipFile(path) as archive:
+        pkl_name = next((n for n in archive.namelist() if n.endswith('/data.pkl')), None)
+        if pkl_name is None:
+            raise InferenceError(f'无法识别的检查点格式: {path}')
+        prefix = pkl_name[:-len('/data.pkl')]
+        with archive.open(pkl_name) as f:
+            return _CheckpointUnpickler(f, archive, prefix).load()
+
+
+def load_state_dict(path):
+    """读取 state_dict 并转换为 {name: ndarray}，优先使用 torch，未安装时直接解析 zip 检查点"""
+    try:
+        import torch
+    except ImportError:
+        state = _load_state_dict_without_torch(path)
+    else:
+        state = torch.load(path, map_location='cpu')
+        state = {k: v.detach().cpu().numpy() for k, v in state.items() if hasattr(v, 'detach')}
+    return {k: np.asarray(v, dtype=np.float32) for k, v in state.items() if isinstance(v, np.ndarray)}
+
+
+# ---- 网络前向 ----
+def _layer_norm(x, weight, bias):
+    mean = x.mean(axis=-1, keepdims=True)
+    var = x.var(axis=-1, keepdims=True)
+    return (x - mean) / np.sqrt(var + LAYER_NORM_EPS) * weight + bias
+
+
+class MLPNetwork:
+    """HARL MLPBase 结构的 NumPy 实现：feature_norm → [Linear, 激活, LayerNorm]*k"""
+
+    def __init__(self, state, prefix, activation='relu'):
+        if any('rnn' in k for k in state):
+            raise InferenceError('暂不支持循环策略网络')
+        self.activation = _ACTIVATIONS.get(activation, _ACTIVATIONS['relu'])
+        self.feature_norm = None
+        if f'{prefix}feature_norm.weight' in state:
+            self.feature_norm = (state[f'{prefix}feature_norm.weight'], state[f'{prefix}feature_norm.bias'])
+        pattern = re.compile(re.escape(prefix) + r'mlp\.fc\.(\d+)\.weight$')
+        indices = sorted(int(m.group(1)) for k in state for m in [pattern.match(k)] if m)
+        self.layers = []
+        for idx in indices:
+            weight = state[f'{prefix}mlp.fc.{idx}.weight']
+            bias = state[f'{prefix}mlp.fc.{idx}.bias']
+            self.layers.append(('linear' if weight.ndim == 2 else 'norm', weight, bias))
+        if not self.layers:
+            raise InferenceError('检查点缺少 MLP 层')
+        first_linear = next(w for kind, w, _ in self.layers if kind == 'linear')
+        self.input_dim = first_linear.shape[1]
+
+    def forward(self, x):
+        if self.feature_norm is not None:
+            x = _layer_norm(x, *self.feature_norm)
+        for kind, weight, bias in self.layers:
+            if kind == 'linear':
+                x = self.activation(x @ weight.T + bias)
+            else:
+                x = _layer_norm(x, weight, bias)
+        return x
+
+
+class ActorNetwork:
+    """策略网络：离散动作输出 logits，连续动作输出高斯均值"""
+
+    def __init__(self, state, activation='relu', std_x_coef=1.0, std_y_coef=0.5):
+        self.base = MLPNetwork(state, 'base.', activation)
+        if 'act.action_out.linear.weight' in state:
+            self.action_type = 'discrete'
+            self.out_weight = state['act.action_out.linear.weight']
+            self.out_bias = state['act.action_out.linear.bias']
+        elif 'act.action_out.fc_mean.weight' in state:
+            self.action_type = 'continuous'
+            self.out_weight = state['act.action_out.fc_mean.weight']
+            self.out_bias = state['act.action_out.fc_mean.bias']
+            log_std = state.get('act.action_out.log_std', np.zeros(self.out_weight.shape[0], dtype=np.float32))
+            self.action_std = 1.0 / (1.0 + np.exp(-log_std / std_x_coef)) * std_y_coef
+        else:
+            raise InferenceError('不支持的动作输出层')
+        self.input_dim = self.base.input_dim
+        self.nbytes = sum(v.nbytes for v in state.values())
+
+    def act(self, obs, deterministic=True, rng=None):
+        out = self.base.forward(obs) @ self.out_weight.T + self.out_bias
+        if self.action_type == 'discrete':
+            shifted = out - out.max(axis=-1, keepdims=True)
+            probs = np.exp(shifted)
+            probs /= probs.sum(axis=-1, keepdims=True)
+            if deterministic:
+                actions = probs.argmax(axis=-1)
+            else:
+                rng = rng or np.random.default_rng()
+                cumulative = probs.cumsum(axis=-1)
+                actions = (cumulative < rng.random((len(probs), 1))).sum(axis=-1)
+            return actions[:, None], probs
+        if deterministic:
+            return out, None
+        rng = rng or np.random.default_rng()
+        return out + rng.standard_normal(out.shape).astype(np.float32) * self.action_std, None
+
+
+class CriticNetwork:
+    """价值网络，输出经 value_normalizer 反归一化后的状态价值"""
+
+    def __init__(self, state, normalizer_state, activation='relu'):
+        self.base = MLPNetwork(state, 'base.', activation)
+        self.out_weight = state['v_out.weight']
+        self.out_bias = state['v_out.bias']
+        self.input_dim = self.base.input_dim
+        self.norm = None
+        if {'running_mean', 'running_mean_sq', 'debiasing_term'} <= set(normalizer_state):
+            debias = np.maximum(normalizer_state['debiasing_term'], 1e-5)
+            mean = normalizer_state['running_mean'] / debias
+            var = np.maximum(normalizer_state['running_mean_sq'] / debias - mean ** 2, 1e-2)
+            self.norm = (mean, np.sqrt(var))
+        self.nbytes = sum(v.nbytes for v in state.values()) + sum(v.nbytes for v in normalizer_state.values())
+
+    def values(self, share_obs):
+        out = self.base.forward(share_obs) @ self.out_weight.T + self.out_bias
+        if self.norm is not None:
+            out = out * self.norm[1] + self.norm[0]
+        return out
+
+
+class PolicyBundle:
+    """一个模型目录下全部智能体的策略与价值网络"""
+
+    def __init__(self, model_id, model_dir):
+        self.model_id = model_id
+        weights_dir = os.path.join(model_dir, 'models')
+        try:
+            with open(os.path.join(model_dir, 'config.json'), 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except Exception:
+            config = {}
+        model_args = config.get('algo_args', {}).get('model', {}) if isinstance(config, dict) else {}
+        activation = model_args.get('activation_func') or 'relu'
+
+        actor_paths = sorted(
+            glob.glob(os.path.join(weights_dir, 'actor_agent*.pt')),
+            key=lambda p: int(re.search(r'actor_agent(\d+)\.pt$', p).group(1))
+        )
+        if not actor_paths:
+            raise InferenceError('模型目录中没有 actor_agent*.pt')
+        self.actors = [
+            ActorNetwork(
+                load_state_dict(p),
+                activation=activation,
+                std_x_coef=model_args.get('std_x_coef') or 1.0,
+                std_y_coef=model_args.get('std_y_coef') or 0.5
+            )
+            for p in actor_paths
+        ]
+        self.critic = None
+        critic_path = os.path.join(weights_dir, 'critic_agent.pt')
+        if os.path.exists(critic_path):
+            normalizer_path = os.path.join(weights_dir, 'value_normalizer.pt')
+            normalizer_state = load_state_dict(normalizer_path) if os.path.exists(normalizer_path) else {}
+            self.critic = CriticNetwork(load_state_dict(critic_path), normalizer_state, activation)
+        self.nbytes = sum(a.nbytes for a in self.actors) + (self.critic.nbytes if self.critic else 0)
+
+    @property
+    def n_agents(self):
+        return len(self.actors)
+
+    def describe(self):
+        return {
+            'model_id': self.model_id,
+            'n_agents': self.n_agents,
+            'obs_dims': [a.input_dim for a in self.actors],
+            'action_types': [a.action_type for a in self.actors],
+            'share_obs_dim': self.critic.input_dim if self.critic else None,
+            'nbytes': self.nbytes
+        }
+
+    def act(self, obs, deterministic=True, rng=None):
+        """obs: [n_agents] 个 (n_envs, obs_dim) 数组，返回每个智能体的动作与离散动作概率"""
+        actions, probs = [], []
+        for actor, agent_obs in zip(self.actors, obs):
+            a, p = actor.act(agent_obs, deterministic=deterministic, rng=rng)
+            actions.append(a)
+            probs.append(p)
+        return actions, probs
+
+
+class PolicyCache:
+    """按内存占用淘汰的 LRU 模型缓存，同一模型并发请求只加载一次"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def total_bytes(self):
+        return sum(b.nbytes for b in self._entries.values())
+
+    def get(self, model_id, model_dir):
+        with self._lock:
+            bundle = self._entries.get(model_id)
+            if bundle is not None:
+                self._entries.move_to_end(model_id)
+                self.hits += 1
+                return bundle
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+        with load_lock:
+            with self._lock:
+                bundle = self._entries.get(model_id)
+                if bundle is not None:
+                    self.hits += 1
+                    return bundle
+            bundle = PolicyBundle(model_id, model_dir)
+            with self._lock:
+                self.misses += 1
+                self._entries[model_id] = bundle
+                self._evict()
+                self._load_locks.pop(model_id, None)
+            return bundle
+
+    def _evict(self):
+        # 至少保留最近使用的一个模型
+        while len(self._entries) > 1 and self.total_bytes > self.max_bytes:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, model_id):
+        with self._lock:
+            self._entries.pop(model_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': list(self._entries.keys()),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class _PendingRequest:
+    __slots__ = ('bundle', 'obs', 'deterministic', 'n_envs', 'future')
+
+    def __init__(self, bundle, obs, deterministic):
+        self.bundle = bundle
+        self.obs = obs
+        self.deterministic = deterministic
+        self.n_envs = obs[0].shape[0]
+        self.future = Future()
+
+
+class InferenceBatcher:
+    """将时间窗口内到达的同模型请求合并为一次前向推理"""
+
+    def __init__(self, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_envs=DEFAULT_MAX_BATCH_ENVS):
+        self.window_s = window_ms / 1000.0
+        self.max_batch_envs = max_batch_envs
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, bundle, obs, deterministic=True):
+        """提交推理请求，返回 Future，结果为 (actions, probs, batch_envs)"""
+        request_item = _PendingRequest(bundle, obs, deterministic)
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append(request_item)
+            self._cond.notify()
+        return request_item.future
+
+    def _collect(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            first = self._queue.popleft()
+            batch = [first]
+            envs = first.n_envs
+            deadline = time.monotonic() + self.window_s
+            while envs < self.max_batch_envs:
+                matched = next((r for r in self._queue
+                                if r.bundle is first.bundle and r.deterministic == first.deterministic), None)
+                if matched is not None:
+                    self._queue.remove(matched)
+                    batch.append(matched)
+                    envs += matched.n_envs
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                bundle = batch[0].bundle
+                stacked = [np.concatenate([r.obs[a] for r in batch], axis=0) for a in range(bundle.n_agents)]
+                actions, probs = bundle.act(stacked, deterministic=batch[0].deterministic)
+                total = stacked[0].shape[0]
+                self.batches += 1
+                self.requests += len(batch)
+                offset = 0
+                for r in batch:
+                    end = offset + r.n_envs
+                    r.future.set_result((
+                        [a[offset:end] for a in actions],
+                        [p[offset:end] if p is not None else None for p in probs],
+                        total
+                    ))
+                    offset = end
+            except Exception as e:
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+
+    def stats(self):
+        return {
+            'window_ms': self.window_s * 1000.0,
+            'batches': self.batches,
+            'requests': self.requests,
+            'queued': len(self._queue)
+        }
+
+
+def prepare_observations(bundle, obs):
+    """校验并整理 [n_agents][n_envs][obs_dim] 形式的观测"""
+    if not isinstance(obs, list) or len(obs) != bundle.n_agents:
+        raise InferenceError(f'观测需包含 {bundle.n_agents} 个智能体')
+    prepared = []
+    n_envs = None
+    for actor, agent_obs in zip(bundle.actors, obs):
+        try:
+            arr = np.asarray(agent_obs, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise InferenceError('观测数据格式错误')
+        if arr.ndim == 1:
+            arr = arr[None, :]
+        if arr.ndim != 2 or arr.shape[1] != actor.input_dim:
+            raise InferenceError(f'观测维度应为 (n_envs, {actor.input_dim})')
+        if n_envs is not None and arr.shape[0] != n_envs:
+            raise InferenceError('各智能体的环境数量不一致')
+        n_envs = arr.shape[0]
+        prepared.append(arr)
+    return prepared
@@ -0,0 +1,188 @@
+# profiler.py
+"""按需的单请求性能剖析
+
+以下任一条件满足时，用 cProfile 包裹该请求的视图函数执行过程：
+- 管理员请求带 X-Profile: 1 请求头或 ?_profile=1 参数
+- 按 PROFILE_SAMPLE_EVERY 每 N 个请求抽样一次（0 表示关闭抽样）
+
+每个剖析结果保存为 profiles/<id>.prof（可用 pstats/snakeviz 打开）与同名 .json 摘要
+（路由、耗时、时间、最耗时的函数），超过 PROFILE_MAX_KEEP 个时删除最旧的结果。
+未触发剖析的请求只多一次计数器自增。
+"""
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from datetime import datetime
+
+PROFILES_DIR = 'profiles'
+DEFAULT_MAX_KEEP = 200
+TOP_FUNCTIONS = 15
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY = '_profile'
+_PROFILE_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+
+class ProfileError(Exception):
+    """剖析结果不存在或编号无效"""
+
+
+def _function_label(key):
+    filename, line, name = key
+    if filename == '~':
+        # 内置函数
+        return name
+    # 项目内文件显示相对路径，第三方库只保留包内路径
+    cwd = os.getcwd() + os.sep
+    if filename.startswith(cwd):
+        filename = filename[len(cwd):]
+    elif 'site-packages' + os.sep in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{filename}:{line}({name})'
+
+
+def top_functions(profile, sort='tottime', limit=TOP_FUNCTIONS):
+    """按自身耗时或累计耗时排序的前若干个函数"""
+    stats = pstats.Stats(profile)
+    index = 2 if sort == 'tottime' else 3
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+    return [{
+        'function': _function_label(key),
+        'calls': nc,
+        'primitive_calls': cc,
+        'tottime_ms': round(tt * 1000, 3),
+        'cumtime_ms': round(ct * 1000, 3)
+    } for key, (cc, nc, tt, ct, _) in rows]
+
+
+class RequestProfiler:
+    """决定哪些请求需要剖析，并保存与读取剖析结果"""
+
+    def __init__(self, directory=PROFILES_DIR, sample_every=None, max_keep=None, admins=None):
+        self.directory = directory
+        self.sample_every = int(sample_every if sample_every is not None
+                                else os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+        self.max_keep = int(max_keep or os.environ.get('PROFILE_MAX_KEEP', DEFAULT_MAX_KEEP))
+        admin_names = admins if admins is not None else os.environ.get('PROFILE_ADMINS', 'admin').split(',')
+        self.admins = {name.strip() for name in admin_names if name.strip()}
+        self._counter = itertools.count(1)
+        self.saved = 0
+
+    def is_admin(self, username):
+        return username in self.admins
+
+    def trigger(self, headers, args, username):
+        """返回触发方式（'manual' / 'sample'），不需要剖析时返回 None"""
+        if headers.get(PROFILE_HEADER) == '1' or args.get(PROFILE_QUERY) == '1':
+            return 'manual' if self.is_admin(username) else None
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def save(self, profile, meta):
+        """保存 .prof 与摘要，返回剖析编号"""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f'{datetime.now().strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        profile.create_stats()
+        summary = dict(meta, id=profile_id,
+                       top_tottime=top_functions(profile, 'tottime'),
+                       top_cumtime=top_functions(profile, 'cumtime'))
+        path = os.path.join(self.directory, profile_id)
+        profile.dump_stats(path + '.prof')
+        with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(path + '.json.tmp', path + '.json')
+        self.saved += 1
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        try:
+            names = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+        except OSError:
+            return
+        for profile_id in names[:max(0, len(names) - self.max_keep)]:
+            for suffix in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except OSError:
+                    pass
+
+    def list(self, order='duration', limit=100):
+        """读取全部摘要，默认按耗时降序"""
+        summaries = []
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except OSError:
+            return []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        if order == 'duration':
+            summaries.sort(key=lambda s: s.get('duration_ms', 0), reverse=True)
+        else:
+            summaries.sort(key=lambda s: s.get('id', ''), reverse=True)
+        return summaries[:limit]
+
+    def path_for(self, profile_id):
+        if not _PROFILE_ID_RE.match(profile_id or ''):
+            raise ProfileError('无效的剖析编号')
+        path = os.path.join(self.directory, profile_id + '.prof')
+        if not os.path.exists(path):
+            raise ProfileError('剖析结果不存在')
+        return path
+
+    def init_app(self, app, username_getter, skip_endpoints=('static',)):
+        """注册请求钩子：触发时在视图执行期间启用 cProfile"""
+        from flask import g, request
+
+        @app.before_request
+        def _profile_begin():
+            if request.endpoint in skip_endpoints:
+                return
+            trigger = self.trigger(request.headers, request.args, username_getter())
+            if trigger is None:
+                return
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # 当前线程已有其他剖析器在运行
+                return
+            g._profile = (profile, trigger, time.perf_counter())
+
+        @app.after_request
+        def _profile_end(response):
+            state = g.pop('_profile', None)
+            if state is None:
+                return response
+            profile, trigger, started = state
+            profile.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            profile_id = self.save(profile, {
+                'route': request.url_rule.rule if request.url_rule is not None else 'unmatched',
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 3),
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'user': username_getter(),
+                'trigger': trigger,
+                'pid': os.getpid()
+            })
+            response.headers['X-Profile-Id'] = profile_id
+            return response
+
+        @app.teardown_request
+        def _profile_cleanup(exc=None):
+            # 请求异常中断、未经过 after_request 时停止剖析，结果丢弃
+            state = g.pop('_profile', None)
+            if state is not None:
+                state[0].disable()
@@ -0,0 +1,146 @@
+# progress_store.py
+"""progress.txt 增量入库
+
+训练任务会持续向 progress.txt 追加 "step,reward" 行。这里为每个文件记录
+inode 与已读取的字节偏移，每次只解析新追加的完整行并写入 model_progress 表；
+最新步数与最佳成绩通过索引上的聚合查询得到，开销与新增行数相关而与文件长度无关。
+"""
+import os
+
+# 每次 IN 查询的参数个数上限（低于 SQLite 默认的 999）
+_IN_CHUNK = 500
+
+
+def ensure_progress_tables(conn):
+    """创建奖励曲线表与文件偏移表"""
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS model_progress (
+            model_id INTEGER NOT NULL,
+            step INTEGER NOT NULL,
+            reward REAL NOT NULL,
+            PRIMARY KEY (model_id, step)
+        ) WITHOUT ROWID'''
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_model_progress_reward ON model_progress(model_id, reward)')
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS progress_offsets (
+            model_id INTEGER PRIMARY KEY,
+            progress_path TEXT NOT NULL,
+            inode INTEGER,
+            offset INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )'''
+    )
+
+
+def parse_progress_lines(chunk):
+    """解析 "step,reward" 文本行，跳过无法识别的行"""
+    points = []
+    for line in chunk.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2:
+            continue
+        try:
+            step = int(float(parts[0]))
+            reward = float(parts[1])
+        except ValueError:
+            continue
+        points.append((step, reward))
+    return points
+
+
+def ingest_progress(conn, model_id, progress_path):
+    """读取 progress.txt 自上次偏移以来追加的完整行并入库，返回新增点数
+
+    文件被替换（inode 变化）或截断（长度小于偏移）时清空该模型的曲线后重新读取。
+    """
+    row = conn.execute(
+        'SELECT progress_path, inode, offset FROM progress_offsets WHERE model_id = ?', (model_id,)
+    ).fetchone()
+    try:
+        st = os.stat(progress_path) if progress_path else None
+    except OSError:
+        st = None
+    if st is None:
+        if row:
+            conn.execute('DELETE FROM model_progress WHERE model_id = ?', (model_id,))
+            conn.execute('DELETE FROM progress_offsets WHERE model_id = ?', (model_id,))
+        return 0
+
+    offset = 0
+    if row and row['progress_path'] == progress_path and row['inode'] == st.st_ino and row['offset'] <= st.st_size:
+        offset = row['offset']
+    elif row:
+        conn.execute('DELETE FROM model_progress WHERE model_id = ?', (model_id,))
+    if offset == st.st_size and row:
+        return 0
+
+    with open(progress_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(st.st_size - offset)
+    # 只处理以换行结尾的完整行，写了一半的行留到下次
+    end = data.rfind(b'\n') + 1
+    points = parse_progress_lines(data[:end].decode('utf-8', errors='ignore'))
+    if points:
+        conn.executemany(
+            'INSERT OR REPLACE INTO model_progress (model_id, step, reward) VALUES (?, ?, ?)',
+            [(model_id, step, reward) for step, reward in points]
+        )
+    conn.execute(
+        '''INSERT INTO progress_offsets (model_id, progress_path, inode, offset, updated_at)
+           VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+           ON CONFLICT(model_id) DO UPDATE SET
+               progress_path=excluded.progress_path,
+               inode=excluded.inode,
+               offset=excluded.offset,
+               updated_at=excluded.updated_at''',
+        (model_id, progress_path, st.st_ino, offset + end)
+    )
+    return len(points)
+
+
+def progress_summary(conn, model_id):
+    """返回 (last_step, best_score)，均由索引聚合得到"""
+    last_step = conn.execute(
+        'SELECT MAX(step) FROM model_progress WHERE model_id = ?', (model_id,)
+    ).fetchone()[0]
+    best_score = conn.execute(
+        'SELECT MAX(reward) FROM model_progress WHERE model_id = ?', (model_id,)
+    ).fetchone()[0]
+    return last_step, best_score
+
+
+def load_progress_series(conn, model_id):
+    """按步数升序返回 (steps, rewards) 两个列表"""
+    rows = conn.execute(
+        'SELECT step, reward FROM model_progress WHERE model_id = ? ORDER BY step', (model_id,)
+    ).fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+def load_progress_series_many(conn, model_ids):
+    """按模型批量读取曲线，返回 {model_id: (steps, rewards)}，均为按步数升序的 NumPy 数组"""
+    # 模型目录同步也会导入本模块，NumPy 只在读取曲线时导入
+    import numpy as np
+
+    model_ids = list(model_ids)
+    series = {}
+    for start in range(0, len(model_ids), _IN_CHUNK):
+        chunk = model_ids[start:start + _IN_CHUNK]
+        cursor = conn.execute(
+            f'''SELECT model_id, step, reward FROM model_progress
+               WHERE model_id IN ({",".join("?" * len(chunk))})
+               ORDER BY model_id, step''',
+            chunk
+        )
+        # 数据量大时直接取元组，省去逐行构造 sqlite3.Row
+        cursor.row_factory = None
+        rows = cursor.fetchall()
+        if not rows:
+            continue
+        data = np.array(rows, dtype=np.float64)
+        # 按 model_id 变化的位置切分
+        bounds = np.flatnonzero(np.diff(data[:, 0])) + 1
+        for block in np.split(data, bounds):
+            series[int(block[0, 0])] = (block[:, 1], block[:, 2])
+    return series
@@ -0,0 +1,255 @@
+# reward_series.py
+"""奖励曲线降采样与平滑
+
+- lttb：Largest-Triangle-Three-Buckets，保留曲线形状的降采样
+- minmax：按桶保留最小/最大值，保证峰谷不丢失
+- ema / rolling：指数滑动平均与滚动均值平滑
+- compare_series：多条曲线插值到公共步数网格后计算逐点均值与置信带
+结果按 (模型, 文件大小/修改时间, 点数预算, 参数) 缓存，重复请求不再重新计算。
+"""
+import collections
+import hashlib
+import threading
+
+import numpy as np
+
+DEFAULT_POINT_BUDGET = 500
+MAX_POINT_BUDGET = 10000
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+SMOOTHING_METHODS = ('none', 'ema', 'rolling')
+DEFAULT_EMA_ALPHA = 0.1
+DEFAULT_ROLLING_WINDOW = 10
+DEFAULT_CACHE_ENTRIES = 256
+BAND_METHODS = ('ci95', 'std', 'minmax')
+GRID_RANGES = ('union', 'overlap')
+MAX_COMPARE_MODELS = 100
+# 95% 双侧 t 分布临界值（自由度 1-30），自由度更大时取正态近似 1.96
+_T95 = np.array([
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+])
+
+
+def ema(values, alpha=DEFAULT_EMA_ALPHA):
+    """指数滑动平均，alpha 越大越贴近原始值"""
+    values = np.asarray(values, dtype=np.float64)
+    decay = 1.0 - alpha
+    if values.size == 0 or decay <= 0:
+        return values.copy()
+    # 分块闭式计算：块内 out[k] = decay^(k+1)*acc + alpha*decay^k*cumsum(v[j]*decay^-j)，
+    # 块长保证 decay^-k 不溢出
+    block = int(min(max(100 / -np.log10(decay), 1), 65536)) if decay < 1 else values.size
+    out = np.empty_like(values)
+    acc = values[0]
+    for start in range(0, values.size, block):
+        segment = values[start:start + block]
+        k = np.arange(segment.size)
+        powers = decay ** k
+        out[start:start + segment.size] = alpha * powers * np.cumsum(segment / powers) + acc * decay * powers
+        acc = out[start + segment.size - 1]
+    return out
+
+
+def rolling_mean(values, window=DEFAULT_ROLLING_WINDOW):
+    """尾随窗口均值，序列开头窗口不足时使用已有点"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0 or window <= 1:
+        return values
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    idx = np.arange(1, values.size + 1)
+    start = np.maximum(idx - window, 0)
+    return (cumsum[idx] - cumsum[start]) / (idx - start)
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket_edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+        next_start, next_end = end, bucket_edges[i + 2] if i + 2 < len(bucket_edges) else n
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_buckets(y, threshold):
+    """按桶保留最小与最大值，返回按原顺序排列的下标"""
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+    buckets = max(threshold // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picks = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        segment = y[start:end]
+        picks.append(start + int(np.argmin(segment)))
+        picks.append(start + int(np.argmax(segment)))
+    return np.unique(np.asarray(picks, dtype=np.int64))
+
+
+def build_series(steps, rewards, points=DEFAULT_POINT_BUDGET, method='lttb',
+                 smooth='none', alpha=DEFAULT_EMA_ALPHA, window=DEFAULT_ROLLING_WINDOW):
+    """先在全量数据上平滑，再降采样到点数预算"""
+    x = np.asarray(steps, dtype=np.float64)
+    y = np.asarray(rewards, dtype=np.float64)
+    if smooth == 'ema':
+        smoothed = ema(y, alpha)
+    elif smooth == 'rolling':
+        smoothed = rolling_mean(y, window)
+    else:
+        smoothed = None
+    target = smoothed if smoothed is not None else y
+    if method == 'minmax':
+        idx = minmax_buckets(target, points)
+    else:
+        idx = lttb(x, target, points)
+    result = {
+        'steps': x[idx].astype(np.int64).tolist(),
+        'rewards': y[idx].round(6).tolist(),
+        'total_points': int(x.size),
+        'returned_points': int(idx.size),
+        'method': method,
+        'smooth': smooth
+    }
+    if smoothed is not None:
+        result['smoothed'] = smoothed[idx].round(6).tolist()
+    return result
+
+
+def smooth_values(values, smooth='none', alpha=DEFAULT_EMA_ALPHA, window=DEFAULT_ROLLING_WINDOW):
+    if smooth == 'ema':
+        return ema(values, alpha)
+    if smooth == 'rolling':
+        return rolling_mean(values, window)
+    return np.asarray(values, dtype=np.float64)
+
+
+def t_critical_95(df):
+    """逐元素返回 95% 双侧 t 临界值，df < 1 时为 NaN"""
+    df = np.asarray(df, dtype=np.int64)
+    values = np.where(df > len(_T95), 1.96, _T95[np.clip(df, 1, len(_T95)) - 1])
+    return np.where(df >= 1, values, np.nan)
+
+
+def align_series(series, points=DEFAULT_POINT_BUDGET, grid_range='union',
+                 smooth='none', alpha=DEFAULT_EMA_ALPHA, window=DEFAULT_ROLLING_WINDOW):
+    """把多条 (steps, rewards) 曲线线性插值到公共步数网格
+
+    union 网格覆盖所有曲线的步数范围，overlap 只取各曲线共同覆盖的范围；
+    平滑在各自的原始采样点上进行，网格点超出某条曲线步数范围时该曲线取 NaN，不做外推。
+    返回 (grid, matrix)，matrix 形状为 (曲线数, 网格点数)，行顺序与输入一致；没有可用网格时返回 None。
+    """
+    series = [(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)) for x, y in series]
+    starts = np.array([x[0] for x, _ in series if x.size])
+    ends = np.array([x[-1] for x, _ in series if x.size])
+    if not starts.size:
+        return None
+    if grid_range == 'overlap':
+        lo, hi = starts.max(), ends.min()
+    else:
+        lo, hi = starts.min(), ends.max()
+    if hi < lo:
+        return None
+    grid = np.linspace(lo, hi, points) if hi > lo else np.array([lo])
+    matrix = np.full((len(series), grid.size), np.nan)
+    for i, (x, y) in enumerate(series):
+        if x.size:
+            matrix[i] = np.interp(grid, x, smooth_values(y, smooth, alpha, window), left=np.nan, right=np.nan)
+    return grid, matrix
+
+
+def band_statistics(matrix, band='ci95'):
+    """逐列计算有效曲线数、均值与上下界，全部为 NaN 的列结果为 NaN"""
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=0)
+    filled = np.where(valid, matrix, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=0) / count
+        squared = np.where(valid, (matrix - mean) ** 2, 0.0).sum(axis=0)
+        std = np.sqrt(squared / (count - 1))
+        std = np.where(count > 1, std, np.nan)
+        if band == 'minmax':
+            lower = np.where(valid, matrix, np.inf).min(axis=0)
+            upper = np.where(valid, matrix, -np.inf).max(axis=0)
+            lower = np.where(count > 0, lower, np.nan)
+            upper = np.where(count > 0, upper, np.nan)
+        else:
+            half = std if band == 'std' else t_critical_95(count - 1) * std / np.sqrt(count)
+            lower, upper = mean - half, mean + half
+    return count, mean, std, lower, upper
+
+
+def _json_values(values):
+    """四舍五入并把 NaN 转为 None，便于 JSON 序列化"""
+    return [None if v != v else v for v in np.round(values, 6).tolist()]
+
+
+def compare_series(series, points=DEFAULT_POINT_BUDGET, band='ci95', grid_range='union',
+                   smooth='none', alpha=DEFAULT_EMA_ALPHA, window=DEFAULT_ROLLING_WINDOW, include_runs=False):
+    """多模型对比：series 为 [(steps, rewards)]，返回公共网格上的均值、置信带与各曲线插值结果"""
+    aligned = align_series(series, points, grid_range, smooth, alpha, window)
+    if aligned is None:
+        return None
+    grid, matrix = aligned
+    count, mean, std, lower, upper = band_statistics(matrix, band)
+    result = {
+        'steps': np.round(grid).astype(np.int64).tolist(),
+        'mean': _json_values(mean),
+        'std': _json_values(std),
+        'lower': _json_values(lower),
+        'upper': _json_values(upper),
+        'count': count.tolist(),
+        'band': band,
+        'grid_range': grid_range,
+        'smooth': smooth
+    }
+    if include_runs:
+        result['runs'] = [_json_values(row) for row in matrix]
+    return result
+
+
+class SeriesCache:
+    """线程安全的 LRU 结果缓存"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def make_etag(key):
+    """由缓存键生成强 ETag"""
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
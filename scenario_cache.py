@@ -0,0 +1,104 @@
+# scenario_cache.py
+"""场景接口响应缓存
+
+缓存 /api/scenario/<id> 与 /api/scenarios 序列化后的 JSON 字节串，键中带有
+数据库里的场景修订号：创建、编辑、删除场景时在同一事务内递增修订号，
+其他进程的缓存也会随之失效。响应附带由内容计算的强 ETag，浏览器重复请求时返回 304。
+"""
+import collections
+import hashlib
+import threading
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+REVISION_NAME = 'scenarios'
+
+
+def ensure_revision_table(conn):
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS cache_revisions (
+            name TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL DEFAULT 0
+        )'''
+    )
+    conn.execute(
+        'INSERT OR IGNORE INTO cache_revisions (name, revision) VALUES (?, 0)', (REVISION_NAME,)
+    )
+
+
+def current_revision(conn):
+    row = conn.execute('SELECT revision FROM cache_revisions WHERE name = ?', (REVISION_NAME,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_revision(conn):
+    """场景数据变化时调用，由调用方提交事务"""
+    conn.execute('UPDATE cache_revisions SET revision = revision + 1 WHERE name = ?', (REVISION_NAME,))
+
+
+class CachedBody:
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+
+
+class ScenarioCache:
+    """按字节数限制大小的 LRU，值为序列化后的响应体"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        entry = CachedBody(body)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self):
+        """丢弃本进程内所有旧修订号的条目"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,287 @@
+# scenario_data.py
+"""场景数据解析工具，供页面接口与后台仿真引擎共用"""
+import json
+
+# 敌方单位类型与存储字段的对应关系：(类型, 数量字段, 位置字段, id 前缀, 默认编号前缀)
+ENEMY_UNIT_COLUMNS = [
+    ('reconnaissance_drone', 'enemy_reconnaissance_drones', 'enemy_reconnaissance_positions', 'recon', '侦察无人机'),
+    ('attack_helicopter', 'enemy_attack_helicopters', 'enemy_helicopter_positions', 'heli', '武装直升机'),
+    ('tank', 'enemy_tanks', 'enemy_tank_positions', 'tank', '坦克'),
+    ('armored_vehicle', 'enemy_armored_vehicles', 'enemy_vehicle_positions', 'vehicle', '装甲车'),
+    ('military_base', 'enemy_military_bases', 'enemy_base_positions', 'base', '军事基地'),
+]
+# 类型 -> (数量字段, id 前缀, 默认编号前缀)
+ENEMY_UNIT_TYPES = {
+    unit_type: (count_col, id_prefix, default_code)
+    for unit_type, count_col, _, id_prefix, default_code in ENEMY_UNIT_COLUMNS
+}
+
+INSERT_SCENARIO_UNIT_SQL = '''INSERT INTO scenario_units
+   (scenario_id, side, type, seq, code, lat, lng, altitude, ar1, pl10, cannon)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+# 数据清洗与转换工具
+def safe_int(value, default=0):
+    """安全转换为整数，转换失败返回默认值"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_drone_entry(drone, default_id=None):
+    """标准化单架无人机数据，移除已弃用字段"""
+    normalized = {
+        'id': drone.get('id', default_id),
+        'code': drone.get('code', ''),
+        'lat': drone.get('lat'),
+        'lng': drone.get('lng'),
+        'altitude': safe_int(drone.get('altitude', 100), 100),
+        'ar1': safe_int(drone.get('ar1', drone.get('hq9b', 0)), 0),
+        'pl10': safe_int(drone.get('pl10', 0), 0),
+        'cannon': safe_int(drone.get('cannon', 0), 0)
+    }
+    return normalized
+
+
+def serialize_drone_payloads(drones):
+    """生成载荷汇总JSON，不包含雷达"""
+    return json.dumps({
+        'total_ar1': sum(drone.get('ar1', 0) for drone in drones),
+        'total_pl10': sum(drone.get('pl10', 0) for drone in drones),
+        'total_cannon': sum(drone.get('cannon', 0) for drone in drones),
+        'drones': drones
+    })
+
+
+def serialize_payload_totals(drones):
+    """只生成载荷总量JSON，每架无人机的载荷保存在 scenario_units 表"""
+    return json.dumps({
+        'total_ar1': sum(safe_int(drone.get('ar1', 0)) for drone in drones),
+        'total_pl10': sum(safe_int(drone.get('pl10', 0)) for drone in drones),
+        'total_cannon': sum(safe_int(drone.get('cannon', 0)) for drone in drones)
+    })
+
+
+def sanitize_stored_drone_payload(payload_str):
+    """移除已有场景中的雷达载荷并规范字段"""
+    if not payload_str:
+        cleaned_payload = serialize_drone_payloads([])
+        return [], cleaned_payload, False
+    try:
+        payload_data = json.loads(payload_str)
+    except Exception:
+        cleaned_payload = serialize_drone_payloads([])
+        return [], cleaned_payload, False
+
+    if not isinstance(payload_data, dict):
+        cleaned_payload = serialize_drone_payloads([])
+        return [], cleaned_payload, False
+
+    drones = payload_data.get('drones') or []
+    cleaned_drones = []
+    changed = 'total_radar' in payload_data
+
+    for idx, drone in enumerate(drones):
+        if not isinstance(drone, dict):
+            continue
+        cleaned = normalize_drone_entry(drone, idx + 1)
+        if 'radar' in drone or 'hq9b' in drone:
+            changed = True
+        cleaned_drones.append(cleaned)
+
+    cleaned_payload = serialize_drone_payloads(cleaned_drones)
+    changed = changed or cleaned_payload != (payload_str or '')
+    return cleaned_drones, cleaned_payload, changed
+
+
+def _parse_enemy_position(unit_type, pos, index, default_code):
+    """解析单行敌方位置文本 lat,lng[,alt][,code]"""
+    coords = pos.split(',')
+    if len(coords) < 2:
+        return None
+    if unit_type == 'reconnaissance_drone':
+        # 如果有第4个字段，则认为是编号
+        code = coords[3].strip() if len(coords) > 3 else f'{default_code}-{index + 1}'
+        altitude = int(coords[2]) if len(coords) > 2 else 100
+    elif unit_type == 'attack_helicopter':
+        # 如果有第4个或第3个字段，则认为是编号
+        code = coords[3].strip() if len(coords) > 3 else (coords[2].strip() if len(coords) == 3 and not coords[2].isdigit() else f'{default_code}-{index + 1}')
+        altitude = int(coords[2]) if len(coords) > 3 or (len(coords) == 3 and coords[2].isdigit()) else 100
+    else:
+        # 第3个字段是编号（地面单位没有高度）
+        code = coords[2].strip() if len(coords) > 2 else f'{default_code}-{index + 1}'
+        altitude = 0
+    return {
+        'code': code,
+        'lat': float(coords[0]),
+        'lng': float(coords[1]),
+        'altitude': altitude
+    }
+
+
+def build_scenario_data(scenario):
+    """将旧格式 scenarios 表记录（载荷 JSON + 换行分隔位置文本）解析为前端/仿真使用的结构
+
+    返回 (scenario_data, cleaned_payload_json, payload_changed)，
+    后两项用于调用方决定是否回写清洗后的载荷。仅供迁移旧数据使用。
+    """
+    # 解析我方无人机数据，移除已弃用的雷达载荷
+    our_drones = []
+    payload_json = scenario['our_drone_payloads'] or ''
+    cleaned_payload_json = payload_json
+    payload_changed = False
+
+    if payload_json:
+        try:
+            our_drones, cleaned_payload_json, payload_changed = sanitize_stored_drone_payload(payload_json)
+        except Exception:
+            our_drones = []
+            cleaned_payload_json = serialize_drone_payloads([])
+            payload_changed = payload_json != cleaned_payload_json
+
+    # 如果没有详细数据，使用位置数据
+    if not our_drones and scenario['our_drone_positions']:
+        positions = scenario['our_drone_positions'].split('\n')
+        for i, pos in enumerate(positions):
+            if pos.strip():
+                coords = pos.split(',')
+                if len(coords) >= 2:
+                    our_drones.append({
+                        'id': i + 1,
+                        'code': f'无人机-{i + 1}',
+                        'lat': coords[0],
+                        'lng': coords[1],
+                        'altitude': int(coords[2]) if len(coords) > 2 else 100,
+                        'ar1': 0,
+                        'pl10': 0,
+                        'cannon': 0
+                    })
+        cleaned_payload_json = serialize_drone_payloads(our_drones)
+        payload_changed = True
+
+    # 解析敌方单位数据
+    enemy_units = []
+    for unit_type, count_col, positions_col, id_prefix, default_code in ENEMY_UNIT_COLUMNS:
+        count = scenario[count_col]
+        positions_text = scenario[positions_col]
+        if not count or not positions_text:
+            continue
+        positions = positions_text.split('\n')
+        for i, pos in enumerate(positions[:count]):
+            if not pos.strip():
+                continue
+            parsed = _parse_enemy_position(unit_type, pos, i, default_code)
+            if parsed is None:
+                continue
+            enemy_units.append({
+                'id': f'{id_prefix}_{i + 1}',
+                'type': unit_type,
+                **parsed
+            })
+
+    scenario_data = {
+        'id': scenario['id'],
+        'name': scenario['name'],
+        'description': scenario['description'],
+        'our_drones': our_drones,
+        'enemy_units': enemy_units
+    }
+    return scenario_data, cleaned_payload_json, payload_changed
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def scenario_unit_rows(scenario_id, our_drones, enemy_units):
+    """把我方无人机与敌方单位转换为 scenario_units 表的行，坐标无效的单位被跳过"""
+    rows = []
+    for seq, drone in enumerate(our_drones, start=1):
+        lat, lng = _to_float(drone.get('lat')), _to_float(drone.get('lng'))
+        if lat is None or lng is None:
+            continue
+        rows.append((
+            scenario_id, 'our', 'drone', seq, drone.get('code') or '', lat, lng,
+            safe_int(drone.get('altitude', 100), 100),
+            safe_int(drone.get('ar1', 0)), safe_int(drone.get('pl10', 0)), safe_int(drone.get('cannon', 0))
+        ))
+    for seq, unit in enumerate(enemy_units, start=1):
+        lat, lng = _to_float(unit.get('lat')), _to_float(unit.get('lng'))
+        if unit.get('type') not in ENEMY_UNIT_TYPES or lat is None or lng is None:
+            continue
+        rows.append((
+            scenario_id, 'enemy', unit['type'], seq, (unit.get('code') or '').strip(), lat, lng,
+            safe_int(unit.get('altitude', 0)), 0, 0, 0
+        ))
+    return rows
+
+
+def enemy_type_counts(enemy_units):
+    """按 ENEMY_UNIT_COLUMNS 的数量字段统计敌方单位数"""
+    counts = {count_col: 0 for _, count_col, _, _, _ in ENEMY_UNIT_COLUMNS}
+    for unit in enemy_units:
+        count_col = ENEMY_UNIT_TYPES.get(unit.get('type'), (None,))[0]
+        if count_col:
+            counts[count_col] += 1
+    return counts
+
+
+def replace_scenario_units(conn, scenario_id, our_drones, enemy_units):
+    """整体替换场景的单位行，由调用方提交事务，返回写入行数"""
+    rows = scenario_unit_rows(scenario_id, our_drones, enemy_units)
+    conn.execute('DELETE FROM scenario_units WHERE scenario_id = ?', (scenario_id,))
+    conn.executemany(INSERT_SCENARIO_UNIT_SQL, rows)
+    return len(rows)
+
+
+def load_scenario_units(conn, scenario_id):
+    """一次索引查询读取场景全部单位，返回 (our_drones, enemy_units)"""
+    rows = conn.execute(
+        '''SELECT side, type, code, lat, lng, altitude, ar1, pl10, cannon
+           FROM scenario_units WHERE scenario_id = ? ORDER BY side, seq''',
+        (scenario_id,)
+    ).fetchall()
+    our_drones = []
+    enemy_units = []
+    type_seq = {}
+    for side, unit_type, code, lat, lng, altitude, ar1, pl10, cannon in rows:
+        if side == 'our':
+            drone_id = len(our_drones) + 1
+            our_drones.append({
+                'id': drone_id, 'code': code, 'lat': lat, 'lng': lng, 'altitude': altitude,
+                'ar1': ar1, 'pl10': pl10, 'cannon': cannon
+            })
+            continue
+        _, id_prefix, default_code = ENEMY_UNIT_TYPES.get(unit_type, (None, unit_type, unit_type))
+        n = type_seq[unit_type] = type_seq.get(unit_type, 0) + 1
+        enemy_units.append({
+            'id': f'{id_prefix}_{n}',
+            'type': unit_type,
+            'code': code or f'{default_code}-{n}',
+            'lat': lat,
+            'lng': lng,
+            'altitude': altitude
+        })
+    return our_drones, enemy_units
+
+
+def load_scenario(conn, scenario_id):
+    """按 id 读取有效场景及其单位，不存在时返回 None"""
+    scenario = conn.execute(
+        'SELECT id, name, description FROM scenarios WHERE id = ? AND status = "active"', (scenario_id,)
+    ).fetchone()
+    if not scenario:
+        return None
+    our_drones, enemy_units = load_scenario_units(conn, scenario_id)
+    return {
+        'id': scenario['id'],
+        'name': scenario['name'],
+        'description': scenario['description'],
+        'our_drones': our_drones,
+        'enemy_units': enemy_units
+    }
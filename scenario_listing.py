@@ -0,0 +1,114 @@
+# scenario_listing.py
+"""场景列表的游标分页与筛选
+
+列表按 (created_at, id) 倒序排列，下一页从上一页最后一条记录之后继续（keyset 分页），
+配合 (status, created_at, id) 等复合索引，每页只读取页大小 + 1 行，
+耗时与场景总数无关。游标是最后一条记录 (created_at, id) 的编码，对客户端不透明。
+敌方单位总数保存在 scenarios.enemy_total 列中，创建/编辑场景时写入，可直接参与筛选。
+"""
+import base64
+import json
+
+from scenario_data import ENEMY_UNIT_COLUMNS, safe_int
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# 数量区间筛选：参数名 -> SQL 条件
+RANGE_FILTERS = {
+    'min_drones': 'our_drone_count >= ?',
+    'max_drones': 'our_drone_count <= ?',
+    'min_enemies': 'enemy_total >= ?',
+    'max_enemies': 'enemy_total <= ?',
+}
+TEXT_FILTERS = ('created_by', 'name')
+# 前缀匹配的上界：U+10FFFF 是 UTF-8 编码下最大的字符
+_PREFIX_UPPER = '\U0010ffff'
+
+
+class ListingError(ValueError):
+    """分页或筛选参数无效"""
+
+
+def enemy_total_sql():
+    """由各类敌方数量列计算总数的 SQL 表达式，供迁移回填使用"""
+    return ' + '.join(f'COALESCE({count_col}, 0)' for _, count_col, _, _, _ in ENEMY_UNIT_COLUMNS)
+
+
+def create_listing_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scenarios_status_created ON scenarios(status, created_at, id)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_scenarios_status_creator ON scenarios(status, created_by, created_at, id)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scenarios_status_name ON scenarios(status, name)')
+
+
+def encode_cursor(created_at, scenario_id):
+    raw = json.dumps([created_at, scenario_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, scenario_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ListingError('无效的分页游标')
+    if not isinstance(created_at, str) or not isinstance(scenario_id, int):
+        raise ListingError('无效的分页游标')
+    return created_at, scenario_id
+
+
+def parse_filters(args):
+    """从请求参数提取筛选条件，未填写的条件省略"""
+    filters = {}
+    for name in TEXT_FILTERS:
+        value = (args.get(name) or '').strip()
+        if value:
+            filters[name] = value
+    for name in RANGE_FILTERS:
+        value = (args.get(name) or '').strip()
+        if not value:
+            continue
+        number = safe_int(value, None)
+        if number is None or number < 0:
+            raise ListingError(f'{name} 必须是非负整数')
+        filters[name] = number
+    return filters
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    return min(max(safe_int(value, default), 1), MAX_PAGE_SIZE)
+
+
+def list_scenarios(conn, columns, filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """返回 (当前页的行, 下一页游标)；没有下一页时游标为 None
+
+    columns 为 SELECT 的列表达式，需包含 id 与原始的 created_at。
+    """
+    filters = filters or {}
+    clauses = ["status = 'active'"]
+    params = []
+    if 'created_by' in filters:
+        clauses.append('created_by = ?')
+        params.append(filters['created_by'])
+    if 'name' in filters:
+        clauses.append('name >= ? AND name < ?')
+        params.extend([filters['name'], filters['name'] + _PREFIX_UPPER])
+    for name, condition in RANGE_FILTERS.items():
+        if name in filters:
+            clauses.append(condition)
+            params.append(filters[name])
+    if cursor:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(decode_cursor(cursor))
+    rows = conn.execute(
+        f'''SELECT {columns} FROM scenarios
+           WHERE {' AND '.join(clauses)}
+           ORDER BY created_at DESC, id DESC
+           LIMIT ?''',
+        params + [limit + 1]
+    ).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last['created_at'], last['id'])
@@ -0,0 +1,114 @@
+# serve.py
+"""生产环境启动脚本：预加载应用后 fork 多个工作进程
+
+主进程执行一次数据库迁移与缓存预热后冻结 GC（gc.freeze），工作进程以写时复制方式共享
+预热好的模型快照、场景响应与静态资源压缩结果；每个工作进程启动自己的训练调度线程，
+日志写线程与数据库连接池在首次使用时按进程重新创建。
+工作进程使用 gthread 模式，SSE 推流等长连接各占一个线程。
+未安装 gunicorn（如 Windows）时退回 Werkzeug 单进程多线程服务器。
+
+服务端推流仿真（/api/live_runs）的状态保存在进程内，SSE 订阅与控制请求可能落到其他
+工作进程，因此只在单工作进程时启用：--live-streaming auto（默认）在多工作进程时关闭
+推流并给出提示，on 与多工作进程同时指定时拒绝启动。
+
+用法：python serve.py [--bind 0.0.0.0:8888] [--workers N] [--threads N] [--live-streaming auto|on|off]
+环境变量 WEB_BIND、WEB_WORKERS、WEB_THREADS、WEB_TIMEOUT、WEB_LIVE_STREAMING 提供对应的默认值。
+"""
+import argparse
+import gc
+import os
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn 不支持 Windows
+    BaseApplication = None
+
+DEFAULT_BIND = '0.0.0.0:8888'
+DEFAULT_THREADS = 8
+# 工作进程无响应多久后被重启（秒）；SSE 长连接由线程处理，不受影响
+DEFAULT_TIMEOUT_S = 120
+GRACEFUL_TIMEOUT_S = 30
+LIVE_STREAMING_MODES = ('auto', 'on', 'off')
+
+
+def default_workers():
+    return max(2, min((os.cpu_count() or 1) * 2 + 1, 8))
+
+
+def _when_ready(server):
+    # 预热完成后的对象移入永久代，工作进程的 GC 不再触碰这些页面，避免写时复制失效
+    gc.freeze()
+
+
+def _post_fork(server, worker):
+    import app
+    app.start_background_services()
+
+
+def _worker_exit(server, worker):
+    import app
+    app.shutdown_background_services()
+
+
+if BaseApplication is not None:
+    class ProductionServer(BaseApplication):
+        """以代码方式配置的 gunicorn 应用"""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多进程方式启动 Web 服务')
+    parser.add_argument('--bind', default=os.environ.get('WEB_BIND', DEFAULT_BIND))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS') or default_workers()))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS') or DEFAULT_THREADS))
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('WEB_TIMEOUT') or DEFAULT_TIMEOUT_S))
+    parser.add_argument('--live-streaming', choices=LIVE_STREAMING_MODES,
+                        default=os.environ.get('WEB_LIVE_STREAMING') or 'auto')
+    args = parser.parse_args(argv)
+
+    workers = 1 if BaseApplication is None else args.workers
+    if args.live_streaming == 'on' and workers > 1:
+        parser.error('服务端推流仿真的状态保存在进程内，--live-streaming on 只能与 --workers 1 同时使用')
+    live_streaming = args.live_streaming == 'on' or (args.live_streaming == 'auto' and workers == 1)
+    if args.live_streaming == 'auto' and not live_streaming:
+        print(f'{workers} 个工作进程不共享推流状态，已关闭服务端推流仿真；需要时以 --workers 1 启动')
+
+    import app
+    application = app.create_app({'LIVE_STREAMING': live_streaming}, start_services=False)
+
+    if BaseApplication is None:
+        print('未安装 gunicorn，使用 Werkzeug 单进程多线程服务器（pip install gunicorn）')
+        host, _, port = args.bind.rpartition(':')
+        app.start_background_services()
+        application.run(host=host or '0.0.0.0', port=int(port), threaded=True)
+        return 0
+
+    ProductionServer(application, {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': GRACEFUL_TIMEOUT_S,
+        'preload_app': True,
+        'when_ready': _when_ready,
+        'post_fork': _post_fork,
+        'worker_exit': _worker_exit,
+    }).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,494 @@
+# simulation_engine.py
+"""服务端无界面仿真引擎
+
+与 templates/simulation.html 中的浏览器仿真循环保持同一套规则（目标选择权重、
+武器射程/命中率/毁伤率、射击冷却、单位速度），但全部单位的位置、载荷与冷却
+都保存在 NumPy 数组中，每一拍对所有单位做一次向量化更新，不受墙钟时间限制。
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from spatial_index import UniformGrid, haversine_km, KM_PER_DEG
+from event_recorder import (
+    KIND_MOVE, KIND_ASSIGN, KIND_SHOT, KIND_KILL, SIDE_OUR, SIDE_ENEMY, FLAG_HIT, FLAG_DESTROYED
+)
+
+CONFIG_DIR = os.path.join('static', 'config')
+WEAPON_CONFIG_PATH = os.path.join(CONFIG_DIR, 'weapon_config.json')
+ENEMY_CONFIG_PATH = os.path.join(CONFIG_DIR, 'enemy_unit_config.json')
+
+# 与前端保持一致的仿真参数
+WEAPON_CODES = ('ar1', 'pl10', 'cannon')
+AIR_TARGET_TYPES = ('reconnaissance_drone', 'attack_helicopter')
+UNIT_SPEEDS = {
+    'our_drone': 150,
+    'reconnaissance_drone': 120,
+    'attack_helicopter': 200,
+    'tank': 50,
+    'armored_vehicle': 80,
+    'military_base': 0
+}
+TARGET_SELECTION_WEIGHTS = {
+    'value': 0.5,
+    'distance': 0.35,
+    'load': 0.15
+}
+FIRE_COOLDOWN_S = 3.0
+ARRIVAL_DISTANCE_KM = 0.01
+# 无人机停在可用武器最小射程之外的距离余量，到位后保持跟踪并等待冷却
+STANDOFF_MARGIN_KM = 0.02
+# 连续这么长的仿真时间没有射击、也没有无人机比之前更接近其目标时判定为僵持并结束
+STALL_TIMEOUT_S = 1800.0
+# 批量选择目标时每块 无人机 × 目标 距离矩阵的元素上限
+PICK_CHUNK_ELEMENTS = 1 << 20
+DRONE_WANDER_DEG = 0.2
+ENEMY_INITIAL_WANDER_DEG = 0.15
+ENEMY_WANDER_DEG = 0.2
+DEFAULT_ENEMY_VALUE = 50
+DEFAULT_HIT_PROBABILITY = 0.5
+DEFAULT_LETHALITY = 0.8
+# 敌方单位达到该数量时维护网格索引；一批选择的“无人机数 × 存活目标数”达到阈值时才走索引，
+# 少量无人机时直接计算全部距离更快
+SPATIAL_INDEX_MIN_UNITS = 1000
+SPATIAL_INDEX_MIN_PAIRS = 50000
+
+DEFAULT_TIME_STEP_S = 1.0
+DEFAULT_MAX_TIME_S = 6 * 3600.0
+
+_config_cache = {}
+
+
+def _load_json_cached(path):
+    """按文件修改时间缓存 JSON 配置，避免每次仿真重复解析"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _config_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    _config_cache[path] = (mtime, data)
+    return data
+
+
+def load_weapon_config(path=WEAPON_CONFIG_PATH):
+    """读取武器配置，返回 {code: config}"""
+    data = _load_json_cached(path)
+    weapons = data.get('weapons', []) if isinstance(data, dict) else []
+    return {w['code']: w for w in weapons if isinstance(w, dict) and w.get('code')}
+
+
+def load_enemy_config(path=ENEMY_CONFIG_PATH):
+    """读取敌方单位配置，返回 {type: config}"""
+    data = _load_json_cached(path)
+    units = data.get('units', []) if isinstance(data, dict) else []
+    return {u['type']: u for u in units if isinstance(u, dict) and u.get('type')}
+
+
+def load_engagement_policy(path=WEAPON_CONFIG_PATH):
+    """读取武器配置中的默认交战规则（并发目标数、单目标齐射数等）"""
+    data = _load_json_cached(path)
+    defaults = data.get('defaults', {}) if isinstance(data, dict) else {}
+    policy = defaults.get('engagement_policy') if isinstance(defaults, dict) else None
+    return policy if isinstance(policy, dict) else {}
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class BattleSimulator:
+    """基于数组的批量仿真器，一次 step 推进所有单位"""
+
+    def __init__(self, scenario_data, weapon_config=None, enemy_config=None,
+                 seed=None, time_step_s=DEFAULT_TIME_STEP_S, recorder=None):
+        self.rng = np.random.default_rng(seed)
+        # 可选的 event_recorder.EventRecorder，记录移动、分配、射击与击毁事件
+        self.recorder = recorder
+        self._next_move_record = 0.0
+        self.time_step_s = float(time_step_s)
+        self.time_s = 0.0
+        self.ticks = 0
+        self._stall_ticks = max(int(np.ceil(STALL_TIMEOUT_S / self.time_step_s)), 1)
+        self._last_progress_tick = 0
+        weapon_config = load_weapon_config() if weapon_config is None else weapon_config
+        enemy_config = load_enemy_config() if enemy_config is None else enemy_config
+
+        # 我方无人机
+        drones = scenario_data.get('our_drones') or []
+        self.drone_codes = [d.get('code') or '未编号' for d in drones]
+        self.drone_pos = np.array(
+            [[_to_float(d.get('lat')), _to_float(d.get('lng'))] for d in drones], dtype=np.float64
+        ).reshape(-1, 2)
+        self.payload = np.array(
+            [[max(_to_int(d.get(code, 0)), 0) for code in WEAPON_CODES] for d in drones], dtype=np.int64
+        ).reshape(-1, len(WEAPON_CODES))
+        n_drones = len(drones)
+        self.drone_speed = float(UNIT_SPEEDS['our_drone'])
+        self.last_fire = np.full(n_drones, -np.inf)
+        self.drone_target = np.full(n_drones, -1, dtype=np.int64)
+        self.drone_waypoint = self.drone_pos.copy()
+        # 各无人机分配当前目标以来与目标的最近距离，用于判断是否仍在接近
+        self.drone_closest = np.full(n_drones, np.inf)
+
+        # 敌方单位
+        enemies = scenario_data.get('enemy_units') or []
+        self.enemy_types = [e.get('type') or 'reconnaissance_drone' for e in enemies]
+        self.enemy_codes = [e.get('code') or '' for e in enemies]
+        self.enemy_pos = np.array(
+            [[_to_float(e.get('lat')), _to_float(e.get('lng'))] for e in enemies], dtype=np.float64
+        ).reshape(-1, 2)
+        n_enemies = len(enemies)
+        max_value = max([1] + [cfg.get('value') or DEFAULT_ENEMY_VALUE for cfg in enemy_config.values()])
+        if not enemy_config:
+            max_value = 120
+        self.enemy_value = np.array([
+            (enemy_config.get(t) or {}).get('value') or e.get('value') or DEFAULT_ENEMY_VALUE
+            for t, e in zip(self.enemy_types, enemies)
+        ], dtype=np.float64) / max_value
+        self.enemy_speed = np.array([UNIT_SPEEDS.get(t, 100) for t in self.enemy_types], dtype=np.float64)
+        self.enemy_is_air = np.array([t in AIR_TARGET_TYPES for t in self.enemy_types], dtype=bool)
+        self.enemy_mobile = np.array([t != 'military_base' for t in self.enemy_types], dtype=bool)
+        self.enemy_alive = np.ones(n_enemies, dtype=bool)
+        self.enemy_load = np.zeros(n_enemies, dtype=np.int64)
+        self.enemy_waypoint = self.enemy_pos.copy()
+        mobile = np.flatnonzero(self.enemy_mobile)
+        self.enemy_waypoint[mobile] = self._random_waypoints(self.enemy_pos[mobile], ENEMY_INITIAL_WANDER_DEG)
+        # 敌方单位较多时建立网格索引，移动与击毁时增量更新
+        self.enemy_grid = None
+        if n_enemies >= SPATIAL_INDEX_MIN_UNITS:
+            self.enemy_grid = UniformGrid(self.enemy_pos[:, 0], self.enemy_pos[:, 1])
+
+        # 武器参数向量，顺序与 WEAPON_CODES 一致；缺少配置的武器视为不可用
+        configs = [weapon_config.get(code) or {} for code in WEAPON_CODES]
+        self.weapon_hit = np.array([cfg.get('hit_probability') or DEFAULT_HIT_PROBABILITY for cfg in configs])
+        self.weapon_lethality = np.array([cfg.get('single_shot_lethality') or DEFAULT_LETHALITY for cfg in configs])
+        self.weapon_min_range = np.array([cfg.get('min_range_km') or 0 for cfg in configs], dtype=np.float64)
+        self.weapon_max_range = np.array([cfg.get('max_range_km') or 0 for cfg in configs], dtype=np.float64)
+        # 空地导弹仅攻击地面目标，空空导弹仅攻击空中目标，机炮都可以攻击
+        self.weapon_vs_air = np.array([code != 'ar1' for code in WEAPON_CODES])
+        self.weapon_vs_ground = np.array([code != 'pl10' for code in WEAPON_CODES])
+
+        # 战果统计
+        self.shots = np.zeros(len(WEAPON_CODES), dtype=np.int64)
+        self.hits = 0
+        self.kills = 0
+        self.kills_by_type = {}
+        self.finished = n_enemies == 0
+        self.reason = '敌方全部被击毁' if self.finished else ''
+
+        self._record_positions()
+        self._assign_targets(np.arange(n_drones))
+
+    # ---- 目标选择 ----
+    def _random_waypoints(self, positions, max_distance):
+        """在当前位置附近生成随机航迹点（度）"""
+        count = len(positions)
+        angle = self.rng.random(count) * 2 * np.pi
+        distance = self.rng.random(count) * max_distance
+        return positions + np.column_stack((distance * np.cos(angle), distance * np.sin(angle)))
+
+    def _target_bias(self, ids):
+        """评分中与距离无关的部分：价值项 + 负载项"""
+        return (TARGET_SELECTION_WEIGHTS['value'] * self.enemy_value[ids] +
+                TARGET_SELECTION_WEIGHTS['load'] / (1 + self.enemy_load[ids]))
+
+    def _engageable(self, drones):
+        """各无人机剩余载荷能否攻击 (地面, 空中) 目标，形状 (k, 2)"""
+        stock = (self.payload[drones] > 0) & (self.weapon_max_range > 0)[None, :]
+        return np.column_stack(((stock & self.weapon_vs_ground).any(axis=1), (stock & self.weapon_vs_air).any(axis=1)))
+
+    def pick_targets(self, drones):
+        """为一组无人机按价值、距离与分配负载综合评分选择目标，只考虑剩余载荷能攻击的目标
+
+        同一批无人机按批次开始时的负载评分，一次向量化计算：敌方单位较多时由网格索引只展开
+        可能胜出的网格，批次较小时按块计算全部距离；没有可攻击的存活目标时为 -1。
+        """
+        drones = np.asarray(drones, dtype=np.int64).reshape(-1)
+        picked = np.full(drones.size, -1, dtype=np.int64)
+        alive = np.flatnonzero(self.enemy_alive)
+        if drones.size == 0 or alive.size == 0:
+            return picked
+        engageable = self._engageable(drones)
+        if self.enemy_grid is not None and drones.size * alive.size >= SPATIAL_INDEX_MIN_PAIRS:
+            return self.enemy_grid.best(
+                self.drone_pos[drones, 0], self.drone_pos[drones, 1],
+                self._target_bias(slice(None)), TARGET_SELECTION_WEIGHTS['distance'],
+                self.enemy_is_air.astype(np.int64), engageable
+            )
+        bias = self._target_bias(alive)
+        alive_air = self.enemy_is_air[alive]
+        rows = max(PICK_CHUNK_ELEMENTS // alive.size, 1)
+        for start in range(0, drones.size, rows):
+            chunk = drones[start:start + rows]
+            distance = haversine_km(self.drone_pos[chunk, 0][:, None], self.drone_pos[chunk, 1][:, None],
+                                    self.enemy_pos[alive, 0][None, :], self.enemy_pos[alive, 1][None, :])
+            allowed = np.where(alive_air[None, :], engageable[start:start + rows, 1:2], engageable[start:start + rows, 0:1])
+            score = np.where(allowed, bias[None, :] + TARGET_SELECTION_WEIGHTS['distance'] / (1 + distance), -np.inf)
+            best = np.argmax(score, axis=1)
+            picked[start:start + rows] = np.where(allowed.any(axis=1), alive[best], -1)
+        return picked
+
+    def pick_target(self, drone_index):
+        """单架无人机的目标选择，无可攻击的存活目标时返回 -1"""
+        return int(self.pick_targets([drone_index])[0])
+
+    def _assign_targets(self, drones):
+        """为一组无人机重新选择目标；没有目标的无人机在附近随机巡航"""
+        drones = np.asarray(drones, dtype=np.int64).reshape(-1)
+        if drones.size == 0:
+            return
+        targets = self.pick_targets(drones)
+        self.drone_target[drones] = targets
+        if self.recorder is not None:
+            self.recorder.record_many(self.time_s, KIND_ASSIGN, SIDE_OUR, drones, targets)
+        self.drone_closest[drones] = np.inf
+        has_target = targets >= 0
+        np.add.at(self.enemy_load, targets[has_target], 1)
+        self.drone_waypoint[drones[has_target]] = self.enemy_pos[targets[has_target]]
+        idle = drones[~has_target]
+        if idle.size:
+            self.drone_waypoint[idle] = self._random_waypoints(self.drone_pos[idle], DRONE_WANDER_DEG)
+
+    def _release_targets(self, drones):
+        targets = self.drone_target[drones]
+        targets = targets[targets >= 0]
+        np.subtract.at(self.enemy_load, targets, 1)
+        np.maximum(self.enemy_load, 0, out=self.enemy_load)
+
+    def _standoff_km(self, drones, targets):
+        """各无人机对目标的保持距离：可用武器中最小射程最小者的射程内侧，没有可用武器时为 inf"""
+        usable = (
+            (self.payload[drones] > 0) &
+            np.where(self.enemy_is_air[targets][:, None], self.weapon_vs_air[None, :], self.weapon_vs_ground[None, :]) &
+            (self.weapon_max_range > 0)[None, :]
+        )
+        hold = np.minimum(self.weapon_min_range + STANDOFF_MARGIN_KM, (self.weapon_min_range + self.weapon_max_range) / 2)
+        return np.where(usable, hold[None, :], np.inf).min(axis=1)
+
+    # ---- 运动 ----
+    def _advance(self, positions, waypoints, speed_kmh, dt):
+        """向航迹点移动，返回已到达航迹点的掩码"""
+        distance = haversine_km(positions[:, 0], positions[:, 1], waypoints[:, 0], waypoints[:, 1])
+        arrived = distance < ARRIVAL_DISTANCE_KM
+        move_km = speed_kmh * dt / 3600.0
+        ratio = np.where(arrived, 0.0, np.minimum(move_km / np.maximum(distance, 1e-12), 1.0))
+        positions += (waypoints - positions) * ratio[:, None]
+        return arrived
+
+    def _move_units(self, dt):
+        if len(self.enemy_pos):
+            mobile = np.flatnonzero(self.enemy_mobile & self.enemy_alive)
+            if mobile.size:
+                pos = self.enemy_pos[mobile]
+                arrived = self._advance(pos, self.enemy_waypoint[mobile], self.enemy_speed[mobile], dt)
+                self.enemy_pos[mobile] = pos
+                if self.enemy_grid is not None:
+                    self.enemy_grid.update(mobile, pos[:, 0], pos[:, 1])
+                if arrived.any():
+                    done = mobile[arrived]
+                    self.enemy_waypoint[done] = self._random_waypoints(self.enemy_pos[done], ENEMY_WANDER_DEG)
+
+        if len(self.drone_pos):
+            # 我方无人机始终追踪目标的实时位置，停在可用武器最小射程之外的保持点上
+            tracking = np.flatnonzero(self.drone_target >= 0)
+            targets = self.drone_target[tracking]
+            hold = self._standoff_km(tracking, targets)
+            # 剩余载荷已无法攻击当前目标的无人机改选其他目标
+            lost = np.isinf(hold)
+            if lost.any():
+                self._release_targets(tracking[lost])
+                self._assign_targets(tracking[lost])
+                tracking, targets, hold = tracking[~lost], targets[~lost], hold[~lost]
+            target_pos = self.enemy_pos[targets]
+            offset = self.drone_pos[tracking] - target_pos
+            distance = haversine_km(target_pos[:, 0], target_pos[:, 1],
+                                    self.drone_pos[tracking, 0], self.drone_pos[tracking, 1])
+            # 与目标重合时沿正北方向退到保持点
+            offset[distance <= 0] = (1.0, 0.0)
+            distance = np.where(distance <= 0, KM_PER_DEG, distance)
+            self.drone_waypoint[tracking] = target_pos + offset * (hold / distance)[:, None]
+            arrived = self._advance(self.drone_pos, self.drone_waypoint, self.drone_speed, dt)
+            distance = haversine_km(target_pos[:, 0], target_pos[:, 1],
+                                    self.drone_pos[tracking, 0], self.drone_pos[tracking, 1])
+            closer = distance < self.drone_closest[tracking] - ARRIVAL_DISTANCE_KM
+            if closer.any():
+                self._last_progress_tick = self.ticks
+                self.drone_closest[tracking[closer]] = distance[closer]
+            # 到达保持点的无人机留在原地等待开火，只有巡航中的无人机到达航迹点后重新选择目标
+            wandering = np.flatnonzero(arrived & (self.drone_target < 0))
+            self._assign_targets(wandering)
+
+    # ---- 交战 ----
+    def _engage(self):
+        target = self.drone_target
+        ready = (target >= 0) & (self.time_s - self.last_fire >= FIRE_COOLDOWN_S)
+        shooters = np.flatnonzero(ready)
+        if shooters.size == 0:
+            return
+        targets = target[shooters]
+        distance = haversine_km(self.drone_pos[shooters, 0], self.drone_pos[shooters, 1],
+                                self.enemy_pos[targets, 0], self.enemy_pos[targets, 1])
+        is_air = self.enemy_is_air[targets]
+        usable = (
+            (self.payload[shooters] > 0) &
+            np.where(is_air[:, None], self.weapon_vs_air[None, :], self.weapon_vs_ground[None, :]) &
+            (self.weapon_max_range[None, :] > 0) &
+            (distance[:, None] >= self.weapon_min_range[None, :]) &
+            (distance[:, None] <= self.weapon_max_range[None, :])
+        )
+        # 选择命中率最高的可用武器
+        score = np.where(usable, self.weapon_hit[None, :], -np.inf)
+        weapon = np.argmax(score, axis=1)
+        can_fire = usable.any(axis=1)
+        shooters, targets, weapon = shooters[can_fire], targets[can_fire], weapon[can_fire]
+        if shooters.size == 0:
+            return
+
+        rolls = self.rng.random((shooters.size, 2))
+        hit = rolls[:, 0] <= self.weapon_hit[weapon]
+        destroyed = hit & (rolls[:, 1] <= self.weapon_lethality[weapon])
+
+        # 同一拍内目标被先射击的无人机击毁后，后续无人机不再对其开火
+        first_kill = np.full(len(self.enemy_pos), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_kill, targets[destroyed], shooters[destroyed])
+        valid = shooters <= first_kill[targets]
+        shooters, targets, weapon = shooters[valid], targets[valid], weapon[valid]
+        hit, destroyed = hit[valid], destroyed[valid]
+
+        if self.recorder is not None:
+            flags = hit * FLAG_HIT + destroyed * FLAG_DESTROYED
+            self.recorder.record_many(self.time_s, KIND_SHOT, SIDE_OUR, shooters, targets, weapon, flags)
+
+        np.subtract.at(self.payload, (shooters, weapon), 1)
+        self.shots += np.bincount(weapon, minlength=len(WEAPON_CODES))
+        self._last_progress_tick = self.ticks
+        self.last_fire[shooters] = self.time_s
+        self.hits += int(hit.sum())
+
+        killed = np.unique(targets[destroyed])
+        if killed.size:
+            self.enemy_alive[killed] = False
+            if self.enemy_grid is not None:
+                self.enemy_grid.remove(killed)
+            self.enemy_load[killed] = 0
+            self.kills += int(killed.size)
+            if self.recorder is not None:
+                self.recorder.record_many(self.time_s, KIND_KILL, SIDE_ENEMY, killed, first_kill[killed])
+            for idx in killed:
+                unit_type = self.enemy_types[idx]
+                self.kills_by_type[unit_type] = self.kills_by_type.get(unit_type, 0) + 1
+            # 所有针对被毁目标的无人机重新分配
+            orphaned = np.flatnonzero(np.isin(self.drone_target, killed))
+            self.drone_target[orphaned] = -1
+            self._assign_targets(orphaned)
+
+    def _record_positions(self):
+        """按记录间隔保存我方与存活敌方单位的位置"""
+        if self.recorder is None or self.time_s < self._next_move_record:
+            return
+        self._next_move_record = self.time_s + self.recorder.move_interval_s
+        if len(self.drone_pos):
+            self.recorder.record_many(self.time_s, KIND_MOVE, SIDE_OUR, np.arange(len(self.drone_pos)),
+                                      lat=self.drone_pos[:, 0], lng=self.drone_pos[:, 1])
+        alive = np.flatnonzero(self.enemy_alive)
+        if alive.size:
+            self.recorder.record_many(self.time_s, KIND_MOVE, SIDE_ENEMY, alive,
+                                      lat=self.enemy_pos[alive, 0], lng=self.enemy_pos[alive, 1])
+
+    def _can_continue(self):
+        """判断剩余载荷是否还能对存活目标造成威胁"""
+        stock = self.payload.sum(axis=0) > 0
+        air_left = bool((self.enemy_alive & self.enemy_is_air).any())
+        ground_left = bool((self.enemy_alive & ~self.enemy_is_air).any())
+        return (air_left and bool((stock & self.weapon_vs_air).any())) or \
+               (ground_left and bool((stock & self.weapon_vs_ground).any()))
+
+    def step(self):
+        """推进一拍：移动全部单位，然后统一结算射击"""
+        if self.finished:
+            return
+        dt = self.time_step_s
+        self.time_s += dt
+        self.ticks += 1
+        self._move_units(dt)
+        self._record_positions()
+        self._engage()
+        if not self.enemy_alive.any():
+            self.finished = True
+            self.reason = '敌方全部被击毁'
+        elif len(self.drone_pos) == 0:
+            self.finished = True
+            self.reason = '我方全部被击毁'
+        elif not self._can_continue():
+            self.finished = True
+            self.reason = '我方弹药耗尽'
+        elif self.ticks - self._last_progress_tick >= self._stall_ticks:
+            self.finished = True
+            self.reason = '长时间无射击且未接近目标，判定为僵持'
+
+    def run(self, max_time_s=DEFAULT_MAX_TIME_S):
+        """运行至结束或达到最大仿真时长，返回战果汇总"""
+        started = time.perf_counter()
+        while not self.finished and self.time_s < max_time_s:
+            self.step()
+        if not self.finished:
+            self.finished = True
+            self.reason = '达到最大仿真时长'
+        wall_time_s = time.perf_counter() - started
+        return self.summary(wall_time_s)
+
+    def summary(self, wall_time_s=0.0):
+        shots = self.shots.tolist()
+        cleared = not self.enemy_alive.any()
+        return {
+            'reason': self.reason,
+            'sim_time_s': round(self.time_s, 3),
+            'time_to_clear_s': round(self.time_s, 3) if cleared else None,
+            'ticks': self.ticks,
+            'shots': int(self.shots.sum()),
+            'hits': self.hits,
+            'kills': self.kills,
+            'initial_enemy_count': int(len(self.enemy_pos)),
+            'initial_drone_count': int(len(self.drone_pos)),
+            'enemy_remaining': int(self.enemy_alive.sum()),
+            'our_remaining': int(len(self.drone_pos)),
+            'ammo_usage': {code: shots[i] for i, code in enumerate(WEAPON_CODES) if shots[i]},
+            'remaining_payload': dict(zip(WEAPON_CODES, self.payload.sum(axis=0).tolist())),
+            'kills_by_type': dict(self.kills_by_type),
+            'wall_time_ms': round(wall_time_s * 1000, 3),
+            'speedup': round(self.time_s / wall_time_s, 1) if wall_time_s > 0 else None
+        }
+
+
+def run_simulation(scenario_data, seed=None, max_time_s=DEFAULT_MAX_TIME_S,
+                   time_step_s=DEFAULT_TIME_STEP_S, weapon_config=None, enemy_config=None,
+                   recorder=None):
+    """对单个场景运行一次无界面仿真并返回战果汇总"""
+    simulator = BattleSimulator(
+        scenario_data,
+        weapon_config=weapon_config,
+        enemy_config=enemy_config,
+        seed=seed,
+        time_step_s=time_step_s,
+        recorder=recorder
+    )
+    return simulator.run(max_time_s=max_time_s)
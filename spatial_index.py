@@ -0,0 +1,270 @@
+# spatial_index.py
+"""均匀网格空间索引
+
+经纬度按等距圆柱投影划分为固定边长的网格；单位移动时只有跨网格的单位需要重新登记，
+被击毁的单位直接移除，网格成员按网格排序后以 CSR（起始位置 + 个数）形式保存，
+在下一次查询前统一重建。每个网格记录其成员的实际经纬度范围，用来估计查询点到网格内
+任意单位的距离下界。
+
+所有查询都以一批查询点为单位向量化完成，不逐个查询点循环：
+- query_radius：射程内的单位
+- nearest：k 近邻
+- best：按“价值项 + 距离项”评分求各查询点的最优单位。先精确计算每个查询点上界最高的
+  几个网格，得到当前最优分；再只展开上界不低于该分数的网格。结果与逐个计算全部单位一致，
+  分数相同时取下标最小者。
+
+候选单位的实际距离统一使用球面大圆距离，投影只用于划分网格与估计下界。
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180.0
+# 投影距离换算为实际距离下界时的保守系数，覆盖数度范围内的投影误差
+BOUND_SLACK = 0.95
+# 经线间距按查询点与单位中最高纬度再加该余量（度）计算，使投影距离不大于实际距离
+LAT_MARGIN_DEG = 1.0
+MIN_CELL_KM = 0.5
+# 默认网格边长使每格平均约有这么多单位
+UNITS_PER_CELL = 16
+# best/nearest 第一轮精确计算的网格数
+SEED_CELLS = 4
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """向量化计算两组经纬度之间的球面距离（公里）"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    d_lat = lat2 - lat1
+    d_lng = np.radians(lng2) - np.radians(lng1)
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(np.maximum(1 - a, 0)))
+
+
+def _first_per_group(groups):
+    """groups 已排序，返回每组第一个元素的位置"""
+    if groups.size == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+
+
+def _rank_in_group(groups):
+    """groups 已排序，返回各元素在组内的序号"""
+    first = _first_per_group(groups)
+    return np.arange(groups.size) - np.repeat(first, np.diff(np.append(first, groups.size)))
+
+
+class UniformGrid:
+    """单位下标 -> 网格的映射，支持增量更新与批量查询"""
+
+    def __init__(self, lat, lng, cell_km=None):
+        self.lat = np.array(lat, dtype=np.float64).reshape(-1)
+        self.lng = np.array(lng, dtype=np.float64).reshape(-1)
+        n = self.lat.size
+        self.active = np.ones(n, dtype=bool)
+        # 划分网格用的投影固定不变，只影响单位落在哪个网格，不影响距离下界
+        lat_ref = min(float(np.abs(self.lat).max()) + LAT_MARGIN_DEG, 89.0) if n else 0.0
+        self._kx = KM_PER_DEG * math.cos(math.radians(lat_ref))
+        x, y = self.lng * self._kx, self.lat * KM_PER_DEG
+        self._x0 = float(x.min()) if n else 0.0
+        self._y0 = float(y.min()) if n else 0.0
+        width = float(x.max()) - self._x0 if n else 0.0
+        height = float(y.max()) - self._y0 if n else 0.0
+        if cell_km is None:
+            cell_km = math.sqrt(max(width * height, 1.0) * UNITS_PER_CELL / max(n, 1))
+        self.cell_km = max(float(cell_km), MIN_CELL_KM)
+        self._nx = int(width // self.cell_km) + 1
+        self._ny = int(height // self.cell_km) + 1
+        self.cell_of = self._cells(self.lat, self.lng)
+        self._moved = np.zeros(n, dtype=bool)
+        self._any_moved = False
+        self._order_dirty = True
+        self._bounds_dirty = True
+
+    def _cells(self, lat, lng):
+        """网格编号；移出初始范围的单位归入边缘网格，下界按网格成员的实际范围计算，不受影响"""
+        cx = np.clip(((lng * self._kx - self._x0) // self.cell_km).astype(np.int64), 0, self._nx - 1)
+        cy = np.clip(((lat * KM_PER_DEG - self._y0) // self.cell_km).astype(np.int64), 0, self._ny - 1)
+        return cy * self._nx + cx
+
+    @property
+    def count(self):
+        return int(self.active.sum())
+
+    def update(self, ids, lat, lng):
+        """单位移动后调用，只记录新位置；下一次查询前重新计算网格，只有跨网格的单位会重新登记"""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if ids.size == 0:
+            return
+        self.lat[ids] = lat
+        self.lng[ids] = lng
+        self._moved[ids] = True
+        self._any_moved = True
+        self._bounds_dirty = True
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if ids.size and self.active[ids].any():
+            self.active[ids] = False
+            self._order_dirty = True
+
+    def _refresh(self):
+        """按需重新登记跨网格的单位，重建 CSR 与各网格成员的经纬度范围"""
+        if self._any_moved:
+            ids = np.flatnonzero(self._moved & self.active)
+            cells = self._cells(self.lat[ids], self.lng[ids])
+            crossed = cells != self.cell_of[ids]
+            if crossed.any():
+                self.cell_of[ids[crossed]] = cells[crossed]
+                self._order_dirty = True
+            self._moved[:] = False
+            self._any_moved = False
+        if self._order_dirty:
+            ids = np.flatnonzero(self.active)
+            self._order = ids[np.argsort(self.cell_of[ids])]
+            self._starts = _first_per_group(self.cell_of[self._order])
+            self._counts = np.diff(np.append(self._starts, self._order.size))
+            self._order_dirty = False
+            self._bounds_dirty = True
+        if self._bounds_dirty:
+            lat, lng = self.lat[self._order], self.lng[self._order]
+            if self._starts.size:
+                self._lat_min = np.minimum.reduceat(lat, self._starts)
+                self._lat_max = np.maximum.reduceat(lat, self._starts)
+                self._lng_min = np.minimum.reduceat(lng, self._starts)
+                self._lng_max = np.maximum.reduceat(lng, self._starts)
+                self._abs_lat_max = float(np.maximum(np.abs(self._lat_min), np.abs(self._lat_max)).max())
+            self._bounds_dirty = False
+
+    def _lower_bounds(self, lat, lng):
+        """查询点 × 网格 的实际距离下界（公里）"""
+        lat_ref = max(self._abs_lat_max, float(np.abs(lat).max()))
+        kx = KM_PER_DEG * math.cos(math.radians(min(lat_ref + LAT_MARGIN_DEG, 89.0)))
+        dx = np.maximum(np.maximum(self._lng_min[None, :] - lng[:, None], lng[:, None] - self._lng_max[None, :]), 0)
+        dy = np.maximum(np.maximum(self._lat_min[None, :] - lat[:, None], lat[:, None] - self._lat_max[None, :]), 0)
+        return np.hypot(dx * kx, dy * KM_PER_DEG) * BOUND_SLACK
+
+    def _expand(self, queries, cells):
+        """(查询点, 网格) 对展开为 (查询点, 单位) 对"""
+        counts = self._counts[cells]
+        pair_query = np.repeat(queries, counts)
+        group_start = np.repeat(np.cumsum(counts) - counts, counts)
+        offset = np.arange(pair_query.size) - group_start
+        units = self._order[np.repeat(self._starts[cells], counts) + offset]
+        return pair_query, units
+
+    def _prepare(self, lat, lng):
+        lat = np.asarray(lat, dtype=np.float64).reshape(-1)
+        lng = np.asarray(lng, dtype=np.float64).reshape(-1)
+        self._refresh()
+        return lat, lng
+
+    def query_radius(self, lat, lng, radius_km):
+        """一批查询点各自 radius_km 范围内的单位
+
+        返回 (查询点下标, 单位下标, 距离)，按查询点、距离、单位下标升序；radius_km 可为标量或逐点数组。
+        """
+        lat, lng = self._prepare(lat, lng)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        if lat.size == 0 or self._starts.size == 0:
+            return empty
+        radius = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), lat.shape)
+        queries, cells = np.nonzero(self._lower_bounds(lat, lng) <= radius[:, None])
+        pair_query, units = self._expand(queries, cells)
+        distance = haversine_km(lat[pair_query], lng[pair_query], self.lat[units], self.lng[units])
+        keep = distance <= radius[pair_query]
+        pair_query, units, distance = pair_query[keep], units[keep], distance[keep]
+        order = np.lexsort((units, distance, pair_query))
+        return pair_query[order], units[order], distance[order]
+
+    def nearest(self, lat, lng, k=1):
+        """一批查询点各自的 k 近邻，返回形状 (查询点数, k) 的 (单位下标, 距离)，不足 k 个时以 -1 / inf 补齐"""
+        lat, lng = self._prepare(lat, lng)
+        ids = np.full((lat.size, k), -1, dtype=np.int64)
+        distances = np.full((lat.size, k), np.inf)
+        if lat.size == 0 or self._starts.size == 0 or k < 1:
+            return ids, distances
+        lower = self._lower_bounds(lat, lng)
+        # 第一轮：下界最小的几个网格，得到第 k 近距离的上界
+        seeds = np.argsort(lower, axis=1, kind='stable')[:, :min(max(SEED_CELLS, k), lower.shape[1])]
+        rows = np.repeat(np.arange(lat.size), seeds.shape[1])
+        pair_query, units = self._expand(rows, seeds.ravel())
+        distance = haversine_km(lat[pair_query], lng[pair_query], self.lat[units], self.lng[units])
+        order = np.lexsort((units, distance, pair_query))
+        pair_query, units, distance = pair_query[order], units[order], distance[order]
+        rank = _rank_in_group(pair_query)
+        kth = np.full(lat.size, np.inf)
+        kth[pair_query[rank == k - 1]] = distance[rank == k - 1]
+        # 第二轮：下界不超过该上界、且第一轮未计算的网格
+        extra = lower <= kth[:, None]
+        extra[rows, seeds.ravel()] = False
+        queries, cells = np.nonzero(extra)
+        more_query, more_units = self._expand(queries, cells)
+        more_distance = haversine_km(lat[more_query], lng[more_query], self.lat[more_units], self.lng[more_units])
+        pair_query = np.concatenate((pair_query, more_query))
+        units = np.concatenate((units, more_units))
+        distance = np.concatenate((distance, more_distance))
+        order = np.lexsort((units, distance, pair_query))
+        pair_query, units, distance = pair_query[order], units[order], distance[order]
+        rank = _rank_in_group(pair_query)
+        keep = rank < k
+        ids[pair_query[keep], rank[keep]] = units[keep]
+        distances[pair_query[keep], rank[keep]] = distance[keep]
+        return ids, distances
+
+    def best(self, lat, lng, bias, distance_weight, unit_class, allowed):
+        """一批查询点各自评分最高的单位，评分为 bias[单位] + distance_weight / (1 + 距离)
+
+        unit_class 为各单位的类别（0 起的小整数），allowed[查询点, 类别] 为假的组合不参与评分；
+        返回各查询点的单位下标，没有可选单位时为 -1。
+        """
+        lat, lng = self._prepare(lat, lng)
+        bias = np.asarray(bias, dtype=np.float64)
+        allowed = np.asarray(allowed, dtype=bool).reshape(lat.size, -1)
+        picked = np.full(lat.size, -1, dtype=np.int64)
+        if lat.size == 0 or self._starts.size == 0:
+            return picked
+
+        # 各网格内每个类别的最高 bias，结合距离下界得到 查询点 × 网格 的评分上界
+        member_class = unit_class[self._order]
+        cell_bias = np.full((lat.size, self._starts.size), -np.inf)
+        for c in range(allowed.shape[1]):
+            top = np.maximum.reduceat(np.where(member_class == c, bias[self._order], -np.inf), self._starts)
+            cell_bias = np.maximum(cell_bias, np.where(allowed[:, c:c + 1], top[None, :], -np.inf))
+        bound = cell_bias + distance_weight / (1 + self._lower_bounds(lat, lng))
+
+        def score(pair_query, units):
+            distance = haversine_km(lat[pair_query], lng[pair_query], self.lat[units], self.lng[units])
+            value = bias[units] + distance_weight / (1 + distance)
+            return np.where(allowed[pair_query, unit_class[units]], value, -np.inf)
+
+        def reduce(pair_query, units, scores):
+            """pair_query 已按查询点分组，求各组最高分及取得最高分的最小单位下标"""
+            best_score = np.full(lat.size, -np.inf)
+            best_id = np.full(lat.size, -1, dtype=np.int64)
+            starts = _first_per_group(pair_query)
+            if starts.size:
+                top = np.maximum.reduceat(scores, starts)
+                group = np.repeat(np.arange(starts.size), np.diff(np.append(starts, scores.size)))
+                tied = np.where(scores == top[group], units, np.iinfo(np.int64).max)
+                best_score[pair_query[starts]] = top
+                best_id[pair_query[starts]] = np.minimum.reduceat(tied, starts)
+            return best_score, best_id
+
+        # 第一轮：上界最高的几个网格
+        seeds = min(SEED_CELLS, self._starts.size)
+        seed_cells = np.argpartition(-bound, seeds - 1, axis=1)[:, :seeds]
+        rows = np.repeat(np.arange(lat.size), seeds)
+        pair_query, units = self._expand(rows, seed_cells.ravel())
+        best_score, best_id = reduce(pair_query, units, score(pair_query, units))
+        # 第二轮：上界不低于当前最优分、且第一轮未计算的网格
+        extra = np.isfinite(bound) & (bound >= best_score[:, None])
+        extra[rows, seed_cells.ravel()] = False
+        pair_query, units = self._expand(*np.nonzero(extra))
+        more_score, more_id = reduce(pair_query, units, score(pair_query, units))
+        better = (more_score > best_score) | ((more_score == best_score) & (more_id >= 0) & (more_id < best_id))
+        best_score = np.where(better, more_score, best_score)
+        best_id = np.where(better, more_id, best_id)
+        picked[np.isfinite(best_score)] = best_id[np.isfinite(best_score)]
+        return picked
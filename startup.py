@@ -0,0 +1,158 @@
+# startup.py
+"""启动耗时记录与延迟初始化
+
+导入 app 只定义蓝图路由与创建轻量对象；NumPy 及仿真、推理、奖励曲线等依赖它的模块在首次
+使用时导入，或由 create_app() 的预热阶段显式预加载（多进程部署时在 fork 前完成）。
+phase() 记录各初始化阶段耗时，lazy() 把模块级单例推迟到第一次调用时创建。
+
+启动报告：python startup.py [--no-warm] [--top N]
+在子进程中以 -X importtime 导入 app 并执行 create_app()，输出各模块导入耗时与初始化阶段耗时。
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_TOP = 25
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+_phases = []
+_phases_lock = threading.Lock()
+
+
+def record(name, elapsed_s):
+    with _phases_lock:
+        _phases.append((name, round(elapsed_s * 1000, 3)))
+
+
+@contextlib.contextmanager
+def phase(name):
+    """记录 with 块的耗时"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def phases():
+    """[(阶段名称, 毫秒)]，按完成顺序排列"""
+    with _phases_lock:
+        return list(_phases)
+
+
+def format_phases(items=None):
+    items = phases() if items is None else items
+    return ', '.join(f'{name} {ms:.1f}ms' for name, ms in items)
+
+
+def preload(modules):
+    """按顺序导入模块，每个模块记为一个阶段；已导入的模块耗时接近 0"""
+    for name in modules:
+        with phase(f'preload:{name}'):
+            importlib.import_module(name)
+
+
+class LazyValue:
+    """首次调用时由 factory 创建并缓存的对象，创建过程加锁只执行一次"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def __call__(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+
+def lazy(factory):
+    return LazyValue(factory)
+
+
+def parse_importtime(text):
+    """解析 -X importtime 输出，返回 [{'module', 'self_ms', 'cumulative_ms', 'depth'}]"""
+    rows = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        rows.append({
+            'module': match.group(4),
+            'self_ms': int(match.group(1)) / 1000,
+            'cumulative_ms': int(match.group(2)) / 1000,
+            'depth': (len(match.group(3)) - 1) // 2
+        })
+    return rows
+
+
+def _child(warm):
+    """在 -X importtime 子进程中执行：导入 app、执行 create_app，把阶段耗时以 JSON 写到标准输出"""
+    # 本文件此时以 __main__ 运行，阶段记录在 app 导入的 startup 模块中
+    import startup
+    started = time.perf_counter()
+    import app
+    startup.record('import app', time.perf_counter() - started)
+    app.create_app({'WARM_CACHES': warm}, start_services=False)
+    loaded = sorted(name for name in ('numpy', 'simulation_engine', 'policy_inference') if name in sys.modules)
+    print(json.dumps({'phases': startup.phases(), 'heavy_loaded': loaded}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动耗时报告：模块导入耗时与初始化阶段耗时')
+    parser.add_argument('--no-warm', action='store_true', help='不执行缓存预热与模块预加载')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='列出累计导入耗时最多的模块数')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        _child(not args.no_warm)
+        return 0
+
+    command = [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child']
+    if args.no_warm:
+        command.append('--no-warm')
+    started = time.perf_counter()
+    proc = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    wall_ms = (time.perf_counter() - started) * 1000
+    result_line = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ''
+    if proc.returncode != 0 or not result_line.startswith('{'):
+        sys.stderr.write(proc.stderr[-4000:])
+        print('启动失败，见上方错误输出')
+        return 1
+    result = json.loads(result_line)
+    imports = parse_importtime(proc.stderr)
+
+    # importtime 按导入完成顺序输出：app 的依赖位于 app 所在行与上一个顶层模块之间
+    app_index = next((i for i, row in enumerate(imports) if row['module'] == 'app' and row['depth'] == 0), None)
+    print(f'子进程总耗时 {wall_ms:.1f}ms（含解释器启动）')
+    if app_index is not None:
+        first = max((i + 1 for i in range(app_index) if imports[i]['depth'] == 0), default=0)
+        app_rows = imports[first:app_index + 1]
+        print(f'导入 app：{imports[app_index]["cumulative_ms"]:.1f}ms，其中 app 自身 {imports[app_index]["self_ms"]:.1f}ms')
+        print(f'\n累计导入耗时最多的 {args.top} 个模块（毫秒）：')
+        print(f'{"累计":>10}  {"自身":>8}  模块')
+        top = sorted(app_rows, key=lambda row: row['cumulative_ms'], reverse=True)[:args.top]
+        for row in top:
+            print(f'{row["cumulative_ms"]:>10.1f}  {row["self_ms"]:>8.1f}  {"  " * row["depth"]}{row["module"]}')
+    print('\n初始化阶段（毫秒）：')
+    for name, ms in result['phases']:
+        print(f'{ms:>10.1f}  {name}')
+    print(f'\n启动结束时已加载的重量级模块：{", ".join(result["heavy_loaded"]) or "无"}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
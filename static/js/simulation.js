@@ -0,0 +1,1674 @@
+// simulation.js
+// 仿真评估页面脚本，配置文件地址由页面通过 SIMULATION_ASSETS 注入
+// 全局变量
+let map;
+let droneMarkers = [];
+let enemyMarkers = [];
+let isSimulationRunning = false;
+let isPaused = false;
+let currentScenarioData = null;
+let targetModels = [];
+let fireModels = [];
+let selectedTargetModel = null;
+let selectedFireModel = null;
+let simulationInterval = null;
+let simulationSpeed = 1000; // 仿真更新间隔(毫秒)
+let activeHighlightLine = null;
+let activeHighlightedTarget = null;
+let activeHighlightedDrone = null;
+let activeHighlightTooltip = null;
+let enemyUnitValueMap = {};
+let maxEnemyUnitValue = 120;
+let targetAssignmentCounts = {};
+let weaponConfigMap = {};
+const FIRE_COOLDOWN_MS = 3000;
+const MESSAGE_DURATION_MS = 2000;
+const DESTRUCTION_ANIMATION_MS = 800;
+const AIR_TARGET_TYPES = ['reconnaissance_drone', 'attack_helicopter'];
+const GROUND_TARGET_TYPES = ['tank', 'armored_vehicle', 'military_base'];
+const UNIT_TYPE_LABELS = {
+    reconnaissance_drone: '侦察无人机',
+    attack_helicopter: '武装直升机',
+    tank: '坦克',
+    armored_vehicle: '装甲车',
+    military_base: '军事基地'
+};
+
+let battleStats = {
+    shotsFired: 0,
+    hits: 0,
+    destroyed: 0,
+    ammoUsage: {},
+    killsByType: {},
+    startTime: null,
+    endTime: null,
+    initialEnemyCount: 0,
+    initialDroneCount: 0,
+    resultReason: ''
+};
+let ammoUsageChart = null;
+let killDistributionChart = null;
+
+// 单位运动数据
+let unitMovementData = {
+    ourDrones: [],
+    enemyUnits: []
+};
+
+// 单位速度配置 (km/h)
+const UNIT_SPEEDS = {
+    our_drone: 150, // 我方无人机速度
+    reconnaissance_drone: 120,
+    attack_helicopter: 200,
+    tank: 50,
+    armored_vehicle: 80,
+    military_base: 0 // 基地不移动
+};
+
+// 日志批量上报：按条数或时间间隔合并为一次 /api/save_logs 请求
+const LOG_BATCH_SIZE = 100;
+const LOG_FLUSH_INTERVAL_MS = 1000;
+const LOG_BUFFER_LIMIT = 5000;
+let logBuffer = [];
+let logFlushTimer = null;
+let logFlushing = false;
+let logRetryDelayMs = LOG_FLUSH_INTERVAL_MS;
+
+// 服务端推流：仿真由服务端推进，页面只按关键帧/增量帧更新标记
+let liveRun = null;
+
+function scheduleLogFlush(delayMs) {
+    if (logFlushTimer === null) {
+        logFlushTimer = setTimeout(flushLogs, delayMs);
+    }
+}
+
+function flushLogs() {
+    if (logFlushTimer !== null) {
+        clearTimeout(logFlushTimer);
+        logFlushTimer = null;
+    }
+    if (logFlushing || logBuffer.length === 0) {
+        return;
+    }
+    const batch = logBuffer.splice(0, LOG_BATCH_SIZE);
+    logFlushing = true;
+    fetch('/api/save_logs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ entries: batch })
+    })
+    .then(response => {
+        if (response.status === 503) {
+            // 服务端队列已满：放回缓冲区并退避重试
+            logBuffer = batch.concat(logBuffer).slice(-LOG_BUFFER_LIMIT);
+            logRetryDelayMs = Math.min(logRetryDelayMs * 2, 30000);
+            return null;
+        }
+        logRetryDelayMs = LOG_FLUSH_INTERVAL_MS;
+        return response.json();
+    })
+    .then(data => {
+        if (data && !data.success) {
+            console.error('保存日志失败:', data.message);
+        }
+    })
+    .catch(error => {
+        console.error('发送日志请求失败:', error);
+    })
+    .finally(() => {
+        logFlushing = false;
+        if (logBuffer.length >= LOG_BATCH_SIZE && logRetryDelayMs === LOG_FLUSH_INTERVAL_MS) {
+            flushLogs();
+        } else if (logBuffer.length > 0) {
+            scheduleLogFlush(logRetryDelayMs);
+        }
+    });
+}
+
+// 页面关闭时用 sendBeacon 发送剩余日志
+window.addEventListener('pagehide', () => {
+    while (logBuffer.length > 0) {
+        const batch = logBuffer.splice(0, LOG_BATCH_SIZE);
+        navigator.sendBeacon('/api/save_logs', new Blob([JSON.stringify({ entries: batch })], { type: 'application/json' }));
+    }
+});
+
+// 日志保存函数
+function saveLog(message, level = 'INFO') {
+    // 在控制台显示日志
+    console.log(message);
+    
+    // 检查消息长度，如果太长则截断
+    let logMessage = message;
+    if (logMessage.length > 2000) {
+        logMessage = logMessage.substring(0, 1997) + '...';
+        console.warn('日志消息过长，已截断至 2000 个字符');
+    }
+    
+    logBuffer.push({ message: logMessage, level: level, ts: Date.now() });
+    if (logBuffer.length > LOG_BUFFER_LIMIT) {
+        logBuffer.splice(0, logBuffer.length - LOG_BUFFER_LIMIT);
+    }
+    if (logBuffer.length >= LOG_BATCH_SIZE && logRetryDelayMs === LOG_FLUSH_INTERVAL_MS) {
+        flushLogs();
+    } else {
+        scheduleLogFlush(logRetryDelayMs);
+    }
+}
+
+// 加载敌方单位价值配置
+function loadEnemyConfig() {
+    fetch(SIMULATION_ASSETS.enemyConfig)
+        .then(response => response.json())
+        .then(data => {
+            enemyUnitValueMap = {};
+            maxEnemyUnitValue = 1;
+            if (data && Array.isArray(data.units)) {
+                data.units.forEach(unit => {
+                    if (unit.type) {
+                        enemyUnitValueMap[unit.type] = unit.value || 50;
+                        maxEnemyUnitValue = Math.max(maxEnemyUnitValue, unit.value || 50);
+                    }
+                });
+            }
+            saveLog('敌方单位配置加载完成');
+        })
+        .catch(error => {
+            saveLog('敌方单位配置加载失败：' + error.message, 'ERROR');
+            enemyUnitValueMap = {};
+            maxEnemyUnitValue = 120;
+        });
+}
+
+// 加载武器配置
+function loadWeaponConfig() {
+    fetch(SIMULATION_ASSETS.weaponConfig)
+        .then(response => response.json())
+        .then(data => {
+            weaponConfigMap = {};
+            if (data && Array.isArray(data.weapons)) {
+                data.weapons.forEach(weapon => {
+                    if (weapon.code) {
+                        weaponConfigMap[weapon.code] = weapon;
+                    }
+                });
+            }
+            saveLog('武器配置加载完成');
+        })
+        .catch(error => {
+            saveLog('武器配置加载失败：' + error.message, 'ERROR');
+            weaponConfigMap = {};
+        });
+}
+
+function clearTransientMessages() {
+    const container = document.getElementById('simMessageContainer');
+    if (container) {
+        container.innerHTML = '';
+    }
+}
+
+function showAttackMessage(message, level = 'info') {
+    const container = document.getElementById('simMessageContainer');
+    if (!container) return;
+    const item = document.createElement('div');
+    const levelClass = level === 'success' ? 'success' : level === 'danger' ? 'danger' : level === 'warning' ? 'warning' : '';
+    item.className = `sim-message ${levelClass}`.trim();
+    item.textContent = message;
+    container.appendChild(item);
+    setTimeout(() => {
+        if (item && item.parentNode) {
+            item.parentNode.removeChild(item);
+        }
+    }, MESSAGE_DURATION_MS);
+}
+
+function destroyCharts() {
+    if (ammoUsageChart) {
+        ammoUsageChart.destroy();
+        ammoUsageChart = null;
+    }
+    if (killDistributionChart) {
+        killDistributionChart.destroy();
+        killDistributionChart = null;
+    }
+}
+
+function resetBattleStats() {
+    battleStats = {
+        shotsFired: 0,
+        hits: 0,
+        destroyed: 0,
+        ammoUsage: {},
+        killsByType: {},
+        startTime: null,
+        endTime: null,
+        initialEnemyCount: 0,
+        initialDroneCount: 0,
+        resultReason: ''
+    };
+    destroyCharts();
+    const panel = document.getElementById('battleSummaryPanel');
+    if (panel) {
+        panel.style.display = 'none';
+    }
+}
+
+function recordShot(weaponCode) {
+    battleStats.shotsFired += 1;
+    if (weaponCode) {
+        battleStats.ammoUsage[weaponCode] = (battleStats.ammoUsage[weaponCode] || 0) + 1;
+    }
+}
+
+function recordHit(hit, destroyed, targetMarker) {
+    if (hit) {
+        battleStats.hits += 1;
+    }
+    if (destroyed) {
+        battleStats.destroyed += 1;
+        const type = targetMarker && targetMarker.unitData ? targetMarker.unitData.type || '未知' : '未知';
+        battleStats.killsByType[type] = (battleStats.killsByType[type] || 0) + 1;
+    }
+}
+
+function formatDuration(seconds) {
+    if (!isFinite(seconds) || seconds < 0) return '--';
+    const mins = Math.floor(seconds / 60);
+    const secs = Math.floor(seconds % 60);
+    return `${mins}分${secs}秒`;
+}
+
+function renderCharts() {
+    destroyCharts();
+    if (typeof Chart === 'undefined') {
+        console.warn('Chart.js 未加载，跳过图表渲染');
+        return;
+    }
+    const ammoCanvas = document.getElementById('ammoUsageChart');
+    const ammoEmpty = document.getElementById('ammoChartEmpty');
+    const ammoEntries = Object.entries(battleStats.ammoUsage || {});
+    if (ammoCanvas) {
+        const ctx = ammoCanvas.getContext('2d');
+        if (ammoEntries.length) {
+            if (ammoEmpty) ammoEmpty.style.display = 'none';
+            ammoUsageChart = new Chart(ctx, {
+                type: 'bar',
+                data: {
+                    labels: ammoEntries.map(([code]) => (weaponConfigMap[code] ? weaponConfigMap[code].name : code.toUpperCase())),
+                    datasets: [{
+                        label: '发射次数',
+                        data: ammoEntries.map(([, count]) => count),
+                        backgroundColor: '#60a5fa'
+                    }]
+                },
+                options: {
+                    responsive: true,
+                    plugins: { legend: { display: false } },
+                    scales: { y: { beginAtZero: true, ticks: { precision: 0 } } }
+                }
+            });
+        } else if (ammoEmpty) {
+            ammoEmpty.style.display = 'flex';
+        }
+    }
+
+    const killCanvas = document.getElementById('killDistributionChart');
+    const killEmpty = document.getElementById('killChartEmpty');
+    const killEntries = Object.entries(battleStats.killsByType || {});
+    if (killCanvas) {
+        const ctx = killCanvas.getContext('2d');
+        if (killEntries.length) {
+            if (killEmpty) killEmpty.style.display = 'none';
+            killDistributionChart = new Chart(ctx, {
+                type: 'doughnut',
+                data: {
+                    labels: killEntries.map(([type]) => UNIT_TYPE_LABELS[type] || type),
+                    datasets: [{
+                        data: killEntries.map(([, count]) => count),
+                        backgroundColor: ['#34d399', '#fbbf24', '#60a5fa', '#f472b6', '#a78bfa']
+                    }]
+                },
+                options: {
+                    responsive: true,
+                    plugins: { legend: { position: 'bottom' } }
+                }
+            });
+        } else if (killEmpty) {
+            killEmpty.style.display = 'flex';
+        }
+    }
+}
+
+function renderBattleSummary(reason = '仿真结束') {
+    const panel = document.getElementById('battleSummaryPanel');
+    if (!panel) return;
+    battleStats.resultReason = reason;
+    battleStats.endTime = battleStats.endTime || Date.now();
+    const durationSec = battleStats.startTime ? (battleStats.endTime - battleStats.startTime) / 1000 : 0;
+    const enemyRemaining = enemyMarkers.length;
+    const ourRemaining = liveRun ? droneMarkers.length : unitMovementData.ourDrones.length;
+
+    document.getElementById('summaryReason').textContent = reason;
+    const durationEl = document.getElementById('summaryDuration');
+    if (durationEl) durationEl.textContent = formatDuration(durationSec);
+    document.getElementById('summaryShots').textContent = battleStats.shotsFired;
+    document.getElementById('summaryHits').textContent = battleStats.hits;
+    document.getElementById('summaryKills').textContent = battleStats.destroyed;
+    document.getElementById('summaryEnemyRemaining').textContent = enemyRemaining;
+    document.getElementById('summaryOurRemaining').textContent = ourRemaining;
+
+    panel.style.display = 'block';
+    renderCharts();
+}
+
+function hideBattleSummary() {
+    const panel = document.getElementById('battleSummaryPanel');
+    if (panel) panel.style.display = 'none';
+}
+
+function finishSimulation(reason) {
+    if (!isSimulationRunning) return;
+    isSimulationRunning = false;
+    isPaused = false;
+    stopSimulationLoop();
+    battleStats.endTime = Date.now();
+    renderBattleSummary(reason);
+    document.getElementById('simStatus').textContent = '已结束';
+    document.getElementById('simStatus').className = 'status-badge';
+    document.getElementById('startSim').innerHTML = '<i class="fas fa-play"></i> 开始仿真';
+    updateStartButtonState();
+    showAttackMessage(`仿真结束：${reason}`, 'success');
+    saveLog(`仿真结束：${reason}`);
+}
+
+function checkSimulationEnd() {
+    // 推流模式下由服务端的 end 帧结束仿真
+    if (!isSimulationRunning || liveRun) return;
+    if (enemyMarkers.length === 0) {
+        finishSimulation('敌方全部被击毁');
+    } else if (unitMovementData.ourDrones.length === 0) {
+        finishSimulation('我方全部被击毁');
+    }
+}
+
+// 初始化地图
+function initMap() {
+    // 创建地图实例（以台湾海峡为中心）
+    // 台湾海峡中心位置：北纬24.5°，东经120.0°
+    map = L.map('simulationMap').setView([24.5, 120.0], 8);
+    
+    // 定义多种地图图层
+    const baseMaps = {
+        '标准地图': L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+            maxZoom: 19
+        }),
+        
+        '卫星图': L.tileLayer('https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}', {
+            attribution: 'Tiles &copy; Esri &mdash; Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, Aerogrid, IGN, IGP, UPR-EGP, and the GIS User Community',
+            maxZoom: 19
+        }),
+        
+        '地形图': L.tileLayer('https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png', {
+            attribution: 'Map data: &copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors, <a href="http://viewfinderpanoramas.org">SRTM</a> | Map style: &copy; <a href="https://opentopomap.org">OpenTopoMap</a> (<a href="https://creativecommons.org/licenses/by-sa/3.0/">CC-BY-SA</a>)',
+            maxZoom: 17
+        })
+    };
+    
+    // 默认使用卫星图（更适合海上作战）
+    baseMaps['卫星图'].addTo(map);
+    
+    // 添加图层控制器
+    L.control.layers(baseMaps).addTo(map);
+    
+    // 添加比例尺控件
+    L.control.scale().addTo(map);
+    
+    // 监听地图事件
+    map.on('mousemove', function(e) {
+        updateMapInfo(e.latlng.lat, e.latlng.lng, map.getZoom());
+    });
+    
+    map.on('zoomend', function() {
+        const center = map.getCenter();
+        updateMapInfo(center.lat, center.lng, map.getZoom());
+    });
+    
+    saveLog('台湾海峡地图初始化完成');
+}
+
+// 更新地图信息显示
+function updateMapInfo(lat, lng, zoom) {
+    document.getElementById('latitude').textContent = lat.toFixed(6);
+    document.getElementById('longitude').textContent = lng.toFixed(6);
+    document.getElementById('zoomLevel').textContent = zoom;
+}
+
+function showLoadScenarioButton() {
+    const btn = document.getElementById('loadScenario');
+    if (btn) {
+        btn.style.display = 'inline-flex';
+    }
+}
+
+// 加载场景列表：每次请求一页（使用服务端默认页大小），
+// 列表末尾的“加载更多”选项按游标继续加载
+const LOAD_MORE_SCENARIOS = '__more__';
+let scenarioNextCursor = null;
+
+function loadScenarios(cursor = null) {
+    const params = new URLSearchParams();
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    fetch(`/api/scenarios?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showLoadScenarioButton();
+                const select = document.getElementById('scenarioSelect');
+                if (!cursor) {
+                    select.innerHTML = '<option value="">请选择场景...</option>';
+                }
+                const moreOption = select.querySelector(`option[value="${LOAD_MORE_SCENARIOS}"]`);
+                if (moreOption) {
+                    moreOption.remove();
+                }
+                
+                data.scenarios.forEach(scenario => {
+                    const option = document.createElement('option');
+                    option.value = scenario.id;
+                    option.textContent = `${scenario.name} (我方:${scenario.our_drone_count} 敌方:${scenario.enemy_total})`;
+                    select.appendChild(option);
+                });
+                
+                scenarioNextCursor = data.next_cursor;
+                if (data.has_more) {
+                    const option = document.createElement('option');
+                    option.value = LOAD_MORE_SCENARIOS;
+                    option.textContent = '加载更多场景...';
+                    select.appendChild(option);
+                }
+                
+                saveLog(`加载了 ${data.scenarios.length} 个场景到选择列表`);
+            } else {
+                saveLog('加载场景列表失败: ' + data.message, 'ERROR');
+            }
+        })
+        .catch(error => {
+            showLoadScenarioButton();
+            saveLog('获取场景列表时发生错误: ' + error.message, 'ERROR');
+        });
+}
+
+// 加载模型列表
+function loadModels() {
+    fetch('/api/models')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                saveLog('加载模型列表失败: ' + data.message, 'ERROR');
+                return;
+            }
+            targetModels = data.models.filter(model => model.category === 'target_allocation');
+            fireModels = data.models.filter(model => model.category === 'fire_allocaltion');
+            populateModelSelect('targetModelSelect', targetModels, '请选择目标分配模型...');
+            populateModelSelect('fireModelSelect', fireModels, '请选择火力分配模型...');
+            updateModelSelectionDisplay();
+            updateStartButtonState();
+            saveLog(`加载模型列表成功：目标分配 ${targetModels.length} 个，火力分配 ${fireModels.length} 个`);
+        })
+        .catch(error => {
+            saveLog('获取模型列表时发生错误: ' + error.message, 'ERROR');
+        });
+}
+
+// 填充模型下拉框
+function populateModelSelect(selectId, models, placeholder) {
+    const select = document.getElementById(selectId);
+    if (!select) return;
+
+    select.innerHTML = '';
+    const defaultOption = document.createElement('option');
+    defaultOption.value = '';
+    defaultOption.textContent = models.length ? placeholder : '暂无可用模型';
+    select.appendChild(defaultOption);
+
+    models.forEach(model => {
+        const option = document.createElement('option');
+        option.value = model.id;
+        option.textContent = `${model.name}${model.version ? ' · ' + model.version : ''}`;
+        select.appendChild(option);
+    });
+
+    select.disabled = models.length === 0;
+}
+
+// 更新模型选择状态展示
+function updateModelSelectionDisplay() {
+    const targetStatus = document.getElementById('targetModelStatus');
+    const fireStatus = document.getElementById('fireModelStatus');
+
+    if (targetStatus) {
+        if (selectedTargetModel) {
+            targetStatus.textContent = `${selectedTargetModel.name}${selectedTargetModel.version ? ' · ' + selectedTargetModel.version : ''}`;
+            targetStatus.classList.add('active');
+        } else {
+            targetStatus.textContent = '未选择';
+            targetStatus.classList.remove('active');
+        }
+    }
+
+    if (fireStatus) {
+        if (selectedFireModel) {
+            fireStatus.textContent = `${selectedFireModel.name}${selectedFireModel.version ? ' · ' + selectedFireModel.version : ''}`;
+            fireStatus.classList.add('active');
+        } else {
+            fireStatus.textContent = '未选择';
+            fireStatus.classList.remove('active');
+        }
+    }
+}
+
+// 检查仿真是否可以启动
+function isSimulationReady() {
+    return Boolean(currentScenarioData && selectedTargetModel && selectedFireModel);
+}
+
+function updateStartButtonState() {
+    const startBtn = document.getElementById('startSim');
+    if (!startBtn) return;
+    const canStart = isSimulationReady() || isSimulationRunning;
+    startBtn.disabled = !canStart;
+    if (startBtn.disabled) {
+        startBtn.classList.add('disabled');
+        startBtn.title = '请选择场景，并选择目标分配/火力分配模型后再开始';
+    } else {
+        startBtn.classList.remove('disabled');
+        startBtn.title = '';
+    }
+}
+
+// 清除地图上的所有标记
+function clearMapMarkers() {
+    // 清除我方无人机标记
+    droneMarkers.forEach(marker => {
+        map.removeLayer(marker);
+    });
+    droneMarkers = [];
+    
+    // 清除敌方单位标记
+    enemyMarkers.forEach(marker => {
+        map.removeLayer(marker);
+    });
+    enemyMarkers = [];
+    
+    clearTargetHighlight();
+    saveLog('清除地图上的所有标记');
+}
+
+// 获取标记图标
+function getMarkerIcon(type, side = 'enemy') {
+    const icons = {
+        // 我方无人机
+        our_drone: '✈️',
+        
+        // 敌方单位
+        reconnaissance_drone: '🚁',
+        attack_helicopter: '🚁', 
+        tank: '🏆',
+        armored_vehicle: '🚗',
+        military_base: '🏢'
+    };
+    
+    const colors = {
+        our_drone: '#007bff',
+        reconnaissance_drone: '#dc3545',
+        attack_helicopter: '#dc3545',
+        tank: '#dc3545',
+        armored_vehicle: '#dc3545',
+        military_base: '#dc3545'
+    };
+    
+    const iconKey = side === 'our' ? 'our_drone' : type;
+    
+    return L.divIcon({
+        html: `<div style="
+            font-size: 20px; 
+            text-align: center; 
+            line-height: 1;
+            filter: drop-shadow(1px 1px 2px rgba(0,0,0,0.3));
+            background: ${colors[iconKey] || '#6c757d'};
+            border-radius: 50%;
+            width: 32px;
+            height: 32px;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            border: 2px solid white;
+        ">${icons[iconKey] || '✈️'}</div>`,
+        className: 'custom-marker',
+        iconSize: [32, 32],
+        iconAnchor: [16, 16]
+    });
+}
+
+// 生成随机目标位置
+function generateRandomTarget(currentLat, currentLng, maxDistance = 0.1) {
+    // 生成随机方向和距离
+    const angle = Math.random() * 2 * Math.PI;
+    const distance = Math.random() * maxDistance;
+    
+    // 计算新的经纬度
+    const newLat = currentLat + (distance * Math.cos(angle));
+    const newLng = currentLng + (distance * Math.sin(angle));
+    
+    return { lat: newLat, lng: newLng };
+}
+
+// 计算两点之间的距离 (公里)
+function calculateDistance(lat1, lng1, lat2, lng2) {
+    const R = 6371; // 地球半径（公里）
+    const dLat = (lat2 - lat1) * Math.PI / 180;
+    const dLng = (lng2 - lng1) * Math.PI / 180;
+    const a = Math.sin(dLat/2) * Math.sin(dLat/2) +
+              Math.cos(lat1 * Math.PI / 180) * Math.cos(lat2 * Math.PI / 180) *
+              Math.sin(dLng/2) * Math.sin(dLng/2);
+    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1-a));
+    return R * c;
+}
+
+function setMarkerTooltip(marker, content) {
+    const existingTooltip = marker.getTooltip ? marker.getTooltip() : null;
+    if (existingTooltip) {
+        if (marker.setTooltipContent) {
+            marker.setTooltipContent(content);
+        } else if (existingTooltip.setContent) {
+            existingTooltip.setContent(content);
+        }
+    } else {
+        marker.bindTooltip(content, {
+            direction: 'top',
+            opacity: 0.9,
+            offset: [0, -4]
+        });
+    }
+}
+
+function formatTargetLabel(targetMarker) {
+    if (!targetMarker) {
+        return '未分配';
+    }
+    const unitData = targetMarker.unitData || {};
+    return unitData.code || '未设置';
+}
+
+function formatPayloadSummary(droneData = {}) {
+    const ar1 = droneData.ar1 || 0;
+    const pl10 = droneData.pl10 || 0;
+    const cannon = droneData.cannon || 0;
+    return `载荷：空地导弹:${ar1} 空空导弹:${pl10} 机炮:${cannon}`;
+}
+
+function updateDroneTooltip(unit) {
+    const label = formatTargetLabel(unit.targetMarker);
+    const codeLabel = unit.data && unit.data.code ? unit.data.code : '未设置';
+    const payload = formatPayloadSummary(unit.data || {});
+    const content = `编号：${codeLabel}<br/>${payload}<br/>当前攻击目标：${label}`;
+    setMarkerTooltip(unit.marker, content);
+    unit.marker.currentTarget = unit.targetMarker;
+}
+
+function clearTargetHighlight() {
+    if (activeHighlightLine) {
+        map.removeLayer(activeHighlightLine);
+        activeHighlightLine = null;
+    }
+    if (activeHighlightTooltip) {
+        map.removeLayer(activeHighlightTooltip);
+        activeHighlightTooltip = null;
+    }
+    if (activeHighlightedTarget && activeHighlightedTarget._icon) {
+        activeHighlightedTarget._icon.classList.remove('target-highlight');
+    }
+    activeHighlightedTarget = null;
+    activeHighlightedDrone = null;
+}
+
+function updateHighlightDistance() {
+    if (!activeHighlightLine || !activeHighlightedDrone || !activeHighlightedTarget) return;
+    const from = activeHighlightedDrone.getLatLng();
+    const to = activeHighlightedTarget.getLatLng();
+    const distanceKm = calculateDistance(from.lat, from.lng, to.lat, to.lng);
+    const text = `${distanceKm.toFixed(2)} km`;
+    if (!activeHighlightTooltip) {
+        activeHighlightTooltip = L.tooltip({
+            permanent: true,
+            direction: 'center',
+            className: 'distance-tooltip',
+            offset: [0, -4]
+        })
+        .setLatLng(L.latLng(
+            (from.lat + to.lat) / 2,
+            (from.lng + to.lng) / 2
+        ))
+        .setContent(text)
+        .addTo(map);
+    } else {
+        activeHighlightTooltip.setLatLng(L.latLng(
+            (from.lat + to.lat) / 2,
+            (from.lng + to.lng) / 2
+        ));
+        if (activeHighlightTooltip.setContent) {
+            activeHighlightTooltip.setContent(text);
+        }
+    }
+}
+
+function highlightTargetForDrone(droneMarker) {
+    const unit = unitMovementData.ourDrones.find(u => u.marker === droneMarker);
+    const targetMarker = (unit && unit.targetMarker) || droneMarker.currentTarget;
+    // 如果当前就是选中的无人机，切换为取消高亮
+    if (activeHighlightedDrone === droneMarker) {
+        clearTargetHighlight();
+        return;
+    }
+
+    clearTargetHighlight();
+    if (!targetMarker) {
+        return;
+    }
+    activeHighlightedTarget = targetMarker;
+    activeHighlightedDrone = droneMarker;
+    if (targetMarker._icon) {
+        targetMarker._icon.classList.add('target-highlight');
+    }
+    activeHighlightLine = L.polyline(
+        [droneMarker.getLatLng(), targetMarker.getLatLng()],
+        { color: '#ff5252', weight: 3, dashArray: '8,4', opacity: 0.8 }
+    ).addTo(map);
+    if (targetMarker.bringToFront) targetMarker.bringToFront();
+    if (droneMarker.bringToFront) droneMarker.bringToFront();
+    updateHighlightDistance();
+}
+
+const TARGET_SELECTION_WEIGHTS = {
+    value: 0.5,
+    distance: 0.35,
+    load: 0.15
+};
+
+function getTargetKey(marker) {
+    if (!marker) return null;
+    if (marker.unitIndex !== undefined) return marker.unitIndex;
+    return marker._leaflet_id || null;
+}
+
+function incrementTargetAssignment(marker) {
+    const key = getTargetKey(marker);
+    if (key === null) return;
+    targetAssignmentCounts[key] = (targetAssignmentCounts[key] || 0) + 1;
+}
+
+function decrementTargetAssignment(marker) {
+    const key = getTargetKey(marker);
+    if (key === null) return;
+    if (targetAssignmentCounts[key]) {
+        targetAssignmentCounts[key] = Math.max(0, targetAssignmentCounts[key] - 1);
+    }
+}
+
+function getEnemyValue(marker) {
+    const unitType = marker && marker.unitData ? marker.unitData.type : null;
+    if (unitType && enemyUnitValueMap[unitType]) {
+        return enemyUnitValueMap[unitType];
+    }
+    if (marker && marker.unitData && marker.unitData.value) {
+        return marker.unitData.value;
+    }
+    return 50;
+}
+
+function getWeaponFromDrone(droneData, code) {
+    if (!droneData) return null;
+    const count = parseInt(droneData[code], 10);
+    if (isNaN(count) || count <= 0) return null;
+    const cfg = weaponConfigMap[code];
+    if (!cfg) return null;
+    return {
+        code,
+        count,
+        config: cfg
+    };
+}
+
+function getTargetCategory(targetMarker) {
+    const type = targetMarker && targetMarker.unitData ? targetMarker.unitData.type || '' : '';
+    const isAir = AIR_TARGET_TYPES.includes(type);
+    const isGround = GROUND_TARGET_TYPES.includes(type);
+    return { type, isAir, isGround };
+}
+
+function chooseWeaponForTarget(droneUnit, targetMarker, distanceKm) {
+    if (!droneUnit || !targetMarker) return null;
+    const droneData = droneUnit.data || {};
+    const { isAir, isGround } = getTargetCategory(targetMarker);
+    const candidates = ['ar1', 'pl10', 'cannon']
+        .map(code => getWeaponFromDrone(droneData, code))
+        .filter(Boolean);
+    const filtered = candidates.filter(w => {
+        if (w.code === 'ar1') return !isAir; // 空地导弹仅攻击地面目标
+        if (w.code === 'pl10') return isAir;  // 空空导弹仅攻击空中目标
+        return true; // 机炮都可以攻击
+    });
+    let best = null;
+    filtered.forEach(w => {
+        const cfg = w.config;
+        const minRange = cfg.min_range_km || 0;
+        const maxRange = cfg.max_range_km || 0;
+        if (maxRange <= 0) return;
+        if (distanceKm < minRange || distanceKm > maxRange) return;
+        const score = cfg.hit_probability || 0;
+        if (!best || score > best.score) {
+            best = {
+                code: w.code,
+                config: cfg,
+                score,
+                maxRange
+            };
+        }
+    });
+    return best;
+}
+
+function applyWeaponConsumption(droneUnit, weaponCode) {
+    if (!droneUnit || !droneUnit.data) return;
+    const current = parseInt(droneUnit.data[weaponCode], 10);
+    if (!isNaN(current) && current > 0) {
+        droneUnit.data[weaponCode] = current - 1;
+    }
+}
+
+function handleTargetDestroyed(targetMarker) {
+    if (!targetMarker || targetMarker.isDestroyed) return;
+    targetMarker.isDestroyed = true;
+    decrementTargetAssignment(targetMarker);
+    if (activeHighlightedTarget === targetMarker) {
+        clearTargetHighlight();
+    }
+    const cleanupRemoval = () => {
+        map.removeLayer(targetMarker);
+        enemyMarkers = enemyMarkers.filter(m => m !== targetMarker);
+        unitMovementData.enemyUnits = unitMovementData.enemyUnits.filter(u => u.marker !== targetMarker);
+        saveLog(`目标被击毁：${formatTargetLabel(targetMarker)}`);
+        // 让所有针对该目标的无人机重新分配
+        unitMovementData.ourDrones.forEach(unit => {
+            if (unit.targetMarker === targetMarker) {
+                unit.targetMarker = pickRandomEnemyTarget(unit);
+                if (unit.targetMarker) {
+                    incrementTargetAssignment(unit.targetMarker);
+                    unit.targetPos = unit.targetMarker.getLatLng();
+                } else {
+                    unit.targetPos = generateRandomTarget(unit.currentPos.lat, unit.currentPos.lng, 0.2);
+                }
+                updateDroneTooltip(unit);
+            }
+        });
+        // 更新计数显示
+        document.getElementById('enemyCount').textContent = enemyMarkers.length;
+        checkSimulationEnd();
+    };
+    const icon = targetMarker._icon;
+    if (icon) {
+        icon.classList.add('unit-destroying');
+        setTimeout(cleanupRemoval, DESTRUCTION_ANIMATION_MS);
+    } else {
+        cleanupRemoval();
+    }
+}
+
+function attemptEngagement(unit) {
+    if (!unit || !unit.isOur) return;
+    if (!unit.targetMarker || unit.targetMarker.isDestroyed) return;
+    const now = Date.now();
+    if (unit.lastFireTime && now - unit.lastFireTime < FIRE_COOLDOWN_MS) {
+        return;
+    }
+    const targetPos = unit.targetMarker.getLatLng();
+    const dist = calculateDistance(unit.currentPos.lat, unit.currentPos.lng, targetPos.lat, targetPos.lng);
+    const weapon = chooseWeaponForTarget(unit, unit.targetMarker, dist);
+    if (!weapon) return;
+    recordShot(weapon.code);
+    unit.lastFireTime = now;
+    applyWeaponConsumption(unit, weapon.code);
+    const hitProbability = weapon.config.hit_probability || 0.5;
+    const lethality = weapon.config.single_shot_lethality || 0.8;
+    const roll = Math.random();
+    const killRoll = Math.random();
+    const hit = roll <= hitProbability;
+    const destroyed = hit && killRoll <= lethality;
+    recordHit(hit, destroyed, unit.targetMarker);
+    const droneLabel = unit.data.code || '未编号';
+    const targetLabel = formatTargetLabel(unit.targetMarker);
+    const weaponName = weapon.config.name || weapon.code.toUpperCase();
+    const resultLabel = destroyed ? '击毁目标' : (hit ? '命中未毁' : '未命中');
+    const messageLevel = destroyed ? 'success' : (hit ? 'warning' : 'danger');
+    showAttackMessage(`无人机${droneLabel}使用${weaponName}攻击${targetLabel}：${resultLabel}`, messageLevel);
+    saveLog(`无人机(${unit.data.code || '未编号'}) 使用 ${weapon.config.name} 攻击 ${formatTargetLabel(unit.targetMarker)}，距离 ${dist.toFixed(2)}km，命中掷骰=${roll.toFixed(2)}，毁伤掷骰=${killRoll.toFixed(2)}，结果：${destroyed ? '击毁' : (hit ? '命中未毁' : '未命中')}`);
+    if (destroyed) {
+        handleTargetDestroyed(unit.targetMarker);
+    } else if (!enemyMarkers.length) {
+        unit.targetMarker = null;
+    }
+}
+
+// 根据距离、价值与当前分配负载综合挑选最优敌方目标
+function pickRandomEnemyTarget(droneUnit = null) {
+    if (!enemyMarkers.length) {
+        return null;
+    }
+    const currentPos = droneUnit ? (droneUnit.currentPos || droneUnit.marker.getLatLng()) : null;
+    let bestMarker = null;
+    let bestScore = -Infinity;
+    enemyMarkers.forEach(marker => {
+        const targetPos = marker.getLatLng();
+        const distanceKm = currentPos ? calculateDistance(
+            currentPos.lat, currentPos.lng,
+            targetPos.lat, targetPos.lng
+        ) : 0;
+        const valueScore = getEnemyValue(marker) / maxEnemyUnitValue;
+        const distanceScore = 1 / (1 + distanceKm); // 越近越高
+        const load = targetAssignmentCounts[getTargetKey(marker)] || 0;
+        const loadScore = 1 / (1 + load);
+        const score = TARGET_SELECTION_WEIGHTS.value * valueScore +
+                      TARGET_SELECTION_WEIGHTS.distance * distanceScore +
+                      TARGET_SELECTION_WEIGHTS.load * loadScore;
+        if (score > bestScore) {
+            bestScore = score;
+            bestMarker = marker;
+        }
+    });
+    return bestMarker;
+}
+
+// 初始化单位运动数据
+function initializeMovementData() {
+    unitMovementData.ourDrones = [];
+    unitMovementData.enemyUnits = [];
+    targetAssignmentCounts = {};
+    
+    // 初始化我方无人机运动数据
+    droneMarkers.forEach((marker, index) => {
+        const currentPos = marker.getLatLng();
+        const unitData = currentScenarioData.our_drones[index] || {};
+        const unit = {
+            marker: marker,
+            currentPos: currentPos,
+            targetPos: null,
+            targetMarker: null,
+            speed: UNIT_SPEEDS.our_drone,
+            data: unitData,
+            isOur: true,
+            lastFireTime: 0
+        };
+        const targetMarker = pickRandomEnemyTarget(unit);
+        unit.targetMarker = targetMarker;
+        unit.targetPos = targetMarker ? targetMarker.getLatLng() : generateRandomTarget(currentPos.lat, currentPos.lng, 0.2);
+        
+        unitMovementData.ourDrones.push(unit);
+        if (targetMarker) {
+            incrementTargetAssignment(targetMarker);
+        }
+        marker.currentTarget = targetMarker;
+        updateDroneTooltip(unit);
+    });
+    
+    // 初始化敌方单位运动数据
+    enemyMarkers.forEach((marker, index) => {
+        const currentPos = marker.getLatLng();
+        const unitData = currentScenarioData.enemy_units[index] || {};
+        const unitType = unitData.type || 'reconnaissance_drone';
+        
+        // 基地不移动
+        if (unitType === 'military_base') {
+            return;
+        }
+        
+        const target = generateRandomTarget(currentPos.lat, currentPos.lng, 0.15);
+        
+        unitMovementData.enemyUnits.push({
+            marker: marker,
+            currentPos: currentPos,
+            targetPos: target,
+            speed: UNIT_SPEEDS[unitType] || 100,
+            type: unitType,
+            data: unitData,
+            isOur: false
+        });
+    });
+    
+    saveLog(`初始化运动数据：我方无人机 ${unitMovementData.ourDrones.length} 架，敌方移动单位 ${unitMovementData.enemyUnits.length} 个`);
+}
+
+// 更新单位位置
+function updateUnitPositions() {
+    if (!isSimulationRunning || isPaused) return;
+    
+    const updateInterval = simulationSpeed / 1000; // 转换为秒
+    
+    // 更新我方无人机位置
+    unitMovementData.ourDrones.forEach(unit => {
+        // 我方无人机始终追踪目标标记的实时位置
+        if (unit.targetMarker && !unit.targetMarker.isDestroyed) {
+            unit.targetPos = unit.targetMarker.getLatLng();
+        } else if (unit.targetMarker && unit.targetMarker.isDestroyed) {
+            // 已被摧毁则换目标
+            unit.targetMarker = pickRandomEnemyTarget(unit);
+            if (unit.targetMarker) {
+                incrementTargetAssignment(unit.targetMarker);
+                unit.targetPos = unit.targetMarker.getLatLng();
+            } else {
+                unit.targetPos = generateRandomTarget(unit.currentPos.lat, unit.currentPos.lng, 0.2);
+            }
+            updateDroneTooltip(unit);
+        }
+        moveUnitTowardsTarget(unit, updateInterval);
+        attemptEngagement(unit);
+    });
+    
+    // 更新敌方单位位置
+    unitMovementData.enemyUnits.forEach(unit => {
+        moveUnitTowardsTarget(unit, updateInterval);
+    });
+
+    // 如果有高亮连线，刷新位置
+    if (activeHighlightLine && activeHighlightedDrone && activeHighlightedTarget) {
+        activeHighlightLine.setLatLngs([
+            activeHighlightedDrone.getLatLng(),
+            activeHighlightedTarget.getLatLng()
+        ]);
+        updateHighlightDistance();
+    }
+    checkSimulationEnd();
+}
+
+// 移动单位朝向目标
+function moveUnitTowardsTarget(unit, timeStep) {
+    const { marker, currentPos, targetPos, speed } = unit;
+    
+    // 计算距离目标的距离
+    const distanceToTarget = calculateDistance(
+        currentPos.lat, currentPos.lng,
+        targetPos.lat, targetPos.lng
+    );
+    
+    // 如果已经接近目标，生成新目标
+    if (distanceToTarget < 0.01) {
+        if (unit.isOur) {
+            // 我方无人机到达后重新随机分配新的敌方目标
+            decrementTargetAssignment(unit.targetMarker);
+            const newTargetMarker = pickRandomEnemyTarget(unit);
+            unit.targetMarker = newTargetMarker;
+            if (newTargetMarker) {
+                unit.targetPos = newTargetMarker.getLatLng();
+                incrementTargetAssignment(newTargetMarker);
+            } else {
+                unit.targetPos = generateRandomTarget(currentPos.lat, currentPos.lng, 0.2);
+            }
+            updateDroneTooltip(unit);
+        } else {
+            unit.targetPos = generateRandomTarget(currentPos.lat, currentPos.lng, 0.2);
+        }
+        return;
+    }
+    
+    // 计算移动距离（速度 * 时间）
+    const moveDistance = (speed * timeStep) / 3600; // 转换为公里
+    
+    // 计算移动方向
+    const bearing = Math.atan2(
+        targetPos.lng - currentPos.lng,
+        targetPos.lat - currentPos.lat
+    );
+    
+    // 计算新位置
+    const moveRatio = Math.min(moveDistance / distanceToTarget, 1);
+    const newLat = currentPos.lat + (targetPos.lat - currentPos.lat) * moveRatio;
+    const newLng = currentPos.lng + (targetPos.lng - currentPos.lng) * moveRatio;
+    
+    // 更新标记位置
+    const newPos = L.latLng(newLat, newLng);
+    marker.setLatLng(newPos);
+    unit.currentPos = newPos;
+}
+
+// 开始仿真循环
+function startSimulationLoop() {
+    if (simulationInterval) {
+        clearInterval(simulationInterval);
+    }
+    
+    simulationInterval = setInterval(updateUnitPositions, simulationSpeed);
+    saveLog('仿真循环已启动');
+}
+
+// 停止仿真循环
+function stopSimulationLoop() {
+    if (simulationInterval) {
+        clearInterval(simulationInterval);
+        simulationInterval = null;
+        saveLog('仿真循环已停止');
+    }
+}
+
+// 加载场景数据到地图
+function loadScenarioToMap(scenarioId) {
+    return fetch(`/api/scenario/${scenarioId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                currentScenarioData = data.scenario;
+                
+                // 清除现有标记
+                clearMapMarkers();
+                
+                // 更新场景信息显示
+                document.getElementById('currentScenario').textContent = data.scenario.name;
+                
+                // 添加我方无人机标记
+                let ourDroneCount = 0;
+                data.scenario.our_drones.forEach((drone, index) => {
+                    if (drone.lat && drone.lng) {
+                        const lat = parseFloat(drone.lat);
+                        const lng = parseFloat(drone.lng);
+                        
+        if (!isNaN(lat) && !isNaN(lng) && lat >= -90 && lat <= 90 && lng >= -180 && lng <= 180) {
+            const marker = L.marker([lat, lng], { 
+                icon: getMarkerIcon('our_drone', 'our') 
+            }).addTo(map);
+            
+            // 悬停提示：显示无人机编号及当前攻击目标
+            const droneCodeLabel = drone.code || '未设置';
+            const initialTargetLabel = formatTargetLabel(null);
+            const payload = formatPayloadSummary(drone);
+            setMarkerTooltip(marker, `编号：${droneCodeLabel}<br/>${payload}<br/>当前攻击目标：${initialTargetLabel}`);
+
+            // 点击高亮当前目标并连线
+            marker.on('click', () => highlightTargetForDrone(marker));
+            
+            // 绑定动态弹出窗口 - 使用 this 指向标记本身
+            marker.bindPopup(function() {
+                const currentPos = this.getLatLng();
+                const droneData = this.droneData;
+                                const targetLabel = formatTargetLabel(this.currentTarget);
+                                return `
+                                    <div style="min-width: 200px;">
+                                        <h4 style="margin: 0 0 8px 0; color: #2c3e50;">我方无人机</h4>
+                                        <p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>编号：</strong>${droneData.code || '未设置'}
+                                        </p>
+                                        <p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>高度：</strong>${droneData.altitude || 100}米
+                                        </p>
+                                        <p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>载荷：</strong>空地导弹${droneData.ar1 || 0}枚, 空空导弹${droneData.pl10 || 0}枚, 机炮${droneData.cannon || 0}门
+                                        </p>
+                                        <p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>攻击目标：</strong>${targetLabel}
+                                        </p>
+                                        <p style="margin: 0; color: #007bff; font-size: 0.8rem; font-family: monospace;">
+                                            <strong>坐标：</strong>${currentPos.lat.toFixed(4)}°N, ${currentPos.lng.toFixed(4)}°E
+                                        </p>
+                                    </div>
+                                `;
+                            });
+                            
+                            // 存储原始数据到标记对象中
+                            marker.droneData = drone;
+                            marker.droneIndex = index;
+                            
+                            droneMarkers.push(marker);
+                            ourDroneCount++;
+                        }
+                    }
+                });
+                
+                // 添加敌方单位标记
+                let enemyUnitCount = 0;
+                data.scenario.enemy_units.forEach((unit, index) => {
+                    if (unit.lat && unit.lng) {
+                        const lat = parseFloat(unit.lat);
+                        const lng = parseFloat(unit.lng);
+                        
+                        if (!isNaN(lat) && !isNaN(lng) && lat >= -90 && lat <= 90 && lng >= -180 && lng <= 180) {
+                            const marker = L.marker([lat, lng], { 
+                                icon: getMarkerIcon(unit.type, 'enemy') 
+                            }).addTo(map);
+                            
+                            // 悬停提示：显示敌方编号
+                            const unitCodeLabel = unit.code || '未设置';
+                            setMarkerTooltip(marker, `编号：${unitCodeLabel}`);
+                            
+                            const typeNames = {
+                                'reconnaissance_drone': '侦察无人机',
+                                'attack_helicopter': '武装直升机',
+                                'tank': '坦克',
+                                'armored_vehicle': '装甲车',
+                                'military_base': '军事基地'
+                            };
+                            
+                            // 绑定动态弹出窗口 - 使用 this 指向标记本身
+                            marker.bindPopup(function() {
+                                const currentPos = this.getLatLng();
+                                const unitData = this.unitData;
+                                return `
+                                    <div style="min-width: 200px;">
+                                        <h4 style="margin: 0 0 8px 0; color: #dc3545;">${typeNames[unitData.type] || '单位'}</h4>
+                                        <p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>编号：</strong>${unitData.code || '未设置'}
+                                        </p>
+                                        ${unitData.altitude > 0 ? `<p style="margin: 0 0 6px 0; color: #7f8c8d; font-size: 0.9rem;">
+                                            <strong>高度：</strong>${unitData.altitude}米
+                                        </p>` : ''}
+                                        <p style="margin: 0; color: #dc3545; font-size: 0.8rem; font-family: monospace;">
+                                            <strong>坐标：</strong>${currentPos.lat.toFixed(4)}°N, ${currentPos.lng.toFixed(4)}°E
+                                        </p>
+                                    </div>
+                                `;
+                            });
+                            
+                            // 存储原始数据到标记对象中
+                            marker.unitData = unit;
+                            marker.unitIndex = index;
+                            
+                            enemyMarkers.push(marker);
+                            enemyUnitCount++;
+                        }
+                    }
+                });
+                
+                // 更新计数显示
+                document.getElementById('droneCount').textContent = ourDroneCount;
+                document.getElementById('enemyCount').textContent = enemyUnitCount;
+                updateStartButtonState();
+                
+                // 自动调整地图视野以包含所有标记
+                if (droneMarkers.length > 0 || enemyMarkers.length > 0) {
+                    const allMarkers = [...droneMarkers, ...enemyMarkers];
+                    const group = new L.featureGroup(allMarkers);
+                    map.fitBounds(group.getBounds().pad(0.1));
+                }
+                
+                saveLog(`成功加载场景 "${data.scenario.name}"，我方无人机 ${ourDroneCount} 架，敌方单位 ${enemyUnitCount} 个`);
+            } else {
+                saveLog('加载场景失败: ' + data.message, 'ERROR');
+                alert('加载场景失败: ' + data.message);
+            }
+        })
+        .catch(error => {
+            saveLog('获取场景数据时发生错误: ' + error.message, 'ERROR');
+            alert('获取场景数据时发生错误: ' + error.message);
+        });
+}
+
+function setRunningStatus(paused) {
+    document.getElementById('simStatus').textContent = paused ? '已暂停' : '运行中';
+    document.getElementById('simStatus').className = paused ? 'status-badge paused' : 'status-badge running';
+    document.getElementById('startSim').innerHTML = paused ? '<i class="fas fa-play"></i> 继续' : '<i class="fas fa-pause"></i> 暂停';
+}
+
+function startLiveRun() {
+    const scenarioId = parseInt(document.getElementById('scenarioSelect').value, 10);
+    const speed = parseFloat(document.getElementById('liveSpeed').value) || 10;
+    fetch('/api/live_runs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ scenario_id: scenarioId, speed: speed })
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert('启动服务端仿真失败: ' + data.message);
+                return;
+            }
+            attachLiveRun(data.run_id, true);
+            const targetName = selectedTargetModel ? selectedTargetModel.name : '未选择';
+            const fireName = selectedFireModel ? selectedFireModel.name : '未选择';
+            saveLog(`开始服务端推流仿真 ${data.run_id}，当前场景: ${currentScenarioData.name}，目标分配模型: ${targetName}，火力分配模型: ${fireName}，倍速: ${speed}x`);
+        })
+        .catch(error => alert('启动服务端仿真失败: ' + error.message));
+}
+
+function attachLiveRun(runId, owner) {
+    const droneByIndex = {};
+    const enemyByIndex = {};
+    droneMarkers.forEach(marker => { droneByIndex[marker.droneIndex] = marker; });
+    enemyMarkers.forEach(marker => { enemyByIndex[marker.unitIndex] = marker; });
+    // EventSource 断线后会带上 Last-Event-ID 自动重连，服务端从断点续传
+    const source = new EventSource(`/api/live_runs/${runId}/stream`);
+    liveRun = { id: runId, owner: owner, source: source, droneByIndex: droneByIndex, enemyByIndex: enemyByIndex, weapons: [] };
+
+    isSimulationRunning = true;
+    isPaused = false;
+    clearTransientMessages();
+    resetBattleStats();
+    battleStats.startTime = Date.now();
+    battleStats.initialEnemyCount = enemyMarkers.length;
+    battleStats.initialDroneCount = droneMarkers.length;
+    setRunningStatus(false);
+    updateStartButtonState();
+    const link = document.getElementById('liveRunLink');
+    link.href = `/simulation?live=${runId}`;
+    link.textContent = runId.slice(0, 8);
+    document.getElementById('liveRunInfo').style.display = '';
+
+    source.addEventListener('hello', event => {
+        const info = JSON.parse(event.data);
+        liveRun.weapons = (info.metadata && info.metadata.weapons) || [];
+        isPaused = info.state === 'paused';
+        setRunningStatus(isPaused);
+    });
+    source.addEventListener('keyframe', event => applyLiveFrame(JSON.parse(event.data), true));
+    source.addEventListener('delta', event => applyLiveFrame(JSON.parse(event.data), false));
+    source.addEventListener('end', event => {
+        const frame = JSON.parse(event.data);
+        if (frame.summary) {
+            battleStats.shotsFired = frame.summary.shots;
+            battleStats.hits = frame.summary.hits;
+            battleStats.destroyed = frame.summary.kills;
+            battleStats.ammoUsage = frame.summary.ammo_usage || {};
+            battleStats.killsByType = frame.summary.kills_by_type || {};
+        }
+        finishSimulation(frame.reason);
+        detachLiveRun();
+    });
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && liveRun && liveRun.source === source) {
+            detachLiveRun();
+            finishSimulation('推流已断开');
+        }
+    };
+}
+
+function detachLiveRun() {
+    if (!liveRun) return;
+    liveRun.source.close();
+    liveRun = null;
+    document.getElementById('liveRunInfo').style.display = 'none';
+}
+
+function liveRunControl(action) {
+    return fetch(`/api/live_runs/${liveRun.id}/control`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action: action })
+    }).then(response => response.json());
+}
+
+function toggleLiveRunPause() {
+    if (!liveRun.owner) {
+        showAttackMessage('观看模式下只能由发起者暂停或停止仿真', 'warning');
+        return;
+    }
+    const action = isPaused ? 'resume' : 'pause';
+    liveRunControl(action).then(data => {
+        if (!data.success) return;
+        isPaused = data.state === 'paused';
+        setRunningStatus(isPaused);
+        saveLog(isPaused ? '服务端仿真暂停' : '继续服务端仿真');
+    });
+}
+
+function setLiveDroneTarget(droneIndex, targetIndex) {
+    const marker = liveRun.droneByIndex[droneIndex];
+    if (!marker) return;
+    const targetMarker = targetIndex >= 0 ? (liveRun.enemyByIndex[targetIndex] || null) : null;
+    updateDroneTooltip({ marker: marker, targetMarker: targetMarker, data: marker.droneData });
+    if (activeHighlightedDrone === marker) {
+        clearTargetHighlight();
+        highlightTargetForDrone(marker);
+    }
+}
+
+function removeLiveEnemy(unitIndex) {
+    const marker = liveRun.enemyByIndex[unitIndex];
+    if (!marker) return;
+    delete liveRun.enemyByIndex[unitIndex];
+    handleTargetDestroyed(marker);
+}
+
+function applyLiveFrame(frame, isKeyframe) {
+    if (!liveRun) return;
+    if (isKeyframe) {
+        // 关键帧包含全部存活单位，据此修正中途加入或断线期间错过的变化
+        const alive = new Set(frame.enemies.map(unit => unit[0]));
+        Object.keys(liveRun.enemyByIndex).forEach(index => {
+            if (!alive.has(Number(index))) removeLiveEnemy(Number(index));
+        });
+        frame.targets.forEach((target, index) => setLiveDroneTarget(index, target));
+    }
+    frame.drones.forEach(([index, lat, lng]) => {
+        const marker = liveRun.droneByIndex[index];
+        if (marker) marker.setLatLng([lat, lng]);
+    });
+    frame.enemies.forEach(([index, lat, lng]) => {
+        const marker = liveRun.enemyByIndex[index];
+        if (marker) marker.setLatLng([lat, lng]);
+    });
+    frame.events.forEach(event => {
+        if (event.kind === 'assign') {
+            setLiveDroneTarget(event.unit, event.target);
+        } else if (event.kind === 'shot') {
+            recordShot(liveRun.weapons[event.weapon]);
+            const drone = liveRun.droneByIndex[event.unit];
+            const target = liveRun.enemyByIndex[event.target];
+            if (event.hit && drone && target) {
+                showAttackMessage(`${drone.droneData.code || '无人机'} 命中 ${formatTargetLabel(target)}${event.destroyed ? '，目标被击毁' : ''}`,
+                    event.destroyed ? 'success' : 'info');
+            }
+        } else if (event.kind === 'kill') {
+            recordHit(false, true, liveRun.enemyByIndex[event.unit]);
+            removeLiveEnemy(event.unit);
+        }
+    });
+    battleStats.shotsFired = frame.stats.shots;
+    battleStats.hits = frame.stats.hits;
+    battleStats.destroyed = frame.stats.kills;
+
+    if (activeHighlightLine && activeHighlightedDrone && activeHighlightedTarget) {
+        activeHighlightLine.setLatLngs([
+            activeHighlightedDrone.getLatLng(),
+            activeHighlightedTarget.getLatLng()
+        ]);
+        updateHighlightDistance();
+    }
+}
+
+// 仿真控制功能
+function startSimulation() {
+    if (!isSimulationRunning && !isSimulationReady()) {
+        alert('请先选择并加载场景，并选择目标分配与火力分配模型');
+        return;
+    }
+    
+    if (liveRun) {
+        toggleLiveRunPause();
+        return;
+    }
+
+    if (!isSimulationRunning && document.getElementById('liveMode').checked) {
+        startLiveRun();
+        return;
+    }
+
+    if (!isSimulationRunning) {
+        // 开始新的仿真
+        isSimulationRunning = true;
+        isPaused = false;
+        clearTransientMessages();
+        resetBattleStats();
+        battleStats.startTime = Date.now();
+        battleStats.initialEnemyCount = enemyMarkers.length;
+        battleStats.initialDroneCount = droneMarkers.length;
+        
+        // 初始化运动数据
+        initializeMovementData();
+        
+        // 启动仿真循环
+        startSimulationLoop();
+        
+        // 更新界面
+        document.getElementById('simStatus').textContent = '运行中';
+        document.getElementById('simStatus').className = 'status-badge running';
+        document.getElementById('startSim').innerHTML = '<i class="fas fa-pause"></i> 暂停';
+        
+        const targetName = selectedTargetModel ? selectedTargetModel.name : '未选择';
+        const fireName = selectedFireModel ? selectedFireModel.name : '未选择';
+        saveLog(`开始仿真，当前场景: ${currentScenarioData.name}，目标分配模型: ${targetName}，火力分配模型: ${fireName}`);
+        checkSimulationEnd();
+    } else if (isPaused) {
+        // 继续仿真
+        isPaused = false;
+        
+        // 重新启动仿真循环
+        startSimulationLoop();
+        
+        // 更新界面
+        document.getElementById('simStatus').textContent = '运行中';
+        document.getElementById('simStatus').className = 'status-badge running';
+        document.getElementById('startSim').innerHTML = '<i class="fas fa-pause"></i> 暂停';
+        
+        saveLog('继续仿真');
+    } else {
+        // 暂停仿真
+        isPaused = true;
+        
+        // 停止仿真循环
+        stopSimulationLoop();
+        
+        // 更新界面
+        document.getElementById('simStatus').textContent = '已暂停';
+        document.getElementById('simStatus').className = 'status-badge paused';
+        document.getElementById('startSim').innerHTML = '<i class="fas fa-play"></i> 继续';
+        
+        saveLog('仿真暂停');
+    }
+}
+
+function pauseSimulation() {
+    // 这个函数保留但不再使用，因为已经移除了暂停按钮
+    // 暂停功能现在集成在 startSimulation 函数中
+}
+
+function stopSimulation() {
+    if (liveRun) {
+        // 发起者停止服务端仿真；观看者只断开推流
+        if (liveRun.owner) {
+            liveRunControl('stop');
+        }
+        detachLiveRun();
+    }
+    // 停止仿真
+    isSimulationRunning = false;
+    isPaused = false;
+    
+    // 停止仿真循环
+    stopSimulationLoop();
+    clearTransientMessages();
+    hideBattleSummary();
+    resetBattleStats();
+    
+    // 重新加载场景以恢复初始位置
+    if (currentScenarioData) {
+        const scenarioSelect = document.getElementById('scenarioSelect');
+        if (scenarioSelect.value) {
+            loadScenarioToMap(scenarioSelect.value);
+        }
+    }
+    
+    // 更新界面
+    document.getElementById('simStatus').textContent = '就绪';
+    document.getElementById('simStatus').className = 'status-badge';
+    document.getElementById('startSim').innerHTML = '<i class="fas fa-play"></i> 开始仿真';
+    updateStartButtonState();
+    
+    saveLog('仿真停止，单位位置已重置');
+}
+
+// 页面加载完成后初始化
+document.addEventListener('DOMContentLoaded', function() {
+    // 初始化地图
+    initMap();
+    loadEnemyConfig();
+    loadWeaponConfig();
+    
+    // 加载场景列表
+    loadScenarios();
+    // 加载模型列表
+    loadModels();
+    showLoadScenarioButton();
+    
+    // 绑定按钮事件
+    document.getElementById('startSim').addEventListener('click', startSimulation);
+    document.getElementById('stopSim').addEventListener('click', stopSimulation);
+    
+    // 选中“加载更多”时加载下一页场景
+    document.getElementById('scenarioSelect').addEventListener('change', function() {
+        if (this.value === LOAD_MORE_SCENARIOS) {
+            this.value = '';
+            loadScenarios(scenarioNextCursor);
+        }
+    });
+    
+    // 绑定加载场景按钮事件
+    document.getElementById('loadScenario').addEventListener('click', function() {
+        const scenarioId = document.getElementById('scenarioSelect').value;
+        if (scenarioId) {
+            loadScenarioToMap(scenarioId);
+        } else {
+            alert('请先选择一个场景');
+        }
+    });
+    
+    // 绑定模型选择事件
+    document.getElementById('targetModelSelect').addEventListener('change', function() {
+        const modelId = parseInt(this.value, 10);
+        selectedTargetModel = targetModels.find(model => model.id === modelId) || null;
+        updateModelSelectionDisplay();
+        updateStartButtonState();
+    });
+
+    document.getElementById('fireModelSelect').addEventListener('change', function() {
+        const modelId = parseInt(this.value, 10);
+        selectedFireModel = fireModels.find(model => model.id === modelId) || null;
+        updateModelSelectionDisplay();
+        updateStartButtonState();
+    });
+    
+    const closeSummaryBtn = document.getElementById('closeSummary');
+    if (closeSummaryBtn) {
+        closeSummaryBtn.addEventListener('click', hideBattleSummary);
+    }
+    
+    // 通过观看链接打开时，加载对应场景后加入服务端推流
+    const liveRunId = new URLSearchParams(window.location.search).get('live');
+    if (liveRunId) {
+        fetch(`/api/live_runs/${encodeURIComponent(liveRunId)}`)
+            .then(response => response.json())
+            .then(info => {
+                if (!info.success) {
+                    alert(info.message);
+                    return;
+                }
+                document.getElementById('scenarioSelect').value = info.metadata.scenario_id;
+                return loadScenarioToMap(info.metadata.scenario_id).then(() => attachLiveRun(liveRunId, false));
+            });
+    }
+
+    saveLog('仿真评估页面初始化完成');
+    updateStartButtonState();
+});
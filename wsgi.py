@@ -0,0 +1,13 @@
+# wsgi.py
+"""WSGI 入口，供 gunicorn/uWSGI 等服务器加载：gunicorn wsgi:application
+
+导入时执行迁移与缓存预热，不启动后台线程；预加载后再 fork 的服务器需在每个工作进程中
+调用 app.start_background_services()，serve.py 已配置好对应的钩子。
+推流仿真的状态保存在进程内，此处无法得知服务器的工作进程数，因此默认关闭推流，
+只有单个工作进程时才应设置环境变量 LIVE_STREAMING=1 开启。
+"""
+import os
+
+from app import create_app
+
+application = create_app({'LIVE_STREAMING': os.environ.get('LIVE_STREAMING') == '1'}, start_services=False)
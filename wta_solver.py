@@ -0,0 +1,347 @@
+# wta_solver.py
+"""武器-目标分配（WTA）基线求解器
+
+由场景中的我方无人机与敌方单位构造 无人机 × 目标 的期望毁伤价值矩阵：
+- 目标价值取自 enemy_unit_config.json 的 value
+- 单架无人机对目标的毁伤概率由可用武器（空地导弹只打地面、空空导弹只打空中、机炮都可以）
+  的命中率 × 单发毁伤率与剩余载荷决定，每种武器最多按交战规则的单目标齐射数计入
+
+提供三种分配算法，作为训练得到的目标分配模型的对照基线：
+- greedy：最大边际收益贪心，允许多架无人机攻击同一目标，目标存活概率逐次相乘
+- optimal：一对一分配（每个目标至多一架无人机）的精确最优解，与匈牙利算法结果相同；
+  载荷组合相同的无人机、同类目标先合并，化为运输问题求最小费用流；
+  两侧类数都过多时退回 greedy 并在结果中注明
+- weighted：与仿真页面相同的 价值/距离/负载 加权评分依次选择，即当前的分配方式
+
+目标函数统一为期望毁伤价值：Σ 目标价值 × (1 - Π 未毁伤概率)。
+"""
+import heapq
+import time
+
+import numpy as np
+
+from simulation_engine import (
+    WEAPON_CODES, AIR_TARGET_TYPES, TARGET_SELECTION_WEIGHTS,
+    DEFAULT_ENEMY_VALUE, DEFAULT_HIT_PROBABILITY, DEFAULT_LETHALITY,
+    load_weapon_config, load_enemy_config, load_engagement_policy, _to_float, _to_int
+)
+from spatial_index import haversine_km
+
+ALGORITHMS = ('greedy', 'optimal', 'weighted')
+DEFAULT_MAX_SALVO = 2
+# optimal 求解时载荷组合数与目标类数中较少一侧的上限，超过时退回 greedy 并在结果中注明
+OPTIMAL_MAX_CLASSES = 64
+
+
+class AllocationProblem:
+    """分配问题的数组表示"""
+
+    def __init__(self, scenario_data, weapon_config=None, enemy_config=None, max_salvo=None):
+        weapon_config = load_weapon_config() if weapon_config is None else weapon_config
+        enemy_config = load_enemy_config() if enemy_config is None else enemy_config
+        if max_salvo is None:
+            max_salvo = _to_int(load_engagement_policy().get('max_salvo_per_target'), DEFAULT_MAX_SALVO)
+        max_salvo = max(int(max_salvo), 1)
+
+        drones = scenario_data.get('our_drones') or []
+        enemies = scenario_data.get('enemy_units') or []
+        self.drone_codes = [d.get('code') or '未编号' for d in drones]
+        self.target_codes = [e.get('code') or '' for e in enemies]
+        self.target_types = [e.get('type') or 'reconnaissance_drone' for e in enemies]
+        self.drone_pos = np.array(
+            [[_to_float(d.get('lat')), _to_float(d.get('lng'))] for d in drones], dtype=np.float64
+        ).reshape(-1, 2)
+        self.target_pos = np.array(
+            [[_to_float(e.get('lat')), _to_float(e.get('lng'))] for e in enemies], dtype=np.float64
+        ).reshape(-1, 2)
+        self.target_value = np.array([
+            (enemy_config.get(t) or {}).get('value') or e.get('value') or DEFAULT_ENEMY_VALUE
+            for t, e in zip(self.target_types, enemies)
+        ], dtype=np.float64).reshape(-1)
+        self.max_config_value = max([1] + [cfg.get('value') or DEFAULT_ENEMY_VALUE for cfg in enemy_config.values()])
+        if not enemy_config:
+            self.max_config_value = 120
+
+        # 每种武器计入的发数 (无人机, 武器)
+        payload = np.array(
+            [[max(_to_int(d.get(code, 0)), 0) for code in WEAPON_CODES] for d in drones], dtype=np.float64
+        ).reshape(-1, len(WEAPON_CODES))
+        shots = np.minimum(payload, max_salvo)
+        configs = [weapon_config.get(code) or {} for code in WEAPON_CODES]
+        single = np.array([
+            (cfg.get('hit_probability') or DEFAULT_HIT_PROBABILITY) *
+            (cfg.get('single_shot_lethality') or DEFAULT_LETHALITY) if cfg.get('max_range_km') else 0.0
+            for cfg in configs
+        ])
+        # 对数存活概率，空中/地面目标各算一次再按目标类型取用
+        log_miss = np.log1p(-np.minimum(single, 1 - 1e-12))
+        vs_air = np.array([code != 'ar1' for code in WEAPON_CODES])
+        vs_ground = np.array([code != 'pl10' for code in WEAPON_CODES])
+        miss_air = shots @ np.where(vs_air, log_miss, 0.0)
+        miss_ground = shots @ np.where(vs_ground, log_miss, 0.0)
+        is_air = np.array([t in AIR_TARGET_TYPES for t in self.target_types], dtype=bool)
+        self.kill_prob = -np.expm1(np.where(is_air[None, :], miss_air[:, None], miss_ground[:, None]))
+
+    @property
+    def shape(self):
+        return self.kill_prob.shape
+
+    def value_matrix(self):
+        return self.kill_prob * self.target_value[None, :]
+
+    def expected_value(self, assignment):
+        """assignment[i] 为无人机 i 的目标下标（-1 表示未分配），返回期望毁伤价值"""
+        assignment = np.asarray(assignment)
+        assigned = np.flatnonzero(assignment >= 0)
+        survival = np.ones(len(self.target_value))
+        np.multiply.at(survival, assignment[assigned], 1 - self.kill_prob[assigned, assignment[assigned]])
+        return float(np.dot(self.target_value, 1 - survival))
+
+
+def _group_identical(items):
+    """items 的每一列是一个对象，返回完全相同的列组成的分组（组内与组间均按下标升序）"""
+    m = items.shape[1]
+    if m == 0:
+        return []
+    # 先按随机投影指纹分组，再核对组内各列与首列完全相同；出现指纹碰撞时退回逐列精确比较
+    weights = np.random.default_rng(0).random(items.shape[0])
+    fingerprint = items.T @ weights
+    order = np.argsort(fingerprint, kind='stable')
+    starts = np.ones(m, dtype=bool)
+    starts[1:] = np.diff(fingerprint[order]) != 0
+    leader = order[np.maximum.accumulate(np.where(starts, np.arange(m), 0))]
+    if not (items[:, order] == items[:, leader]).all():
+        _, inverse = np.unique(items.T, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        starts = np.ones(m, dtype=bool)
+        starts[1:] = np.diff(inverse[order]) != 0
+    groups = [np.sort(group) for group in np.split(order, np.flatnonzero(starts)[1:])]
+    groups.sort(key=lambda group: group[0])
+    return groups
+
+
+def target_classes(problem):
+    """毁伤概率列与价值完全相同的目标归为一类，返回 (各类成员下标列表, 各类代表下标)
+
+    毁伤概率只取决于目标是空中还是地面目标，场景里的目标通常只分成少数几类；
+    同类目标对任何无人机都可以互换，按类求解可以省去大量重复计算。
+    """
+    members = _group_identical(np.vstack((problem.target_value[None, :], problem.kill_prob)))
+    return members, np.array([group[0] for group in members], dtype=np.int64)
+
+
+def drone_classes(problem):
+    """毁伤概率行完全相同的无人机归为一类（计入的载荷组合相同），返回值同 target_classes"""
+    members = _group_identical(problem.kill_prob.T)
+    return members, np.array([group[0] for group in members], dtype=np.int64)
+
+
+def solve_greedy(problem):
+    """最大边际收益贪心：每次选择全局边际收益最大的 (无人机, 目标)，更新该目标的存活概率
+
+    同类目标中存活概率最高者（相同时取下标最小者）边际收益最大，用堆维护；
+    每次只有被选中的类的最优值变化，其余无人机的行最优值只会变小不会变大，
+    因此只需重算行最优恰好是该类的无人机。
+    """
+    n, m = problem.shape
+    assignment = np.full(n, -1, dtype=np.int64)
+    if n == 0 or m == 0:
+        return assignment, {}
+    members, representative = target_classes(problem)
+    heaps = [[(-1.0, int(j)) for j in group] for group in members]
+    class_prob = problem.kill_prob[:, representative]
+    class_value = problem.target_value[representative]
+    class_survival = np.ones(len(members))
+    gain = class_prob * class_value[None, :]
+    rows = np.arange(n)
+    best_c = np.argmax(gain, axis=1)
+    best = gain[rows, best_c]
+    for _ in range(n):
+        i = int(np.argmax(best))
+        if best[i] <= 0:
+            break
+        c = int(best_c[i])
+        heap = heaps[c]
+        survival, j = heapq.heappop(heap)
+        survival = -survival * (1 - class_prob[i, c])
+        heapq.heappush(heap, (-survival, j))
+        assignment[i] = j
+        best[i] = -np.inf
+        class_survival[c] = -heap[0][0]
+        gain[:, c] = class_value[c] * class_survival[c] * class_prob[:, c]
+        stale = np.flatnonzero((best_c == c) & (best > -np.inf))
+        if stale.size:
+            best_c[stale] = np.argmax(gain[stale], axis=1)
+            best[stale] = gain[stale, best_c[stale]]
+    return assignment, {'target_classes': len(members)}
+
+
+def _min_cost_flow(cost, supply, capacity):
+    """行类 -> 列类的运输问题：每行至多 supply[r] 单位、每列至多 capacity[c] 单位，
+    只在能降低总成本时增广，返回各 (行, 列) 的流量
+
+    逐次沿残量网络的最短路增广。行类、列类中较少的一侧作为“站点”（不超过
+    OPTIMAL_MAX_CLASSES 个），残量网络里任意两个站点之间只经过一个有流量的另一侧类，
+    于是最短路只需在 站点 + 虚拟起点 + 汇点 上做 Bellman-Ford：
+    - 起点 -> 站点 c：仍有剩余量的另一侧类中 cost[r, c] 最小者
+    - 站点 c -> 站点 c'：把已流向 c 的某个类改流向 c'，取 cost[r, c'] - cost[r, c] 最小者
+    - 站点 c -> 汇点：c 仍有剩余容量
+    每次增广的代价与另一侧的类数成线性、向量化计算。
+    """
+    if cost.shape[1] > cost.shape[0]:
+        flow, augmentations = _min_cost_flow(cost.T, capacity, supply)
+        return flow.T, augmentations
+    n_rows, n_cols = cost.shape
+    flow = np.zeros((n_rows, n_cols), dtype=np.int64)
+    left = np.asarray(supply, dtype=np.int64).copy()
+    room = np.asarray(capacity, dtype=np.int64).copy()
+    stations = np.arange(n_cols)
+    augmentations = 0
+    while left.any() and room.any():
+        # 起点到各站点
+        open_rows = np.flatnonzero(left > 0)
+        entry_row = open_rows[np.argmin(cost[open_rows], axis=0)]
+        distance = cost[entry_row, stations]
+        # 站点之间：经由已有流量的 (行, 站点) 改流
+        used_rows, used_cols = np.nonzero(flow)
+        switch = np.full((n_cols, n_cols), np.inf)
+        if used_rows.size:
+            np.minimum.at(switch, used_cols, cost[used_rows] - cost[used_rows, used_cols][:, None])
+        np.fill_diagonal(switch, np.inf)
+        parent = np.full(n_cols, -1, dtype=np.int64)
+        for _ in range(n_cols - 1):
+            through = distance[:, None] + switch
+            best_from = np.argmin(through, axis=0)
+            best = through[best_from, stations]
+            improved = best < distance - 1e-12
+            if not improved.any():
+                break
+            distance[improved] = best[improved]
+            parent[improved] = best_from[improved]
+        exits = np.flatnonzero(room > 0)
+        end = int(exits[np.argmin(distance[exits])])
+        if not distance[end] < -1e-12:
+            break
+        # 回溯路径，依次确定每段改流的行并求瓶颈量
+        path = [end]
+        while parent[path[-1]] >= 0:
+            path.append(int(parent[path[-1]]))
+        path.reverse()
+        start_row = int(entry_row[path[0]])
+        moves = []
+        for c, c_next in zip(path, path[1:]):
+            rows = np.flatnonzero(flow[:, c] > 0)
+            r = int(rows[np.argmin(cost[rows, c_next] - cost[rows, c])])
+            moves.append((r, c, c_next))
+        amount = min([left[start_row], room[end]] + [flow[r, c] for r, c, _ in moves])
+        left[start_row] -= amount
+        room[end] -= amount
+        flow[start_row, path[0]] += amount
+        for r, c, c_next in moves:
+            flow[r, c] -= amount
+            flow[r, c_next] += amount
+        augmentations += 1
+    return flow, augmentations
+
+
+def solve_optimal(problem):
+    """一对一分配（每个目标至多一架无人机）的最大期望价值，精确解
+
+    相当于在 无人机 × 目标 矩阵上运行匈牙利算法；由于同一载荷组合的无人机、同类目标
+    完全可以互换，先把它们合并，问题化为 载荷组合数 × 目标类数 的运输问题。
+    两者都超过 OPTIMAL_MAX_CLASSES 时改用 greedy，结果中以 fallback 字段注明。
+    """
+    n, m = problem.shape
+    assignment = np.full(n, -1, dtype=np.int64)
+    if n == 0 or m == 0:
+        return assignment, {}
+    drone_groups, drone_rep = drone_classes(problem)
+    target_groups, target_rep = target_classes(problem)
+    if min(len(drone_groups), len(target_groups)) > OPTIMAL_MAX_CLASSES:
+        assignment, details = solve_greedy(problem)
+        return assignment, {
+            **details,
+            'drone_classes': len(drone_groups),
+            'fallback': 'greedy',
+            'fallback_reason': f'载荷组合数与目标类数均超过 {OPTIMAL_MAX_CLASSES}，未求精确解'
+        }
+    value = problem.kill_prob[np.ix_(drone_rep, target_rep)] * problem.target_value[target_rep][None, :]
+    flow, augmentations = _min_cost_flow(
+        -value,
+        np.array([len(group) for group in drone_groups], dtype=np.int64),
+        np.array([len(group) for group in target_groups], dtype=np.int64)
+    )
+    drone_used = np.zeros(len(drone_groups), dtype=np.int64)
+    target_used = np.zeros(len(target_groups), dtype=np.int64)
+    for r, c in zip(*np.nonzero(flow)):
+        amount = flow[r, c]
+        drones = drone_groups[r][drone_used[r]:drone_used[r] + amount]
+        targets = target_groups[c][target_used[c]:target_used[c] + amount]
+        assignment[drones] = targets
+        drone_used[r] += amount
+        target_used[c] += amount
+    return assignment, {
+        'drone_classes': len(drone_groups),
+        'target_classes': len(target_groups),
+        'augmentations': augmentations
+    }
+
+
+def solve_weighted(problem):
+    """仿真页面当前的分配方式：无人机依次按 价值/距离/负载 加权评分选择目标（不考虑毁伤概率）"""
+    n, m = problem.shape
+    assignment = np.full(n, -1, dtype=np.int64)
+    if n == 0 or m == 0:
+        return assignment, {}
+    value_term = TARGET_SELECTION_WEIGHTS['value'] * problem.target_value / problem.max_config_value
+    load = np.zeros(m)
+    for i in range(n):
+        distance = haversine_km(problem.drone_pos[i, 0], problem.drone_pos[i, 1],
+                                problem.target_pos[:, 0], problem.target_pos[:, 1])
+        score = (value_term + TARGET_SELECTION_WEIGHTS['distance'] / (1 + distance) +
+                 TARGET_SELECTION_WEIGHTS['load'] / (1 + load))
+        j = int(np.argmax(score))
+        assignment[i] = j
+        load[j] += 1
+    return assignment, {}
+
+
+_SOLVERS = {
+    'greedy': solve_greedy,
+    'optimal': solve_optimal,
+    'weighted': solve_weighted,
+}
+
+
+def allocate(problem, algorithm='greedy', include_assignments=True):
+    """运行指定算法并返回目标函数值、耗时与分配结果"""
+    solver = _SOLVERS.get(algorithm)
+    if solver is None:
+        raise ValueError(f'未知的分配算法: {algorithm}')
+    started = time.perf_counter()
+    assignment, details = solver(problem)
+    solve_ms = (time.perf_counter() - started) * 1000
+    assigned = np.flatnonzero(assignment >= 0)
+    result = {
+        'algorithm': algorithm,
+        'objective': round(problem.expected_value(assignment), 6),
+        'solve_time_ms': round(solve_ms, 3),
+        'assigned_drones': int(assigned.size),
+        'targets_covered': int(np.unique(assignment[assigned]).size),
+        **details
+    }
+    if include_assignments:
+        targets = assignment[assigned]
+        result['assignments'] = [
+            {
+                'drone': int(i),
+                'drone_code': problem.drone_codes[i],
+                'target': int(j),
+                'target_code': problem.target_codes[j],
+                'target_type': problem.target_types[j],
+                'kill_probability': round(float(p), 6)
+            }
+            for i, j, p in zip(assigned.tolist(), targets.tolist(), problem.kill_prob[assigned, targets].tolist())
+        ]
+    return result